@@ -1,6 +1,8 @@
 from django.contrib import admin
 
-from .models import Group, Post
+from .models import Group, Job, Post
+from .paginator import EstimatedCountPaginator
+from .search import search
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -8,13 +10,30 @@ class PostAdmin(admin.ModelAdmin):
     search_fields = ('text',)
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
+    list_select_related = ('author',)
+    autocomplete_fields = ('author', 'group')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        # Вместо LIKE '%...%' по всей таблице — полнотекстовый индекс
+        if not search_term:
+            return queryset, False
+        return search(search_term, queryset), False
 
 
 class GroupAdmin(admin.ModelAdmin):
     list_display = ('title', 'slug', 'description')
-    search_fields = ('text',)
+    search_fields = ('title', 'slug')
     empty_value_display = '-пусто-'
 
 
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'name', 'state', 'attempts', 'run_at', 'created')
+    list_filter = ('state', 'name')
+    readonly_fields = ('last_error',)
+
+
 admin.site.register(Group, GroupAdmin)
+admin.site.register(Job, JobAdmin)
 admin.site.register(Post, PostAdmin)
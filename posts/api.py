@@ -0,0 +1,357 @@
+"""
+JSON API для постов, сообществ и профилей: /api/v1/.
+
+Поля ответа выбираются параметром fields (?fields=text,author), и
+запрос читает только их колонки. Автор поста приходит тем же запросом
+через JOIN, сообщество — из справочника posts.groups, без запроса.
+Списки постов листаются курсором по (pub_date, id), как ленты сайта;
+ids=3,1,2 отдаёт до API_MAX_IDS объектов одним запросом.
+
+ETag и Last-Modified берутся из поколений лент page_cache: повторный
+запрос с If-None-Match получает 304, не доходя до БД.
+
+Запись — создание, правка и удаление постов — от имени пользователя
+сессии, с проверкой CSRF, как и формы сайта.
+"""
+import json
+from functools import wraps
+
+from django.conf import settings
+from django.http import (Http404, HttpResponse, HttpResponseNotAllowed,
+                         JsonResponse)
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+
+from . import groups, timeline
+from .conditional import conditional, from_timestamp, make_etag
+from .forms import PostForm
+from .models import AuthorStats, Group, Post, User
+from .page_cache import ALL_FEEDS, current_generations
+from .paginator import MAX_ID, CursorPaginator, InvalidCursor
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def api_response(data, status=200):
+    # Кириллица в UTF-8 вдвое короче, чем в экранированном \uXXXX
+    return JsonResponse(data, status=status, json_dumps_params={
+        'ensure_ascii': False, 'separators': (',', ':'),
+    })
+
+
+def api_view(*methods):
+    """Разрешённые методы и ошибки в виде {"error": ...}."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in methods:
+                return HttpResponseNotAllowed(methods)
+            try:
+                return view(request, *args, **kwargs)
+            except ApiError as error:
+                return api_response({'error': str(error)}, error.status)
+            except Http404:
+                return api_response({'error': 'Не найдено'}, 404)
+        return wrapper
+    return decorator
+
+
+def api_condition(feeds):
+    """
+    ETag по пути с параметрами и поколениям лент feeds(request,
+    **kwargs). Ответ не зависит от пользователя, поэтому его в ETag нет.
+    """
+    def generations(request, kwargs):
+        if not hasattr(request, '_api_generations'):
+            request._api_generations = current_generations(
+                [ALL_FEEDS, *feeds(request, **kwargs)]
+            )
+        return request._api_generations
+
+    def etag(request, *args, **kwargs):
+        return make_etag('api', request.get_full_path(),
+                         *generations(request, kwargs))
+
+    def last_modified(request, *args, **kwargs):
+        return from_timestamp(max(generations(request, kwargs)))
+
+    return conditional(etag, last_modified)
+
+
+def require_user(request):
+    if not request.user.is_authenticated:
+        raise ApiError(401, 'Нужна авторизация')
+
+
+def read_body(request):
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        raise ApiError(400, 'Тело запроса — не JSON')
+    if not isinstance(data, dict):
+        raise ApiError(400, 'Тело запроса — не объект JSON')
+    return data
+
+
+def parse_fields(request, available, default):
+    """Поля из ?fields=; id отдаётся всегда."""
+    value = request.GET.get('fields')
+    if not value:
+        return default
+    fields = [name for name in value.split(',') if name]
+    unknown = [name for name in fields if name not in available]
+    if unknown:
+        raise ApiError(400, 'Неизвестные поля: {}. Доступны: {}'.format(
+            ', '.join(unknown), ', '.join(available)
+        ))
+    return ('id', *(name for name in fields if name != 'id'))
+
+
+def parse_ids(request):
+    value = request.GET.get('ids')
+    if value is None:
+        return None
+    try:
+        ids = list(dict.fromkeys(int(pk) for pk in value.split(',') if pk))
+    except ValueError:
+        raise ApiError(400, 'ids — числа через запятую')
+    if not all(1 <= pk <= MAX_ID for pk in ids):
+        raise ApiError(400, f'ids — от 1 до {MAX_ID}')
+    if len(ids) > settings.API_MAX_IDS:
+        raise ApiError(400, f'Не больше {settings.API_MAX_IDS} ids')
+    return ids
+
+
+def parse_limit(request):
+    try:
+        limit = int(request.GET.get('limit', settings.API_PAGE_SIZE))
+    except ValueError:
+        raise ApiError(400, 'limit — число')
+    return min(max(limit, 1), settings.API_MAX_PAGE_SIZE)
+
+
+def group_json(group):
+    return {'id': group.id, 'slug': group.slug, 'title': group.title}
+
+
+def embedded_group(post):
+    if post.group_id is None:
+        return None
+    group = groups.directory().by_id.get(post.group_id)
+    return group_json(group) if group else {'id': post.group_id}
+
+
+def embedded_author(post):
+    if post.author_id is None:
+        return None
+    return {'id': post.author_id, 'username': post.author.username}
+
+
+# Поле поста -> (колонки для only(), значение в ответе)
+POST_FIELDS = {
+    'id': ((), lambda post: post.pk),
+    'text': (('text',), lambda post: post.text),
+    'pub_date': ((), lambda post: post.pub_date.isoformat()),
+    'updated_at': (('updated_at',),
+                   lambda post: post.updated_at.isoformat()),
+    'author': (('author', 'author__username'), embedded_author),
+    'group': (('group',), embedded_group),
+}
+POST_DEFAULT_FIELDS = ('id', 'text', 'pub_date', 'author', 'group')
+
+
+def posts_queryset(fields):
+    # pub_date нужен курсору, даже если в ответе его нет
+    columns = {'pub_date'}
+    for name in fields:
+        columns.update(POST_FIELDS[name][0])
+    posts = Post.objects.only(*columns)
+    if 'author' in fields:
+        posts = posts.select_related('author')
+    return posts
+
+
+def post_json(post, fields):
+    return {name: POST_FIELDS[name][1](post) for name in fields}
+
+
+def page_link(request, cursor):
+    if cursor is None:
+        return None
+    query = request.GET.copy()
+    query['cursor'] = cursor
+    return f'{request.path}?{query.urlencode()}'
+
+
+def post_list_feeds(request):
+    if 'ids' in request.GET:
+        return ['index']
+    if request.GET.get('group'):
+        return [f'group:{request.GET["group"]}']
+    if request.GET.get('author'):
+        return [f'profile:{request.GET["author"]}']
+    # Любая правка поста сдвигает поколение главной
+    return ['index']
+
+
+def in_order(rows, ids):
+    """Объекты in_bulk в порядке запрошенных ids; ненайденных нет."""
+    return [rows[pk] for pk in ids if pk in rows]
+
+
+@api_view('GET', 'HEAD', 'POST')
+@api_condition(post_list_feeds)
+def post_list(request):
+    if request.method == 'POST':
+        return create_post(request)
+    fields = parse_fields(request, POST_FIELDS, POST_DEFAULT_FIELDS)
+    posts = posts_queryset(fields)
+    ids = parse_ids(request)
+    if ids is not None:
+        rows = posts.in_bulk(ids)
+        return api_response({
+            'results': [post_json(post, fields)
+                        for post in in_order(rows, ids)],
+        })
+    window = None
+    if request.GET.get('group'):
+        group = groups.get_group_or_404(request.GET['group'])
+        posts = posts.filter(group_id=group.pk)
+    elif request.GET.get('author'):
+        author = get_object_or_404(User.objects.only('id'),
+                                   username=request.GET['author'])
+        posts = posts.filter(author_id=author.pk)
+    else:
+        window = timeline.window
+    paginator = CursorPaginator(posts, parse_limit(request), ids=window)
+    try:
+        page = paginator.page(request.GET.get('cursor'))
+    except InvalidCursor:
+        raise ApiError(400, 'Неверный курсор')
+    return api_response({
+        'results': [post_json(post, fields) for post in page],
+        'next': page_link(request, page.next_cursor),
+        'previous': page_link(request, page.previous_cursor),
+    })
+
+
+def save_post(request, form, status):
+    if not form.is_valid():
+        return api_response({'errors': form.errors.get_json_data()}, 400)
+    post = form.save()
+    response = api_response(post_json(post, POST_DEFAULT_FIELDS), status)
+    response['Location'] = reverse('api_post', args=[post.pk])
+    return response
+
+
+def create_post(request):
+    require_user(request)
+    data = read_body(request)
+    form = PostForm({'text': data.get('text'), 'group': data.get('group')})
+    form.instance.author = request.user
+    return save_post(request, form, 201)
+
+
+@api_view('GET', 'HEAD', 'PATCH', 'DELETE')
+@api_condition(lambda request, post_id: ['index'])
+def post_detail(request, post_id):
+    if request.method in ('GET', 'HEAD'):
+        fields = parse_fields(request, POST_FIELDS, POST_DEFAULT_FIELDS)
+        post = get_object_or_404(posts_queryset(fields), pk=post_id)
+        return api_response(post_json(post, fields))
+    require_user(request)
+    post = get_object_or_404(Post, pk=post_id)
+    if post.author_id != request.user.pk:
+        raise ApiError(403, 'Менять пост может только автор')
+    if request.method == 'DELETE':
+        post.delete()
+        return HttpResponse(status=204)
+    data = read_body(request)
+    form = PostForm({
+        'text': data.get('text', post.text),
+        'group': data.get('group', post.group_id),
+    }, instance=post)
+    return save_post(request, form, 200)
+
+
+# posts_count меняется с каждым постом и читается из БД, только
+# если его запросили; остальное — из справочника
+GROUP_FIELDS = ('id', 'slug', 'title', 'description', 'posts_count')
+GROUP_DEFAULT_FIELDS = ('id', 'slug', 'title', 'description')
+
+
+def groups_json(found, fields):
+    counts = {}
+    if 'posts_count' in fields:
+        counts = dict(
+            Group.objects.filter(pk__in=[group.pk for group in found])
+            .values_list('id', 'posts_count')
+        )
+    return [
+        {name: counts.get(group.pk, 0) if name == 'posts_count'
+         else getattr(group, name) for name in fields}
+        for group in found
+    ]
+
+
+@api_view('GET', 'HEAD')
+@api_condition(lambda request: ['index'])
+def group_list(request):
+    fields = parse_fields(request, GROUP_FIELDS, GROUP_DEFAULT_FIELDS)
+    directory = groups.directory()
+    ids = parse_ids(request)
+    if ids is None:
+        found = list(directory)
+    else:
+        found = in_order(directory.by_id, ids)
+    return api_response({'results': groups_json(found, fields)})
+
+
+@api_view('GET', 'HEAD')
+@api_condition(lambda request, slug: [f'group:{slug}'])
+def group_detail(request, slug):
+    fields = parse_fields(request, GROUP_FIELDS, GROUP_DEFAULT_FIELDS)
+    group = groups.get_group_or_404(slug)
+    return api_response(groups_json([group], fields)[0])
+
+
+def stats(user):
+    try:
+        return user.stats
+    except User.stats.RelatedObjectDoesNotExist:
+        # Строки счётчиков ещё нет — у автора ни постов, ни подписок
+        return AuthorStats()
+
+
+USER_FIELDS = {
+    'id': ((), lambda user: user.pk),
+    'username': (('username',), lambda user: user.username),
+    'first_name': (('first_name',), lambda user: user.first_name),
+    'last_name': (('last_name',), lambda user: user.last_name),
+    'posts_count': (('stats__posts_count',),
+                    lambda user: stats(user).posts_count),
+    'followers_count': (('stats__followers_count',),
+                        lambda user: stats(user).followers_count),
+    'following_count': (('stats__following_count',),
+                        lambda user: stats(user).following_count),
+}
+USER_DEFAULT_FIELDS = tuple(USER_FIELDS)
+
+
+@api_view('GET', 'HEAD')
+@api_condition(lambda request, username: [f'profile:{username}'])
+def user_detail(request, username):
+    fields = parse_fields(request, USER_FIELDS, USER_DEFAULT_FIELDS)
+    columns = {'username'}
+    for name in fields:
+        columns.update(USER_FIELDS[name][0])
+    users = User.objects.only(*columns)
+    if any(column.startswith('stats__') for column in columns):
+        users = users.select_related('stats')
+    user = get_object_or_404(users, username=username)
+    return api_response({name: USER_FIELDS[name][1](user)
+                         for name in fields})
@@ -0,0 +1,11 @@
+from django.urls import path
+
+from . import api
+
+urlpatterns = [
+    path('posts/', api.post_list, name='api_posts'),
+    path('posts/<int:post_id>/', api.post_detail, name='api_post'),
+    path('groups/', api.group_list, name='api_groups'),
+    path('groups/<slug:slug>/', api.group_detail, name='api_group'),
+    path('users/<str:username>/', api.user_detail, name='api_user'),
+]
@@ -0,0 +1,65 @@
+"""
+Async-версии лент для запуска под ASGI (yatube.asgi).
+
+В Django 3.2 ORM синхронный, поэтому тело ленты — тот же код, что
+и в posts.views, — уходит в поток через timed_sync_to_async: так же под
+капотом устроены асинхронные методы ORM в новых версиях Django. В цикле
+событий остаются проверка ETag, кэш страниц и ожидание медленных
+клиентов.
+"""
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+
+from . import views
+from .conditional import feed_condition, post_condition
+from .page_cache import cache_feed_page
+from .timing import timed_sync_to_async
+
+
+def resolve_user(view):
+    """
+    request.user ленивый и при первом обращении читает сессию из БД,
+    что в async-коде запрещено. Без cookie сессии читатель заведомо
+    анонимный, и поток не нужен.
+    """
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if settings.SESSION_COOKIE_NAME in request.COOKIES:
+            await timed_sync_to_async(lambda: request.user.pk)()
+        else:
+            request.user = AnonymousUser()
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+@resolve_user
+@feed_condition('index')
+@cache_feed_page('index')
+async def index(request):
+    return await timed_sync_to_async(views.render_index)(request)
+
+
+@resolve_user
+@feed_condition('group', 'slug')
+@cache_feed_page('group', 'slug')
+async def group_posts(request, slug):
+    return await timed_sync_to_async(views.render_group)(request, slug)
+
+
+@resolve_user
+@feed_condition('profile', 'username')
+@cache_feed_page('profile', 'username')
+async def profile(request, username):
+    return await timed_sync_to_async(views.render_profile)(
+        request, username
+    )
+
+
+@resolve_user
+@post_condition
+async def post_view(request, username, post_id):
+    return await timed_sync_to_async(views.render_post)(
+        request, username, post_id
+    )
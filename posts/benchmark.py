@@ -0,0 +1,471 @@
+import http.client
+import itertools
+import json
+import logging
+import os
+import random
+import shlex
+import socket
+import subprocess
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import timedelta
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import (CaptureQueriesContext, override_settings,
+                               setup_test_environment,
+                               teardown_test_environment)
+from django.urls import URLResolver, get_resolver, reverse
+from django.utils import timezone
+from yatube.template_settings import templates
+
+from . import timeline
+from .bulk import keep_auto_dates
+from .counters import recount
+from .follows import fan_out_since
+from .groups import invalidate as invalidate_groups
+from .models import Follow, Group, Post, User
+from .search import index_missing
+from .timing import Jinja2
+
+# Чьи маршруты проходит бенчмарк
+BENCH_URLCONFS = ('posts.urls', 'users.urls', 'posts.api_urls')
+BENCH_USERNAME = 'bench-author'
+# Маршруты, которые меняют данные и отвечают только на POST
+POST_ONLY_ROUTES = ('profile_follow', 'profile_unfollow')
+# На скольких авторов подписан автор бенчмарка: лента /follow/
+BENCH_FOLLOWS = 2000
+# Запас по времени в мс: на быстрых маршрутах процент от долей
+# миллисекунды тонет в шуме
+LATENCY_SLACK_MS = 2
+
+# Команды запуска серверов для сравнения ASGI и WSGI
+SERVER_COMMANDS = {
+    'asgi': 'uvicorn yatube.asgi:application --host 127.0.0.1 '
+            '--port {port} --workers {workers} --no-access-log '
+            '--log-level warning',
+    'wsgi': 'gunicorn yatube.wsgi --bind 127.0.0.1:{port} '
+            '--workers {workers} --threads {threads} --log-level warning',
+}
+
+
+def seed(users, groups, posts, batch_size=5000, stdout=None):
+    """
+    Наполняет пустую базу: users авторов, groups сообществ и posts постов
+    с датами, разнесёнными на год назад; автор бенчмарка подписан на
+    BENCH_FOLLOWS пользователей. Пишет пачками через bulk_create в обход
+    сигналов, поэтому счётчики и ленты подписок в конце собираются
+    целиком.
+    """
+    def log(message):
+        if stdout is not None:
+            stdout.write(message)
+
+    with transaction.atomic():
+        author = User.objects.create_user(BENCH_USERNAME, password='bench')
+        User.objects.bulk_create(
+            (User(username=f'bench-user-{i}', password='!')
+             for i in range(users - 1)),
+            batch_size=batch_size,
+        )
+        Group.objects.bulk_create(
+            (Group(title=f'Сообщество {i}', slug=f'bench-group-{i}',
+                   description='')
+             for i in range(groups)),
+            batch_size=batch_size,
+        )
+    invalidate_groups()
+    user_ids = list(User.objects.values_list('id', flat=True))
+    Follow.objects.bulk_create(
+        (Follow(user_id=author.id, author_id=user_id)
+         for user_id in user_ids[:BENCH_FOLLOWS + 1]
+         if user_id != author.id),
+        batch_size=batch_size,
+    )
+    group_ids = list(Group.objects.values_list('id', flat=True)) + [None]
+    rng = random.Random(posts)
+    now = timezone.now()
+    step = timedelta(days=365) / max(posts, 1)
+    with keep_auto_dates(Post, 'pub_date', 'updated_at'):
+        for start in range(0, posts, batch_size):
+            with transaction.atomic():
+                Post.objects.bulk_create(
+                    Post(
+                        text=f'Тестовый пост {i}\nВторая строка',
+                        author_id=author.id if i % 10 == 0
+                        else rng.choice(user_ids),
+                        group_id=rng.choice(group_ids),
+                        pub_date=now - step * (posts - i),
+                        updated_at=now - step * (posts - i),
+                    )
+                    for i in range(start, min(start + batch_size, posts))
+                )
+            log(f'Постов: {min(start + batch_size, posts)} из {posts}')
+    recount()
+    index_missing(batch_size)
+    fan_out_since(0)
+    timeline.invalidate()
+    return author
+
+
+@contextmanager
+def test_database(keepdb=False):
+    """Отдельная тестовая база на время замера."""
+    setup_test_environment()
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(
+        verbosity=0, autoclobber=True, keepdb=keepdb
+    )
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(
+            old_name, verbosity=0, keepdb=keepdb
+        )
+        teardown_test_environment()
+
+
+def bench_author(users, groups, posts, stdout=None):
+    """Автор из прошлого наполнения базы или из нового."""
+    author = User.objects.filter(username=BENCH_USERNAME).first()
+    if author is None:
+        author = seed(users, groups, posts, stdout=stdout)
+    return author
+
+
+def bench_urls(urlconfs=BENCH_URLCONFS):
+    """Возвращает (имя маршрута, набор аргументов) для всех маршрутов."""
+    resolver = get_resolver()
+    for entry in resolver.url_patterns:
+        if not isinstance(entry, URLResolver):
+            continue
+        if getattr(entry.urlconf_module, '__name__', '') not in urlconfs:
+            continue
+        for pattern in entry.url_patterns:
+            if pattern.name and pattern.name not in POST_ONLY_ROUTES:
+                yield pattern.name, tuple(pattern.pattern.converters)
+
+
+def sample_kwargs(author):
+    post = author.posts.order_by('-pub_date', '-id').first()
+    group = (
+        Group.objects.filter(posts__author=author).first()
+        or Group.objects.first()
+    )
+    return {
+        'username': author.username,
+        'post_id': post.id if post else 0,
+        'slug': group.slug if group else 'missing',
+    }
+
+
+def percentile(values, share):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, round(share * (len(ordered) - 1)))
+    return ordered[index]
+
+
+def measure(client, url, repeat, cold=False):
+    timings, queries, size = [], 0, 0
+    for _ in range(repeat):
+        if cold:
+            cache.clear()
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = client.get(url)
+            timings.append((time.perf_counter() - started) * 1000)
+        queries = len(captured)
+        size = len(response.content)
+    return {
+        'status': response.status_code,
+        'queries': queries,
+        'p50_ms': round(percentile(timings, 0.5), 2),
+        'p95_ms': round(percentile(timings, 0.95), 2),
+        'bytes': size,
+    }
+
+
+def run(author, repeat=20, cold=False):
+    """Прогоняет все маршруты анонимно и от имени автора."""
+    kwargs = sample_kwargs(author)
+    clients = {'anon': Client(), 'auth': Client()}
+    clients['auth'].force_login(author)
+    results = {}
+    for name, converters in bench_urls():
+        url = reverse(name, kwargs={key: kwargs[key] for key in converters})
+        for mode, client in clients.items():
+            results[f'{name}|{mode}'] = dict(
+                measure(client, url, repeat, cold), url=url
+            )
+    return results
+
+
+def load_baseline(path):
+    with open(path, encoding='utf-8') as baseline:
+        return json.load(baseline)
+
+
+def save_baseline(path, results):
+    with open(path, 'w', encoding='utf-8') as baseline:
+        json.dump(results, baseline, indent=2, sort_keys=True,
+                  ensure_ascii=False)
+
+
+def regressions(results, baseline, tolerance):
+    """
+    Сравнивает прогон с эталоном. Число запросов должно совпадать
+    или уменьшиться, время и размер — не вырасти больше чем на tolerance.
+    """
+    found = []
+    for key, current in results.items():
+        expected = baseline.get(key)
+        if expected is None:
+            continue
+        if current['queries'] > expected['queries']:
+            found.append(f'{key}: запросов {expected["queries"]} -> '
+                         f'{current["queries"]}')
+        for metric, slack in (('p95_ms', LATENCY_SLACK_MS), ('bytes', 0)):
+            limit = expected[metric] * (1 + tolerance) + slack
+            if current[metric] > limit:
+                found.append(f'{key}: {metric} {expected[metric]} -> '
+                             f'{current[metric]}')
+    return found
+
+
+def wait_for_port(port, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), 1).close()
+            return True
+        except OSError:
+            time.sleep(0.1)
+    return False
+
+
+@contextmanager
+def serve(command, port, timeout=30, output=subprocess.DEVNULL):
+    """Запускает сервер командой command и ждёт, пока он займёт port."""
+    process = subprocess.Popen(
+        shlex.split(command), cwd=settings.BASE_DIR,
+        env=dict(os.environ, DJANGO_SETTINGS_MODULE='yatube.settings'),
+        stdout=output, stderr=output,
+    )
+    try:
+        if not wait_for_port(port, timeout):
+            raise RuntimeError(f'Сервер не запустился: {command}')
+        yield process
+    finally:
+        process.terminate()
+        process.wait(timeout)
+
+
+def load(url, concurrency, total, headers=None, timeout=30):
+    """
+    Нагрузка на url: concurrency клиентов с keep-alive делают вместе
+    total запросов. Возвращает запросы в секунду, перцентили задержки
+    и число ошибок — ответов 5xx и оборванных соединений.
+    """
+    parts = urlsplit(url)
+    path = (parts.path or '/') + (f'?{parts.query}' if parts.query else '')
+    tickets = itertools.count()
+
+    def client():
+        timings, errors = [], 0
+        connection = http.client.HTTPConnection(
+            parts.hostname, parts.port, timeout=timeout
+        )
+        while next(tickets) < total:
+            started = time.perf_counter()
+            try:
+                connection.request('GET', path, headers=headers or {})
+                response = connection.getresponse()
+                response.read()
+            except (OSError, http.client.HTTPException):
+                errors += 1
+                connection.close()
+                continue
+            timings.append((time.perf_counter() - started) * 1000)
+            if response.status >= 500:
+                errors += 1
+        connection.close()
+        return timings, errors
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = list(pool.map(lambda _: client(), range(concurrency)))
+    elapsed = time.perf_counter() - started
+    timings = [value for chunk, _ in results for value in chunk]
+    if not timings:
+        timings = [0]
+    return {
+        'rps': round(len(timings) / elapsed, 1),
+        'p50_ms': round(percentile(timings, 0.5), 2),
+        'p95_ms': round(percentile(timings, 0.95), 2),
+        'p99_ms': round(percentile(timings, 0.99), 2),
+        'errors': sum(errors for _, errors in results),
+    }
+
+
+def transfer(url, encoding, repeat, headers=None, timeout=30):
+    """
+    Размер ответа на проводе и время до первого байта тела (TTFB) для
+    Accept-Encoding: encoding. Каждый запрос — новое соединение, как
+    у первого захода на страницу.
+    """
+    parts = urlsplit(url)
+    path = (parts.path or '/') + (f'?{parts.query}' if parts.query else '')
+    headers = dict(headers or {}, **{'Accept-Encoding': encoding})
+    ttfb, totals = [], []
+    for _ in range(repeat):
+        connection = http.client.HTTPConnection(
+            parts.hostname, parts.port, timeout=timeout
+        )
+        try:
+            started = time.perf_counter()
+            connection.request('GET', path, headers=headers)
+            response = connection.getresponse()
+            body = response.read(1)
+            ttfb.append((time.perf_counter() - started) * 1000)
+            body += response.read()
+            totals.append((time.perf_counter() - started) * 1000)
+        finally:
+            connection.close()
+    return {
+        'status': response.status,
+        'encoding': response.getheader('Content-Encoding', 'identity'),
+        'bytes': len(body),
+        'ttfb_p50_ms': round(percentile(ttfb, 0.5), 2),
+        'ttfb_p95_ms': round(percentile(ttfb, 0.95), 2),
+        'total_p50_ms': round(percentile(totals, 0.5), 2),
+    }
+
+
+def feed_urls(author):
+    kwargs = sample_kwargs(author)
+    return {
+        'index': reverse('index'),
+        'group': reverse('group', kwargs={'slug': kwargs['slug']}),
+        'profile': reverse('profile',
+                           kwargs={'username': kwargs['username']}),
+    }
+
+
+def template_modes():
+    """Настройки TEMPLATES, которые сравнивает бенчмарк шаблонов."""
+    directory = settings.TEMPLATES_DIR
+    modes = {
+        'django': templates(directory),
+        'cached': templates(directory, cache=True),
+        'flattened': templates(directory, cache=True, flatten=True),
+    }
+    if Jinja2 is not None:
+        modes['jinja2'] = templates(directory, cache=True, flatten=True,
+                                    jinja2=True)
+    return modes
+
+
+class TimingRecords(logging.Handler):
+    """Собирает JSON-записи замеров из лога yatube.timing."""
+
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(json.loads(record.getMessage()))
+
+
+def profile_templates(author, repeat=50):
+    """
+    Время рендера лент в каждом режиме шаблонов: p50/p95 по замеру
+    middleware и разбивка по шаблонам и include последнего запроса.
+    Запросы идут от имени автора, чтобы не попадать в кэш страниц.
+    """
+    urls = feed_urls(author)
+    client = Client()
+    client.force_login(author)
+    logger = logging.getLogger('yatube.timing')
+    handler = TimingRecords()
+    # На время замера записи идут только в сборщик, не в консоль
+    saved_handlers, logger.handlers = logger.handlers, [handler]
+    results = {}
+    try:
+        for mode, config in template_modes().items():
+            with override_settings(TEMPLATES=config,
+                                   REQUEST_TIMING_SAMPLE_RATE=1,
+                                   REQUEST_TIMING_PROFILE_TEMPLATES=True):
+                for name, url in urls.items():
+                    # Первый запрос прогревает загрузчики шаблонов
+                    client.get(url)
+                    handler.records.clear()
+                    for _ in range(repeat):
+                        client.get(url)
+                    timings = [
+                        record['template_ms'] for record in handler.records
+                    ]
+                    results[f'{name}|{mode}'] = {
+                        'p50_ms': round(percentile(timings, 0.5), 2),
+                        'p95_ms': round(percentile(timings, 0.95), 2),
+                        'templates': handler.records[-1]['templates'],
+                    }
+    finally:
+        logger.handlers = saved_handlers
+    return results
+
+
+def consume(client, url):
+    """(мс до первого куска, мс до конца, байт) одного запроса."""
+    started = time.perf_counter()
+    response = client.get(url)
+    if not response.streaming:
+        elapsed = (time.perf_counter() - started) * 1000
+        return elapsed, elapsed, len(response.content)
+    first, size = None, 0
+    for chunk in response.streaming_content:
+        if first is None:
+            first = (time.perf_counter() - started) * 1000
+        size += len(chunk)
+    return first, (time.perf_counter() - started) * 1000, size
+
+
+def profile_streaming(author, per_page=100, repeat=20):
+    """
+    Обычный render() против потокового рендера лент с per_page постами
+    на странице: время до первого куска, время до конца и пик памяти
+    Python на запрос. Память меряется отдельным проходом: tracemalloc
+    замедляет рендер.
+    """
+    urls = feed_urls(author)
+    client = Client()
+    client.force_login(author)
+    results = {}
+    for mode in ('render', 'stream'):
+        with override_settings(FEED_STREAMING=mode == 'stream',
+                               POSTS_PER_PAGE=per_page):
+            for name, url in urls.items():
+                consume(client, url)
+                first, total = [], []
+                for _ in range(repeat):
+                    first_ms, total_ms, size = consume(client, url)
+                    first.append(first_ms)
+                    total.append(total_ms)
+                tracemalloc.start()
+                try:
+                    consume(client, url)
+                    _, peak = tracemalloc.get_traced_memory()
+                finally:
+                    tracemalloc.stop()
+                results[f'{name}|{mode}'] = {
+                    'first_p50_ms': round(percentile(first, 0.5), 2),
+                    'total_p50_ms': round(percentile(total, 0.5), 2),
+                    'peak_kb': round(peak / 1024, 1),
+                    'bytes': size,
+                }
+    return results
@@ -0,0 +1,21 @@
+from contextlib import contextmanager
+
+
+@contextmanager
+def keep_auto_dates(model, *field_names):
+    """
+    Отключает auto_now/auto_now_add у полей модели, чтобы bulk_create
+    записал даты из объектов, а не текущее время.
+
+    Меняет поля на уровне класса, поэтому предназначен для команд
+    управления, а не для кода, который работает в потоках сервера.
+    """
+    fields = [model._meta.get_field(name) for name in field_names]
+    saved = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, saved):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
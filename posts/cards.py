@@ -0,0 +1,54 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils.html import format_html
+
+GENERATION_KEY = 'post_card:generation'
+# Место в закэшированной карточке, куда подставляется ссылка
+# на редактирование: она зависит от пользователя и в кэш не попадает
+EDIT_LINK_SLOT = '<!-- post-edit-link -->'
+
+
+def get_generation():
+    return cache.get_or_set(GENERATION_KEY, 1, None)
+
+
+def bump_generation():
+    """Сбрасывает все карточки: меняются имена авторов или сообществ."""
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, 1, None)
+
+
+def card_key(post, generation):
+    # pub_date защищает от повторного использования id после удаления
+    return (
+        f'post_card:{generation}:{post.pk}:{post.version}:'
+        f'{post.pub_date.timestamp()}'
+    )
+
+
+def edit_link(post):
+    url = reverse('post_edit', args=[post.author.username, post.pk])
+    return format_html(
+        '<a class="btn btn-sm text-muted" href="{}" role="button">'
+        'Редактировать</a>',
+        url
+    )
+
+
+def render_card(post, user=None, generation=None):
+    if generation is None:
+        generation = get_generation()
+    key = card_key(post, generation)
+    html = cache.get(key)
+    if html is None:
+        html = render_to_string('includes/post_card.html', {'post': post})
+        cache.set(key, html, settings.POST_CARD_CACHE_TIMEOUT)
+    link = ''
+    if (user is not None and user.is_authenticated
+            and user.pk == post.author_id):
+        link = edit_link(post)
+    return html.replace(EDIT_LINK_SLOT, link, 1)
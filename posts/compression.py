@@ -0,0 +1,89 @@
+"""
+Сжатие ответов и статики: gzip из стандартной библиотеки и brotli,
+если установлен пакет brotli.
+"""
+import re
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Расширение файла с вариантом в этой кодировке
+SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+ACCEPT_RE = re.compile(r'\s*([^\s;,]+)\s*(?:;\s*q=([0-9.]+))?')
+
+
+def available():
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def negotiate(accept_encoding, encodings):
+    """
+    Первая из encodings, которую принимает клиент; None, если ни одной.
+    encodings перечислены в порядке предпочтения сервера.
+    """
+    accepted = {}
+    for part in accept_encoding.split(','):
+        match = ACCEPT_RE.match(part)
+        if not match:
+            continue
+        try:
+            quality = float(match.group(2) or 1)
+        except ValueError:
+            continue
+        accepted[match.group(1).lower()] = quality
+    for encoding in encodings:
+        quality = accepted.get(encoding, accepted.get('*', 0))
+        if quality > 0:
+            return encoding
+    return None
+
+
+class Compressor:
+    """Потоковый компрессор с общим интерфейсом для gzip и brotli."""
+
+    def __init__(self, encoding, level):
+        self.encoding = encoding
+        if encoding == 'br':
+            self.compressor = brotli.Compressor(
+                mode=brotli.MODE_TEXT, quality=level
+            )
+        else:
+            # wbits=31 — заголовок и контрольная сумма gzip
+            self.compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        if self.encoding == 'br':
+            return self.compressor.process(data)
+        return self.compressor.compress(data)
+
+    def flush(self):
+        """Выталкивает всё сжатое до этого места, не закрывая поток."""
+        if self.encoding == 'br':
+            return self.compressor.flush()
+        return self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        if self.encoding == 'br':
+            return self.compressor.finish()
+        return self.compressor.flush(zlib.Z_FINISH)
+
+
+def compress(data, encoding, level):
+    compressor = Compressor(encoding, level)
+    return compressor.compress(data) + compressor.finish()
+
+
+def compress_stream(chunks, encoding, level):
+    """
+    Сжимает поток по кускам. Каждый кусок выталкивается сразу, чтобы
+    клиент получал начало страницы, пока рендерится остальное.
+    """
+    compressor = Compressor(encoding, level)
+    for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
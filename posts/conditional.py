@@ -0,0 +1,123 @@
+import asyncio
+import hashlib
+from calendar import timegm
+from datetime import datetime, timezone
+from functools import wraps
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import condition
+
+from .page_cache import current_generations, feeds_for
+from .models import Post
+from .timing import timed_sync_to_async
+
+
+def make_etag(*parts):
+    raw = ':'.join(str(part) for part in parts)
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def from_timestamp(stamp):
+    return datetime.fromtimestamp(stamp, tz=timezone.utc)
+
+
+def conditional(etag_func, last_modified_func, blocking=False):
+    """
+    condition из Django, который умеет оборачивать и async-view.
+    blocking — функции ходят в БД: для async-view их вызываем в потоке,
+    иначе прямо в цикле событий.
+    """
+    def validators(request, *args, **kwargs):
+        etag = etag_func(request, *args, **kwargs)
+        last_modified = last_modified_func(request, *args, **kwargs)
+        return (
+            quote_etag(etag) if etag is not None else None,
+            timegm(last_modified.utctimetuple()) if last_modified else None,
+        )
+
+    def decorator(view):
+        if not asyncio.iscoroutinefunction(view):
+            return condition(etag_func=etag_func,
+                             last_modified_func=last_modified_func)(view)
+
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if blocking:
+                etag, last_modified = await timed_sync_to_async(
+                    validators
+                )(request, *args, **kwargs)
+            else:
+                etag, last_modified = validators(request, *args, **kwargs)
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified
+            )
+            if response is None:
+                response = await view(request, *args, **kwargs)
+            if request.method in ('GET', 'HEAD'):
+                if last_modified and not response.has_header('Last-Modified'):
+                    response['Last-Modified'] = http_date(last_modified)
+                if etag:
+                    response.headers.setdefault('ETag', etag)
+            return response
+        return wrapper
+    return decorator
+
+
+def feed_condition(feed, kwarg=None):
+    """
+    ETag и Last-Modified для ленты по отметкам изменения из page_cache:
+    они учитывают и правки, и удаления постов, и не требуют запросов к БД.
+    Страница зависит от пользователя (меню, ссылки на редактирование),
+    поэтому его id входит в ETag.
+    """
+    def generations(request, kwargs):
+        if not hasattr(request, '_feed_generations'):
+            request._feed_generations = current_generations(
+                feeds_for(feed, kwarg, kwargs)
+            )
+        return request._feed_generations
+
+    def etag(request, *args, **kwargs):
+        return make_etag(
+            feed, *generations(request, kwargs),
+            request.GET.get('cursor', ''), request.user.pk,
+        )
+
+    def last_modified(request, *args, **kwargs):
+        return from_timestamp(max(generations(request, kwargs)))
+
+    return conditional(etag, last_modified)
+
+
+def post_state(request, username, post_id):
+    if not hasattr(request, '_post_state'):
+        request._post_state = (
+            Post.objects.filter(pk=post_id, author__username=username)
+            .values_list('version', 'updated_at')
+            .first()
+        )
+    return request._post_state
+
+
+def post_etag(request, username, post_id):
+    state = post_state(request, username, post_id)
+    if state is None:
+        return None
+    generations = current_generations(
+        feeds_for('profile', 'username', {'username': username})
+    )
+    return make_etag('post', post_id, *state, *generations, request.user.pk)
+
+
+def post_last_modified(request, username, post_id):
+    state = post_state(request, username, post_id)
+    if state is None:
+        return None
+    generations = current_generations(
+        feeds_for('profile', 'username', {'username': username})
+    )
+    return max(state[1], from_timestamp(max(generations)))
+
+
+post_condition = conditional(post_etag, post_last_modified, blocking=True)
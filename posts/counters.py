@@ -0,0 +1,137 @@
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+
+from .models import AuthorStats, Follow, Group, Post, User
+
+# Счётчики AuthorStats и то, что каждый из них считает
+STATS_FIELDS = {
+    'posts_count': (Post, 'author_id'),
+    'followers_count': (Follow, 'author_id'),
+    'following_count': (Follow, 'user_id'),
+}
+
+
+def bump_group(group_id, delta):
+    if group_id is None:
+        return
+    Group.objects.filter(pk=group_id).update(
+        posts_count=Greatest(F('posts_count') + delta, 0)
+    )
+
+
+def bump_stats(user_id, field, delta, create=True):
+    if user_id is None:
+        return
+    updated = AuthorStats.objects.filter(user_id=user_id).update(
+        **{field: Greatest(F(field) + delta, 0)}
+    )
+    if not updated and create:
+        # Строки ещё нет: считаем один раз честно, дальше — инкрементами
+        AuthorStats.objects.get_or_create(
+            user_id=user_id,
+            defaults={
+                name: model.objects.filter(**{column: user_id}).count()
+                for name, (model, column) in STATS_FIELDS.items()
+            },
+        )
+
+
+def bump_author(user_id, delta):
+    bump_stats(user_id, 'posts_count', delta)
+
+
+def bump_follow(user_id, author_id, delta):
+    # Без строки уменьшать нечего: её создаст следующая подписка, честным
+    # подсчётом. Создать её здесь нельзя — подписки удаляются и каскадом
+    # вместе с пользователем
+    create = delta > 0
+    bump_stats(user_id, 'following_count', delta, create)
+    bump_stats(author_id, 'followers_count', delta, create)
+
+
+def sync_posts_counts(author_ids, group_ids):
+    """
+    Записывает точное число постов указанных авторов и групп. В отличие
+    от инкрементов не зависит от порядка и повторов — для фоновой
+    задачи, которая выполняется позже записи и может быть перезапущена.
+    """
+    def counts(column, ids):
+        return dict(
+            Post.objects.filter(**{f'{column}__in': ids})
+            .values_list(column)
+            .annotate(n=Count('id'))
+            .order_by()
+        )
+
+    group_counts = counts('group_id', group_ids)
+    for group_id in group_ids:
+        Group.objects.filter(pk=group_id).update(
+            posts_count=group_counts.get(group_id, 0)
+        )
+    author_counts = counts('author_id', author_ids)
+    missing = [
+        user_id for user_id in author_ids
+        if not AuthorStats.objects.filter(user_id=user_id).update(
+            posts_count=author_counts.get(user_id, 0)
+        )
+    ]
+    # Автор мог быть удалён, пока задача ждала в очереди
+    for user_id in User.objects.filter(pk__in=missing).values_list(
+            'pk', flat=True):
+        bump_stats(user_id, 'posts_count', 0)
+
+
+def recount(batch_size=1000):
+    """
+    Пересчитывает счётчики по таблице постов.
+    Возвращает число исправленных групп и авторов.
+    """
+    fixed_groups = []
+    groups = Group.objects.annotate(actual=Count('posts')).only(
+        'id', 'posts_count'
+    )
+    for group in groups.iterator():
+        if group.posts_count != group.actual:
+            group.posts_count = group.actual
+            fixed_groups.append(group)
+    Group.objects.bulk_update(fixed_groups, ['posts_count'],
+                              batch_size=batch_size)
+
+    fields = list(STATS_FIELDS)
+    actual = {}
+    for name, (model, column) in STATS_FIELDS.items():
+        counts = (
+            model.objects.filter(**{f'{column}__isnull': False})
+            .values_list(column)
+            .annotate(n=Count('id'))
+            .order_by()
+        )
+        for user_id, count in counts:
+            actual.setdefault(user_id, dict.fromkeys(fields, 0))[name] = count
+    stored = {
+        row[0]: dict(zip(fields, row[1:]))
+        for row in AuthorStats.objects.values_list('user_id', *fields)
+    }
+    zero = dict.fromkeys(fields, 0)
+    fixed_stats = [
+        AuthorStats(user_id=user_id, **actual.get(user_id, zero))
+        for user_id, counts in stored.items()
+        if counts != actual.get(user_id, zero)
+    ]
+    AuthorStats.objects.bulk_update(fixed_stats, fields,
+                                    batch_size=batch_size)
+    missing = [
+        AuthorStats(user_id=user_id, **counts)
+        for user_id, counts in actual.items()
+        if user_id not in stored
+    ]
+    AuthorStats.objects.bulk_create(missing, batch_size=batch_size)
+    return len(fixed_groups), len(fixed_stats) + len(missing)
+
+
+def author_posts_count(user):
+    try:
+        return user.stats.posts_count
+    except User.stats.RelatedObjectDoesNotExist:
+        return 0
+
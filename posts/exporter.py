@@ -0,0 +1,108 @@
+import csv
+import json
+from datetime import datetime, time
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Post
+from .paginator import NEXT, keyset_filter
+
+EXPORT_FIELDS = ('id', 'author', 'group', 'text', 'pub_date')
+
+
+class ExportFilterError(ValueError):
+    pass
+
+
+def parse_bound(value):
+    """Граница периода: дата-время в ISO или просто дата."""
+    if not value:
+        return None
+    try:
+        moment = parse_datetime(value)
+        day = None if moment is not None else parse_date(value)
+    except ValueError:
+        # Формат верный, но такой даты нет: 2020-02-30, 13-й месяц
+        raise ExportFilterError(f'Неверная дата: {value}')
+    if moment is None:
+        if day is None:
+            raise ExportFilterError(f'Неверная дата: {value}')
+        moment = datetime.combine(day, time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def export_queryset(group_id=None, author_id=None, since=None, until=None):
+    # Фильтры идут по колонкам составных индексов (group|author, pub_date)
+    posts = Post.objects.all()
+    if group_id is not None:
+        posts = posts.filter(group_id=group_id)
+    if author_id is not None:
+        posts = posts.filter(author_id=author_id)
+    if since is not None:
+        posts = posts.filter(pub_date__gte=since)
+    if until is not None:
+        posts = posts.filter(pub_date__lt=until)
+    return posts.values_list(
+        'id', 'author__username', 'group__slug', 'text', 'pub_date'
+    )
+
+
+def export_rows(queryset, batch_size=1000):
+    """
+    Отдаёт строки пачками по ключу (pub_date, id) от новых к старым.
+    Каждая пачка — отдельный запрос от курсора по индексу, который
+    читается через iterator(), так что в памяти не больше одной пачки.
+    """
+    ordered = queryset.order_by('-pub_date', '-id')
+    batch = ordered
+    while True:
+        last = None
+        for row in batch[:batch_size].iterator(chunk_size=batch_size):
+            last = row
+            yield row
+        if last is None:
+            return
+        post_id, pub_date = last[0], last[4]
+        batch = ordered.filter(keyset_filter(NEXT, pub_date, post_id))
+
+
+def as_dict(row):
+    post_id, author, group, text, pub_date = row
+    return {
+        'id': post_id,
+        'author': author,
+        'group': group,
+        'text': text,
+        'pub_date': pub_date.isoformat(),
+    }
+
+
+class Echo:
+    """Объект-«файл» для csv.writer, который просто возвращает строку."""
+
+    def write(self, value):
+        return value
+
+
+def render_jsonl(rows):
+    for row in rows:
+        yield json.dumps(as_dict(row), ensure_ascii=False) + '\n'
+
+
+def render_csv(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in rows:
+        record = as_dict(row)
+        yield writer.writerow(
+            [record[field] or '' for field in EXPORT_FIELDS]
+        )
+
+
+RENDERERS = {
+    'jsonl': (render_jsonl, 'application/x-ndjson; charset=utf-8'),
+    'csv': (render_csv, 'text/csv; charset=utf-8'),
+}
@@ -0,0 +1,173 @@
+"""
+Подписки и лента /follow/.
+
+Лента собирается при записи: новый пост пачками по
+FOLLOW_FANOUT_BATCH_SIZE раскладывается во входящие (InboxEntry) всех
+подписчиков автора, и страница ленты читается по одному индексу
+(user, pub_date, post), сколько бы авторов ни было в подписках.
+
+Авторов, чьи посты разносить слишком дорого — больше
+FOLLOW_FANOUT_MAX_FOLLOWERS подписчиков или больше
+FOLLOW_PULL_POSTS_PER_DAY постов за сутки, — флаг AuthorStats.pull_feed
+навсегда переводит на чтение: их посты страница подмешивает запросом
+по индексу (author, pub_date). Разложенное до перехода остаётся
+во входящих, повторы при слиянии склеиваются.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import AuthorStats, Follow, InboxEntry, Post
+from .paginator import PREVIOUS, CursorPaginator
+
+
+def is_following(user, author):
+    if not user.is_authenticated or user.pk == author.pk:
+        return False
+    return Follow.objects.filter(user=user, author=author).exists()
+
+
+def follow(user, author):
+    """Подписывает user на author; на себя подписаться нельзя."""
+    if user.pk != author.pk:
+        Follow.objects.get_or_create(user=user, author=author)
+
+
+def unfollow(user, author):
+    Follow.objects.filter(user=user, author=author).delete()
+
+
+def deliver(user_ids, rows):
+    """Кладёт посты rows — пары (id, дата) — во входящие user_ids."""
+    InboxEntry.objects.bulk_create(
+        (InboxEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+         for user_id in user_ids for post_id, pub_date in rows),
+        batch_size=settings.FOLLOW_FANOUT_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def followers(author_id):
+    """id подписчиков пачками: по индексу (author, user), без OFFSET."""
+    last = 0
+    while True:
+        batch = list(
+            Follow.objects.filter(author_id=author_id, user_id__gt=last)
+            .order_by('user_id')
+            .values_list('user_id', flat=True)
+            [:settings.FOLLOW_FANOUT_BATCH_SIZE]
+        )
+        if not batch:
+            return
+        yield batch
+        last = batch[-1]
+
+
+def pulls(author_id):
+    """
+    Читаются ли посты автора при открытии ленты. Решение принимается
+    при публикации и не отменяется: иначе посты, написанные в режиме
+    чтения, пропали бы из лент.
+    """
+    stats = (
+        AuthorStats.objects.filter(user_id=author_id)
+        .values_list('pull_feed', 'followers_count')
+        .first()
+    )
+    if stats is None or not stats[1]:
+        return False
+    pull_feed, followers_count = stats
+    if pull_feed:
+        return True
+    limit = settings.FOLLOW_PULL_POSTS_PER_DAY
+    recent = Post.objects.filter(
+        author_id=author_id,
+        pub_date__gte=timezone.now() - timedelta(days=1),
+    )[:limit + 1].count()
+    if (followers_count > settings.FOLLOW_FANOUT_MAX_FOLLOWERS
+            or recent > limit):
+        AuthorStats.objects.filter(user_id=author_id).update(pull_feed=True)
+        return True
+    return False
+
+
+def fan_out(post):
+    if post.author_id is None or pulls(post.author_id):
+        return
+    for batch in followers(post.author_id):
+        deliver(batch, [(post.pk, post.pub_date)])
+
+
+def fan_out_since(post_id):
+    """
+    Раскладывает посты с id больше post_id — для массовой загрузки
+    через bulk_create, которая не шлёт сигналов.
+    """
+    rows = {}
+    for pk, author_id, pub_date in (
+            Post.objects.filter(pk__gt=post_id, author__isnull=False)
+            .values_list('id', 'author_id', 'pub_date').iterator()):
+        rows.setdefault(author_id, []).append((pk, pub_date))
+    for author_id, posts in rows.items():
+        if pulls(author_id):
+            continue
+        for batch in followers(author_id):
+            deliver(batch, posts)
+
+
+def backfill(user_id, author_id):
+    """Новому подписчику — последние FOLLOW_BACKFILL постов автора."""
+    if pulls(author_id):
+        return
+    deliver([user_id], list(
+        Post.objects.filter(author_id=author_id)
+        .order_by('-pub_date', '-id')
+        .values_list('id', 'pub_date')[:settings.FOLLOW_BACKFILL]
+    ))
+
+
+def drop(user_id, author_id):
+    InboxEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+
+
+def pulled_authors(user):
+    return list(
+        Follow.objects.filter(user=user, author__stats__pull_feed=True)
+        .values_list('author_id', flat=True)
+    )
+
+
+def following_posts(user, pulled):
+    condition = Q(id__in=InboxEntry.objects.filter(user=user)
+                  .values('post_id'))
+    if pulled:
+        condition |= Q(author_id__in=pulled)
+    return Post.objects.for_feed().filter(condition)
+
+
+def window(user, pulled):
+    """
+    Источник ids для CursorPaginator ленты: страница входящих, слитая
+    со страницей постов авторов из pulled.
+    """
+    def ids(cursor, per_page):
+        direction, entries = CursorPaginator(
+            InboxEntry.objects.filter(user=user)
+            .values_list('pub_date', 'post_id'),
+            per_page, pk_field='post_id',
+        ).queryset_for(cursor)
+        rows = {pk: (pub_date, pk) for pub_date, pk in entries}
+        if pulled:
+            _, posts = CursorPaginator(
+                Post.objects.filter(author_id__in=pulled)
+                .values_list('pub_date', 'id'),
+                per_page,
+            ).queryset_for(cursor)
+            rows.update((pk, (pub_date, pk)) for pub_date, pk in posts)
+        rows = sorted(rows.values(), reverse=direction != PREVIOUS)
+        return direction, [pk for _, pk in rows[:per_page + 1]]
+    return ids
@@ -1,5 +1,6 @@
 from django.forms import ModelForm
 
+from .groups import DirectoryChoiceIterator
 from .models import Post
 
 
@@ -15,3 +16,7 @@ class PostForm(ModelForm):
             'group': 'Сообщества',
             'text': 'Текст записи',
         }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['group'].iterator = DirectoryChoiceIterator
@@ -0,0 +1,101 @@
+"""
+Справочник сообществ: вся таблица Group в памяти процесса и в общем кэше.
+
+Сообщества меняются редко, а читаются на каждой странице сообщества
+и в каждой форме поста. Процесс сверяет свою копию с версией в БД не
+чаще раза в GROUP_DIRECTORY_LOCAL_TTL секунд: версия — число групп
+и последний updated_at, один агрегатный запрос. Так правку из другого
+процесса видно и без общего кэша; сама таблица по версии берётся
+из кэша. Сохранение или удаление Group в этом процессе сбрасывает
+его копию сразу.
+"""
+import copy
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.forms.models import ModelChoiceIterator
+from django.http import Http404
+
+from .models import Group
+
+# Копии таблицы под старыми версиями больше не читаются
+DIRECTORY_TIMEOUT = 60 * 60 * 24
+# posts_count меняется с каждым постом, поэтому в справочник не входит
+FIELDS = ('id', 'title', 'slug', 'description')
+
+
+class GroupDirectory:
+    def __init__(self, rows):
+        self.groups = [Group.from_db('default', FIELDS, row) for row in rows]
+        self.by_id = {group.id: group for group in self.groups}
+        self.by_slug = {group.slug: group for group in self.groups}
+
+    def __len__(self):
+        return len(self.groups)
+
+    def __iter__(self):
+        return iter(self.groups)
+
+
+_local = {'version': None, 'checked': 0.0, 'directory': None}
+
+
+def current_version():
+    # Удаление уменьшает число групп, создание и правка сдвигают
+    # последний updated_at
+    state = Group.objects.aggregate(count=Count('id'),
+                                    changed=Max('updated_at'))
+    changed = state['changed'].timestamp() if state['changed'] else 0
+    return f'{state["count"]}:{changed}'
+
+
+def load(version):
+    key = f'groups:directory:{version}'
+    rows = cache.get(key)
+    if rows is None:
+        rows = list(Group.objects.order_by('id').values_list(*FIELDS))
+        cache.set(key, rows, DIRECTORY_TIMEOUT)
+    return GroupDirectory(rows)
+
+
+def directory():
+    now = time.monotonic()
+    if (_local['directory'] is not None and now - _local['checked']
+            < settings.GROUP_DIRECTORY_LOCAL_TTL):
+        return _local['directory']
+    version = current_version()
+    if version != _local['version'] or _local['directory'] is None:
+        _local['directory'] = load(version)
+        _local['version'] = version
+    _local['checked'] = now
+    return _local['directory']
+
+
+def invalidate():
+    _local['directory'] = None
+
+
+def get_group_or_404(slug):
+    group = directory().by_slug.get(slug)
+    if group is None:
+        raise Http404('Сообщество не найдено')
+    # Копия, чтобы view не испортил общий экземпляр
+    return copy.copy(group)
+
+
+class DirectoryChoiceIterator(ModelChoiceIterator):
+    """Варианты поля group в PostForm из справочника, без запроса к БД."""
+
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ('', self.field.empty_label)
+        for group in directory():
+            yield self.choice(group)
+
+    def __len__(self):
+        return len(directory()) + (self.field.empty_label is not None)
+
+    def __bool__(self):
+        return self.field.empty_label is not None or bool(len(directory()))
@@ -0,0 +1,162 @@
+"""
+Очередь фоновых задач в таблице Job.
+
+Задача ставится в той же транзакции, что и запись, которая её
+породила: Post.save и Follow.save идут в transaction.atomic, удаление
+(Collector) — тоже, так что откат записи отменяет и задачу, а сбой
+при постановке задачи отменяет запись. Вызывающий enqueue вне
+сигналов модели сам отвечает за транзакцию. Обработчик (manage.py
+run_jobs) забирает задачи пачками, помечая их своим токеном до
+locked_until, — упавший обработчик не держит задачи вечно.
+
+Задачи одного имени из пачки с batch=True выполняются одним вызовом
+со списком аргументов: десять правок счётчиков одного автора
+становятся одним UPDATE. Задача и её удаление из очереди — одна
+транзакция. Ошибка откладывает задачу на JOB_RETRY_DELAY * 2 ** попытки
+секунд, после JOB_MAX_ATTEMPTS попыток она остаётся в таблице
+со статусом failed.
+
+С JOBS_EAGER задачи выполняются сразу, без очереди и обработчика.
+По умолчанию выключено; включают тесты, которым нужны последствия
+записи сразу (override_settings), и, при желании,
+разработка без запущенного run_jobs.
+
+Задачи сдвигают поколения лент в кэше, поэтому run_jobs работает
+только с кэшем, общим с веб-процессами (CACHE_BACKEND): в памяти
+своего процесса он сдвигал бы их впустую, и сайт до часа отдавал бы
+страницы с устаревшими счётчиками.
+"""
+import logging
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger('yatube.jobs')
+
+# Имя задачи -> (функция, batch)
+TASKS = {}
+# Кэши, которые не видны другим процессам
+LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def task(name, batch=False):
+    """
+    Регистрирует задачу. Обычная получает аргументы enqueue как
+    именованные, пакетная — список словарей аргументов.
+    """
+    def decorator(func):
+        TASKS[name] = (func, batch)
+        return func
+    return decorator
+
+
+def execute(name, payloads):
+    func, batch = TASKS[name]
+    if batch:
+        func(payloads)
+    else:
+        for payload in payloads:
+            func(**payload)
+
+
+def shared_cache():
+    return settings.CACHES['default']['BACKEND'] not in LOCAL_CACHES
+
+
+def enqueue(name, **payload):
+    if name not in TASKS:
+        raise LookupError(f'Неизвестная задача: {name}')
+    if settings.JOBS_EAGER:
+        execute(name, [payload])
+        return None
+    return Job.objects.create(name=name, payload=payload)
+
+
+def claim(limit, worker):
+    now = timezone.now()
+    free = Q(locked_until__isnull=True) | Q(locked_until__lt=now)
+    ids = list(
+        Job.objects.filter(free, state=Job.PENDING, run_at__lte=now)
+        .order_by('id')
+        .values_list('id', flat=True)[:limit]
+    )
+    if not ids:
+        return []
+    token = f'{worker}:{uuid.uuid4().hex}'
+    # Условие повторяется в UPDATE: задачу, которую между SELECT
+    # и UPDATE забрал другой обработчик, второй раз не возьмём
+    Job.objects.filter(free, id__in=ids).update(
+        locked_until=now + timedelta(seconds=settings.JOB_LEASE_SECONDS),
+        locked_by=token,
+    )
+    return list(Job.objects.filter(locked_by=token).order_by('id'))
+
+
+def fail(jobs, error):
+    now = timezone.now()
+    for job in jobs:
+        job.attempts += 1
+        job.last_error = error
+        job.locked_until = None
+        job.locked_by = ''
+        if job.attempts >= settings.JOB_MAX_ATTEMPTS:
+            job.state = Job.FAILED
+        else:
+            job.run_at = now + timedelta(
+                seconds=settings.JOB_RETRY_DELAY * 2 ** (job.attempts - 1)
+            )
+    Job.objects.bulk_update(
+        jobs, ['attempts', 'last_error', 'locked_until', 'locked_by',
+               'state', 'run_at']
+    )
+
+
+def run(jobs):
+    """Выполняет задачи одного имени одним вызовом; True — успешно."""
+    try:
+        with transaction.atomic():
+            execute(jobs[0].name, [job.payload for job in jobs])
+            Job.objects.filter(id__in=[job.id for job in jobs]).delete()
+    except Exception:
+        error = traceback.format_exc()
+        logger.warning('Задача %s не выполнена:\n%s', jobs[0].name, error)
+        fail(jobs, error)
+        return False
+    return True
+
+
+def run_pending(limit=None, worker='worker'):
+    """
+    Выполняет до limit задач из очереди. Возвращает (выполнено,
+    с ошибкой).
+    """
+    jobs = claim(limit or settings.JOB_BATCH_SIZE, worker)
+    groups = {}
+    for job in jobs:
+        groups.setdefault(job.name, []).append(job)
+    done = failed = 0
+    for name, group in groups.items():
+        if name not in TASKS:
+            fail(group, f'Неизвестная задача: {name}')
+            failed += len(group)
+            continue
+        if TASKS[name][1]:
+            batches = [group]
+        else:
+            batches = [[job] for job in group]
+        for batch in batches:
+            if run(batch):
+                done += len(batch)
+            else:
+                failed += len(batch)
+    return done, failed
@@ -0,0 +1,71 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет число запросов, p50/p95 и размер ответа для всех '
+        'маршрутов posts.urls и users.urls на отдельной тестовой базе. '
+        'База берётся из настроек: для PostgreSQL задайте DB_ENGINE и '
+        'остальные переменные DB_* перед запуском.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--groups', type=int, default=100)
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--repeat', type=int, default=20,
+                            help='Запросов на каждый маршрут')
+        parser.add_argument('--cold', action='store_true',
+                            help='Очищать кэш перед каждым запросом')
+        parser.add_argument('--baseline',
+                            help='JSON-файл эталона для сравнения')
+        parser.add_argument('--update-baseline', action='store_true',
+                            help='Записать результаты в --baseline')
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help='Допустимый рост времени и размера')
+        parser.add_argument('--keepdb', action='store_true',
+                            help='Не удалять тестовую базу: наполнение '
+                                 'миллиона постов занимает минуты')
+
+    def handle(self, *args, **options):
+        if options['update_baseline'] and not options['baseline']:
+            raise CommandError('--update-baseline требует --baseline')
+        with benchmark.test_database(options['keepdb']):
+            results = self.bench(options)
+        self.report(results)
+        self.compare(results, options)
+
+    def bench(self, options):
+        author = benchmark.bench_author(
+            options['users'], options['groups'], options['posts'],
+            stdout=self.stdout,
+        )
+        return benchmark.run(author, options['repeat'], options['cold'])
+
+    def report(self, results):
+        self.stdout.write(
+            f'{"маршрут":<24}{"код":>5}{"запросы":>9}'
+            f'{"p50, мс":>10}{"p95, мс":>10}{"байт":>9}'
+        )
+        for key, row in sorted(results.items()):
+            self.stdout.write(
+                f'{key:<24}{row["status"]:>5}{row["queries"]:>9}'
+                f'{row["p50_ms"]:>10}{row["p95_ms"]:>10}{row["bytes"]:>9}'
+            )
+
+    def compare(self, results, options):
+        path = options['baseline']
+        if not path:
+            return
+        if options['update_baseline']:
+            benchmark.save_baseline(path, results)
+            self.stdout.write(self.style.SUCCESS(f'Эталон записан: {path}'))
+            return
+        found = benchmark.regressions(
+            results, benchmark.load_baseline(path), options['tolerance']
+        )
+        if found:
+            raise CommandError('Регрессии:\n' + '\n'.join(found))
+        self.stdout.write(self.style.SUCCESS('Регрессий нет'))
@@ -0,0 +1,65 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность и p50/p95/p99 лент под '
+        'конкурентной нагрузкой: uvicorn с yatube.asgi против gunicorn '
+        'с yatube.wsgi. Серверы работают с базой из настроек: наполните '
+        'её заранее. Анонимные страницы отдаются из кэша страниц; '
+        'чтобы мерить сборку страницы, передайте --cookie с сессией.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*', default=['/'])
+        parser.add_argument('--servers', nargs='+',
+                            default=list(benchmark.SERVER_COMMANDS),
+                            choices=list(benchmark.SERVER_COMMANDS))
+        parser.add_argument('--concurrency', type=int, nargs='+',
+                            default=[1, 10, 50])
+        parser.add_argument('--requests', type=int, default=2000,
+                            help='Запросов на каждый замер')
+        parser.add_argument('--workers', type=int, default=1)
+        parser.add_argument('--threads', type=int, default=8,
+                            help='Потоков на процесс gunicorn')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--cookie', help='Заголовок Cookie запросов')
+        for name in benchmark.SERVER_COMMANDS:
+            parser.add_argument(
+                f'--{name}-command',
+                default=benchmark.SERVER_COMMANDS[name],
+                help='Шаблон команды: {port}, {workers}, {threads}'
+            )
+
+    def handle(self, *args, **options):
+        headers = {'Cookie': options['cookie']} if options['cookie'] else {}
+        self.stdout.write(
+            f'{"сервер":<8}{"путь":<24}{"клиенты":>8}{"запр/с":>9}'
+            f'{"p50, мс":>10}{"p95, мс":>10}{"p99, мс":>10}{"ошибки":>8}'
+        )
+        for name in options['servers']:
+            command = options[f'{name}_command'].format(
+                port=options['port'], workers=options['workers'],
+                threads=options['threads'],
+            )
+            try:
+                with benchmark.serve(command, options['port']):
+                    self.bench(name, options, headers)
+            except (OSError, RuntimeError) as error:
+                raise CommandError(f'{name}: {error}')
+
+    def bench(self, name, options, headers):
+        for path in options['paths']:
+            url = f'http://127.0.0.1:{options["port"]}{path}'
+            # Прогрев: первые запросы открывают соединения с БД
+            benchmark.load(url, 1, 10, headers)
+            for concurrency in options['concurrency']:
+                row = benchmark.load(url, concurrency, options['requests'],
+                                     headers)
+                self.stdout.write(
+                    f'{name:<8}{path:<24}{concurrency:>8}{row["rps"]:>9}'
+                    f'{row["p50_ms"]:>10}{row["p95_ms"]:>10}'
+                    f'{row["p99_ms"]:>10}{row["errors"]:>8}'
+                )
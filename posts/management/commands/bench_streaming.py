@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+
+from posts import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает обычный и потоковый (FEED_STREAMING) рендер лент: '
+        'время до первого куска, время до конца и пик памяти на запрос '
+        'при --per-page постах на странице. Работает на отдельной '
+        'тестовой базе, как bench. TTFB на живом сервере показывает '
+        'bench_transfer с FEED_STREAMING=1.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=10)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--per-page', type=int, default=100)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--keepdb', action='store_true')
+
+    def handle(self, *args, **options):
+        with benchmark.test_database(options['keepdb']):
+            author = benchmark.bench_author(
+                options['users'], options['groups'], options['posts'],
+                stdout=self.stdout,
+            )
+            results = benchmark.profile_streaming(
+                author, options['per_page'], options['repeat']
+            )
+        self.stdout.write(
+            f'{"лента|режим":<20}{"первый кусок, мс":>18}'
+            f'{"всего, мс":>11}{"пик, КБ":>10}{"байт":>9}'
+        )
+        for key, row in results.items():
+            self.stdout.write(
+                f'{key:<20}{row["first_p50_ms"]:>18}'
+                f'{row["total_p50_ms"]:>11}{row["peak_kb"]:>10}'
+                f'{row["bytes"]:>9}'
+            )
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+
+from posts import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает время рендера лент в режимах шаблонов: без кэша, '
+        'с кэшем загрузчика, с кэшем и встраиванием include и, если '
+        'установлен jinja2, на Jinja2. Работает на отдельной тестовой '
+        'базе, как bench.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=10)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=50,
+                            help='Запросов на каждую ленту в каждом режиме')
+        parser.add_argument('--breakdown', action='store_true',
+                            help='Время по шаблонам и include')
+        parser.add_argument('--keepdb', action='store_true')
+
+    def handle(self, *args, **options):
+        with benchmark.test_database(options['keepdb']):
+            author = benchmark.bench_author(
+                options['users'], options['groups'], options['posts'],
+                stdout=self.stdout,
+            )
+            results = benchmark.profile_templates(author, options['repeat'])
+        self.stdout.write(f'{"лента|режим":<24}{"p50, мс":>10}{"p95, мс":>10}')
+        for key, row in results.items():
+            self.stdout.write(
+                f'{key:<24}{row["p50_ms"]:>10}{row["p95_ms"]:>10}'
+            )
+            if not options['breakdown']:
+                continue
+            for entry in row['templates']:
+                self.stdout.write(
+                    f'    {entry["kind"]:<9}{entry["name"]:<32}'
+                    f'{entry["count"]:>5}{entry["ms"]:>10}'
+                )
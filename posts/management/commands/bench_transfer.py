@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import benchmark
+from posts.compression import available
+
+
+class Command(BaseCommand):
+    help = (
+        'Размер ответа на проводе и время до первого байта (TTFB) '
+        'страниц без сжатия и с каждой доступной кодировкой. Сервер '
+        'работает с базой из настроек: наполните её заранее.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*', default=['/'])
+        parser.add_argument('--server', default='wsgi',
+                            choices=list(benchmark.SERVER_COMMANDS))
+        parser.add_argument('--encodings', nargs='+',
+                            default=['identity', *available()])
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument('--workers', type=int, default=1)
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--cookie', help='Заголовок Cookie запросов')
+
+    def handle(self, *args, **options):
+        headers = {'Cookie': options['cookie']} if options['cookie'] else {}
+        command = benchmark.SERVER_COMMANDS[options['server']].format(
+            port=options['port'], workers=options['workers'],
+            threads=options['threads'],
+        )
+        self.stdout.write(
+            f'{"путь":<24}{"кодировка":<10}{"байт":>9}'
+            f'{"TTFB p50":>10}{"TTFB p95":>10}{"всего p50":>11}'
+        )
+        try:
+            with benchmark.serve(command, options['port']):
+                for path in options['paths']:
+                    self.bench(path, options, headers)
+        except (OSError, RuntimeError) as error:
+            raise CommandError(f'{options["server"]}: {error}')
+
+    def bench(self, path, options, headers):
+        url = f'http://127.0.0.1:{options["port"]}{path}'
+        benchmark.load(url, 1, 10, headers)
+        for encoding in options['encodings']:
+            row = benchmark.transfer(url, encoding, options['repeat'],
+                                     headers)
+            self.stdout.write(
+                f'{path:<24}{row["encoding"]:<10}{row["bytes"]:>9}'
+                f'{row["ttfb_p50_ms"]:>10}{row["ttfb_p95_ms"]:>10}'
+                f'{row["total_p50_ms"]:>11}'
+            )
@@ -0,0 +1,58 @@
+import re
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.models import Group, Post, User
+from posts.paginator import NEXT, CursorPaginator, encode_cursor
+
+# Признаки того, что СУБД сортирует выборку целиком, а не идёт по индексу
+FULL_SORT_MARKERS = (
+    re.compile(r'USE TEMP B-TREE FOR (RIGHT PART OF )?ORDER BY'),
+    re.compile(r'^\s*(->\s*)?(Incremental )?Sort\b', re.MULTILINE),
+)
+
+
+class Command(BaseCommand):
+    help = 'Печатает EXPLAIN для запросов ленты index, group и profile'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fail-on-sort', action='store_true',
+            help='Завершиться с ошибкой, если какой-то запрос сортирует '
+                 'таблицу целиком',
+        )
+
+    def feed_querysets(self):
+        group = Group.objects.order_by('id').first()
+        author = User.objects.filter(posts__isnull=False).first()
+        feeds = [('index', Post.objects.select_related('group', 'author'))]
+        if group is not None:
+            feeds.append(('group', group.posts.all()))
+        if author is not None:
+            feeds.append(('profile', author.posts.all()))
+        latest = Post.objects.order_by('-pub_date', '-id').first()
+        for name, posts in feeds:
+            paginator = CursorPaginator(posts, settings.POSTS_PER_PAGE)
+            yield name, paginator.queryset_for()[1]
+            if latest is not None:
+                cursor = encode_cursor(NEXT, latest.pub_date, latest.id)
+                yield f'{name} (cursor)', paginator.queryset_for(cursor)[1]
+
+    def handle(self, *args, **options):
+        sorted_feeds = []
+        for name, queryset in self.feed_querysets():
+            plan = queryset.explain()
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            self.stdout.write(str(queryset.query))
+            self.stdout.write(plan)
+            if any(marker.search(plan) for marker in FULL_SORT_MARKERS):
+                sorted_feeds.append(name)
+                self.stdout.write(self.style.WARNING('Полная сортировка'))
+            else:
+                self.stdout.write(self.style.SUCCESS('Индекс'))
+            self.stdout.write('')
+        if sorted_feeds and options['fail_on_sort']:
+            raise CommandError(
+                'Сортировка без индекса: ' + ', '.join(sorted_feeds)
+            )
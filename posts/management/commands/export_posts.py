@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.exporter import (RENDERERS, ExportFilterError, export_queryset,
+                            export_rows, parse_bound)
+from posts.models import Group, User
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает посты с именем автора и slug сообщества в JSONL или CSV. '
+        'Память не зависит от размера таблицы.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=RENDERERS, default='jsonl')
+        parser.add_argument('--output', default='-',
+                            help='Путь к файлу или - для stdout')
+        parser.add_argument('--group', help='slug сообщества')
+        parser.add_argument('--author', help='Имя пользователя')
+        parser.add_argument('--since', help='С даты (включительно)')
+        parser.add_argument('--until', help='До даты (не включая)')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        try:
+            queryset = export_queryset(
+                group_id=self.resolve(Group, 'slug', options['group']),
+                author_id=self.resolve(User, 'username', options['author']),
+                since=parse_bound(options['since']),
+                until=parse_bound(options['until']),
+            )
+        except ExportFilterError as error:
+            raise CommandError(error)
+        render = RENDERERS[options['format']][0]
+        chunks = render(export_rows(queryset, options['batch_size']))
+        if options['output'] == '-':
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
+            return
+        with open(options['output'], 'w', encoding='utf-8',
+                  newline='') as output:
+            output.writelines(chunks)
+
+    def resolve(self, model, field, value):
+        if not value:
+            return None
+        pk = model.objects.filter(**{field: value}).values_list(
+            'pk', flat=True
+        ).first()
+        if pk is None:
+            raise CommandError(f'Не найдено: {value}')
+        return pk
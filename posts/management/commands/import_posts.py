@@ -0,0 +1,50 @@
+import os
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.importer import READERS, ImportFormatError, PostImporter
+
+
+class Command(BaseCommand):
+    help = (
+        'Импортирует посты из JSONL или CSV с полями author, group, text, '
+        'pub_date. Файл читается потоково и пишется пачками bulk_create.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к файлу или - для stdin')
+        parser.add_argument('--format', choices=READERS,
+                            help='По умолчанию — по расширению файла')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--create-missing', action='store_true',
+                            help='Создавать неизвестных авторов и сообщества')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format']
+        if file_format is None:
+            file_format = os.path.splitext(path)[1].lstrip('.').lower()
+            if file_format not in READERS:
+                raise CommandError('Укажите --format jsonl или csv')
+        importer = PostImporter(
+            batch_size=options['batch_size'],
+            create_missing=options['create_missing'],
+            stdout=self.stdout,
+        )
+        stream = (sys.stdin if path == '-'
+                  else open(path, encoding='utf-8', newline=''))
+        try:
+            elapsed = importer.run(READERS[file_format](stream))
+        except ImportFormatError as error:
+            raise CommandError(error)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+        for error in importer.errors:
+            self.stderr.write(error)
+        rate = importer.imported / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: {importer.imported} постов за {elapsed:.1f} с '
+            f'({rate:.0f} пост/с), пропущено {importer.skipped}'
+        ))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from posts.ratelimit import rejections
+
+
+class Command(BaseCommand):
+    help = 'Число запросов, отклонённых лимитами RATE_LIMITS'
+
+    def handle(self, *args, **options):
+        counts = rejections()
+        if not counts:
+            self.stdout.write('Отказов нет')
+            return
+        self.stdout.write(f'{"маршрут":<16}{"ведро":<8}{"отказов":>10}')
+        for (name, scope), count in sorted(counts.items()):
+            self.stdout.write(f'{name:<16}{scope:<8}{count:>10}')
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from posts.search import backend, index_missing
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает полнотекстовый индекс постов (SQLite FTS5)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--missing-only', action='store_true',
+                            help='Только посты, которых нет в индексе')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if backend() != 'fts5':
+            self.stdout.write(
+                'Индекс поддерживает СУБД, перестраивать нечего'
+            )
+            return
+        indexed = index_missing(options['batch_size'],
+                                rebuild=not options['missing_only'])
+        self.stdout.write(self.style.SUCCESS(f'Проиндексировано: {indexed}'))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.counters import recount
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики постов у групп и авторов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            groups, authors = recount(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлено групп: {groups}, авторов: {authors}'
+        ))
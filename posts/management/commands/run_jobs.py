@@ -0,0 +1,48 @@
+import os
+import socket
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from posts.jobs import run_pending, shared_cache
+
+
+class Command(BaseCommand):
+    help = 'Выполняет фоновые задачи из очереди'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch', type=int,
+                            default=settings.JOB_BATCH_SIZE)
+        parser.add_argument('--sleep', type=float,
+                            default=settings.JOB_POLL_INTERVAL,
+                            help='Пауза, когда очередь пуста, в секундах')
+        parser.add_argument('--once', action='store_true',
+                            help='Разобрать очередь и выйти')
+
+    def handle(self, *args, **options):
+        if not shared_cache():
+            raise CommandError(
+                'Кэш в памяти процесса: веб-процессы не увидят, что '
+                'задачи изменили ленты. Задайте общий кэш (CACHE_BACKEND) '
+                'или выполняйте задачи сразу (JOBS_EAGER=1)'
+            )
+        worker = f'{socket.gethostname()}:{os.getpid()}'
+        total_done = total_failed = 0
+        try:
+            while True:
+                close_old_connections()
+                done, failed = run_pending(options['batch'], worker)
+                total_done += done
+                total_failed += failed
+                if done or failed:
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(
+            f'Выполнено задач: {total_done}, с ошибкой: {total_failed}'
+        ))
@@ -0,0 +1,291 @@
+import asyncio
+import json
+import logging
+import random
+import time
+
+from django.conf import settings
+from django.core.signing import BadSignature
+from django.utils.cache import patch_vary_headers
+
+from . import ratelimit
+from .compression import available, compress, compress_stream, negotiate
+from .routers import Routing, current_routing
+from .timing import (RequestTiming, current_timing, timed_queries,
+                     timed_sync_to_async)
+
+logger = logging.getLogger('yatube.timing')
+
+
+class RequestTimingMiddleware:
+    """
+    Для доли запросов REQUEST_TIMING_SAMPLE_RATE считает запросы к БД,
+    их суммарное и максимальное время, время рендера шаблонов и view.
+    Отдаёт цифры в заголовке Server-Timing и одной JSON-строкой в лог.
+
+    С REQUEST_TIMING_DETECT_N_PLUS_ONE дополнительно ищет одинаковые
+    запросы, повторённые REQUEST_TIMING_N_PLUS_ONE_THRESHOLD раз и больше,
+    а с REQUEST_TIMING_PROFILE_TEMPLATES пишет в лог время каждого
+    шаблона и include.
+
+    Работает и под ASGI, не переключая цепочку в синхронный режим.
+    Там запросы к БД считаются только у async-view, которые ходят в БД
+    через timed_sync_to_async.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+            self.process_view = self.process_view_async
+
+    def sample(self):
+        if random.random() >= settings.REQUEST_TIMING_SAMPLE_RATE:
+            return None
+        return RequestTiming(
+            collect_sql=settings.REQUEST_TIMING_DETECT_N_PLUS_ONE,
+            profile_templates=settings.REQUEST_TIMING_PROFILE_TEMPLATES,
+        )
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.call_async(request)
+        timing = self.sample()
+        if timing is None:
+            return self.get_response(request)
+        token = current_timing.set(timing)
+        try:
+            with timed_queries(timing):
+                response = self.get_response(request)
+        finally:
+            current_timing.reset(token)
+        self.finish(request, response, timing)
+        return response
+
+    async def call_async(self, request):
+        timing = self.sample()
+        if timing is None:
+            return await self.get_response(request)
+        token = current_timing.set(timing)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_timing.reset(token)
+        self.finish(request, response, timing)
+        return response
+
+    def start_view(self):
+        timing = current_timing.get()
+        if timing is not None:
+            timing.view_started = time.perf_counter()
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        self.start_view()
+
+    async def process_view_async(self, request, view_func, view_args,
+                                 view_kwargs):
+        # Синхронный process_view Django под ASGI вызывал бы в потоке
+        self.start_view()
+
+    def finish(self, request, response, timing):
+        if timing.view_started is not None:
+            timing.view_ms = (time.perf_counter() - timing.view_started) * 1000
+        self.report(request, response, timing)
+
+    def report(self, request, response, timing):
+        response['Server-Timing'] = ', '.join((
+            f'db;dur={timing.sql_ms:.1f};desc="{timing.queries} queries"',
+            f'db-slowest;dur={timing.slowest_ms:.1f}',
+            f'tpl;dur={timing.template_ms:.1f}',
+            f'view;dur={timing.view_ms:.1f}',
+            f'total;dur={timing.total_ms:.1f}',
+        ))
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': timing.queries,
+            'sql_ms': round(timing.sql_ms, 2),
+            'slowest_ms': round(timing.slowest_ms, 2),
+            'slowest_sql': timing.slowest_sql,
+            'template_ms': round(timing.template_ms, 2),
+            'view_ms': round(timing.view_ms, 2),
+            'total_ms': round(timing.total_ms, 2),
+        }
+        if timing.profile_templates:
+            record['templates'] = timing.template_profile()
+        level = logging.INFO
+        if timing.collect_sql:
+            repeated = timing.repeated(
+                settings.REQUEST_TIMING_N_PLUS_ONE_THRESHOLD
+            )
+            if repeated:
+                record['n_plus_one'] = [
+                    {'sql': sql, 'count': count} for sql, count in repeated
+                ]
+                response['X-N-Plus-One'] = str(len(repeated))
+                level = logging.WARNING
+        logger.log(level, json.dumps(record, ensure_ascii=False))
+
+
+class ReplicaMiddleware:
+    """
+    Отправляет чтения лент из REPLICA_VIEWS на реплику DATABASE_REPLICA.
+    Запрос, который что-то записал, ставит подписанную cookie: пока она
+    жива (REPLICA_STICKY_SECONDS), пользователь читает из основной базы
+    и видит свою запись, даже если реплика отстаёт.
+    """
+    sync_capable = True
+    async_capable = True
+    cookie_name = 'read_primary'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+            self.process_view = self.process_view_async
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.call_async(request)
+        routing = Routing()
+        token = current_routing.set(routing)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_routing.reset(token)
+        return self.finish(response, routing)
+
+    async def call_async(self, request):
+        routing = Routing()
+        token = current_routing.set(routing)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_routing.reset(token)
+        return self.finish(response, routing)
+
+    def sticky(self, request):
+        try:
+            request.get_signed_cookie(
+                self.cookie_name, max_age=settings.REPLICA_STICKY_SECONDS
+            )
+        except (KeyError, BadSignature):
+            return False
+        return True
+
+    def route(self, request):
+        routing = current_routing.get()
+        if (routing is None or not settings.DATABASE_REPLICA
+                or request.resolver_match.url_name
+                not in settings.REPLICA_VIEWS
+                or self.sticky(request)):
+            return
+        routing.read_alias = settings.DATABASE_REPLICA
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        self.route(request)
+
+    async def process_view_async(self, request, view_func, view_args,
+                                 view_kwargs):
+        self.route(request)
+
+    def finish(self, response, routing):
+        if routing.wrote and settings.DATABASE_REPLICA:
+            response.set_signed_cookie(
+                self.cookie_name, '1',
+                max_age=settings.REPLICA_STICKY_SECONDS, httponly=True,
+                samesite='Lax',
+            )
+        return response
+
+
+class CompressionMiddleware:
+    """
+    Сжимает ответы с типом из RESPONSE_COMPRESSION_TYPES первой
+    кодировкой из RESPONSE_COMPRESSION, которую принимает клиент.
+    Потоковые ответы сжимаются по кускам: каждый кусок уходит клиенту
+    сразу, не дожидаясь конца страницы.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.call_async(request)
+        return self.compress(request, self.get_response(request))
+
+    async def call_async(self, request):
+        return self.compress(request, await self.get_response(request))
+
+    def compress(self, request, response):
+        content_type = response.get('Content-Type', '').split(';')[0]
+        if (response.has_header('Content-Encoding')
+                or content_type not in settings.RESPONSE_COMPRESSION_TYPES
+                or (not response.streaming and len(response.content)
+                    < settings.RESPONSE_COMPRESSION_MIN_SIZE)):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = negotiate(
+            request.META.get('HTTP_ACCEPT_ENCODING', ''),
+            [encoding for encoding in settings.RESPONSE_COMPRESSION
+             if encoding in available()],
+        )
+        if encoding is None:
+            return response
+        level = settings.RESPONSE_COMPRESSION_LEVELS[encoding]
+        if response.streaming:
+            response.streaming_content = compress_stream(
+                response.streaming_content, encoding, level
+            )
+            del response['Content-Length']
+        else:
+            compressed = compress(response.content, encoding, level)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+        # Сжатое тело побайтно другое: сильный ETag становится слабым
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = encoding
+        return response
+
+
+class RateLimitMiddleware:
+    """
+    Отклоняет запросы сверх RATE_LIMITS до вызова view: см.
+    posts.ratelimit. Стоит после AuthenticationMiddleware — лимит
+    по пользователю читает request.user.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+            self.process_view = self.process_view_async
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        return ratelimit.check(request)
+
+    async def process_view_async(self, request, view_func, view_args,
+                                 view_kwargs):
+        # Ограниченные маршруты редки; только для них идём в поток —
+        # request.user читает сессию и пользователя из БД
+        match = request.resolver_match
+        if match is None or match.url_name not in settings.RATE_LIMITS:
+            return None
+        return await timed_sync_to_async(ratelimit.check)(request)
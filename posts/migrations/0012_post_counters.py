@@ -0,0 +1,48 @@
+# Generated by Django 3.2.25 on 2026-10-18 17:41
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+
+def fill_counters(apps, schema_editor):
+    Group = apps.get_model('posts', 'Group')
+    Post = apps.get_model('posts', 'Post')
+    AuthorStats = apps.get_model('posts', 'AuthorStats')
+    for group in Group.objects.annotate(actual=Count('posts')):
+        group.posts_count = group.actual
+        group.save(update_fields=['posts_count'])
+    counts = (
+        Post.objects.filter(author__isnull=False)
+        .values_list('author_id')
+        .annotate(n=Count('id'))
+        .order_by()
+    )
+    AuthorStats.objects.bulk_create(
+        AuthorStats(user_id=user_id, posts_count=n) for user_id, n in counts
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0011_post_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthorStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('posts_count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='group',
+            name='posts_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
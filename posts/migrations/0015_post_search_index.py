@@ -0,0 +1,45 @@
+# Generated by Django 3.2.25 on 2026-10-18 18:30
+
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        from posts.stemmer import stem_text
+        schema_editor.execute(
+            'CREATE VIRTUAL TABLE IF NOT EXISTS posts_post_fts '
+            'USING fts5(body)'
+        )
+        Post = apps.get_model('posts', 'Post')
+        with schema_editor.connection.cursor() as cursor:
+            cursor.executemany(
+                'INSERT INTO posts_post_fts (rowid, body) VALUES (%s, %s)',
+                [(post_id, stem_text(text)) for post_id, text in
+                 Post.objects.values_list('id', 'text').iterator()],
+            )
+    elif vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS post_text_search_idx ON posts_post '
+            "USING GIN (to_tsvector('russian'::regconfig, "
+            "COALESCE(text, '')))"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS posts_post_fts')
+    elif vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS post_text_search_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_post_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
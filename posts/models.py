@@ -1,5 +1,6 @@
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import models, transaction
+from django.utils import timezone
 
 User = get_user_model()
 
@@ -8,14 +9,36 @@ class Group(models.Model):
     title = models.CharField(max_length=200)
     slug = models.SlugField(unique=True)
     description = models.TextField()
+    posts_count = models.PositiveIntegerField(default=0, editable=False)
+    # По нему процессы замечают правки справочника сообществ
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    # Поля, которые читают карточка поста и постраничный вывод
+    FEED_FIELDS = (
+        'text', 'pub_date', 'version',
+        'author', 'author__username',
+        'group', 'group__slug', 'group__title',
+    )
+
+    def for_feed(self, *extra_fields):
+        """
+        Общий запрос для всех лент: автор и сообщество одним JOIN,
+        из таблиц берутся только колонки, нужные шаблонам.
+        """
+        return self.select_related('author', 'group').only(
+            *self.FEED_FIELDS, *extra_fields
+        )
+
+
 class Post(models.Model):
     text = models.TextField(help_text='Текст поста здесь')
     pub_date = models.DateTimeField('date published', auto_now_add=True)
+    updated_at = models.DateTimeField('date updated', auto_now=True)
     author = models.ForeignKey(
         User,
         null=True,
@@ -31,9 +54,139 @@ class Post(models.Model):
         help_text='Сообщество,'
                      ' в которое отправляется сообщение.'
     )
+    version = models.PositiveIntegerField(default=1, editable=False)
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
-        ordering = ('-pub_date',)
+        ordering = ('-pub_date', '-id')
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='post_pub_date_id_idx'),
+            models.Index(fields=['group', '-pub_date', '-id'],
+                         name='post_group_pub_date_idx'),
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='post_author_pub_date_idx'),
+        ]
 
     def __str__(self):
         return self.text
+
+    def save(self, *args, **kwargs):
+        # Номер версии входит в ключи кэша: любое изменение поста
+        # делает старые закэшированные карточки недостижимыми
+        if self.pk is not None:
+            self.version += 1
+        # Сигналы post_save ставят задачи в posts.jobs: пост и его задачи
+        # фиксируются вместе или не фиксируются вовсе
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
+
+class AuthorStats(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+    )
+    posts_count = models.PositiveIntegerField(default=0)
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+    # Посты автора не раскладываются по лентам подписчиков, а читаются
+    # при открытии ленты: см. posts.follows
+    pull_feed = models.BooleanField(default=False)
+
+    def __str__(self):
+        return f'{self.user}: {self.posts_count}'
+
+
+class Follow(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='follower',
+        help_text='Подписчик',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='following',
+        help_text='Автор, на которого подписан пользователь',
+        # Вместо индекса по одному автору — составной ниже
+        db_index=False,
+    )
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        # Подписчики автора по порядку id: рассылка поста пачками
+        indexes = [
+            models.Index(fields=['author', 'user'],
+                         name='follow_author_user_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'author'],
+                                    name='follow_unique'),
+            models.CheckConstraint(check=~models.Q(user=models.F('author')),
+                                   name='follow_not_self'),
+        ]
+
+    def __str__(self):
+        return f'{self.user} -> {self.author}'
+
+    def save(self, *args, **kwargs):
+        # Вместе с задачей sync_follow из сигнала post_save
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
+
+class InboxEntry(models.Model):
+    """
+    Пост в ленте подписок пользователя. pub_date повторяет дату поста,
+    чтобы страница ленты читалась по одному индексу без JOIN.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE,
+                             related_name='inbox')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE,
+                             related_name='inbox_entries')
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'],
+                                    name='inbox_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-post'],
+                         name='inbox_user_pub_date_idx'),
+        ]
+
+
+class Job(models.Model):
+    """Фоновая задача из очереди posts.jobs; выполненные удаляются."""
+    PENDING = 'pending'
+    FAILED = 'failed'
+    STATES = (
+        (PENDING, 'В очереди'),
+        (FAILED, 'Не выполнена'),
+    )
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    state = models.CharField(max_length=10, choices=STATES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    run_at = models.DateTimeField(default=timezone.now)
+    # Задачу взял обработчик; после этого времени её можно забрать снова
+    locked_until = models.DateTimeField(null=True, blank=True)
+    locked_by = models.CharField(max_length=100, blank=True)
+    last_error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['state', 'run_at'],
+                         name='job_state_run_at_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.name} #{self.pk}'
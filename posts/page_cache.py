@@ -0,0 +1,200 @@
+import asyncio
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+from .models import Group, User
+from .routers import read_primary
+
+ALL_FEEDS = 'all'
+
+
+def generation_key(feed):
+    return f'page:generation:{feed}'
+
+
+def touch_feeds(*feeds):
+    """
+    Помечает ленты изменёнными. Поколение — время изменения: по нему же
+    видно, сколько секунд закэшированная страница уже устарела.
+    """
+    stamp = time.time()
+    cache.set_many(
+        {generation_key(feed): stamp for feed in feeds if feed},
+        None
+    )
+
+
+def profile_feeds(user_ids):
+    return [
+        f'profile:{username}' for username in
+        User.objects.filter(pk__in=user_ids).values_list(
+            'username', flat=True
+        )
+    ]
+
+
+def touch_profiles(*user_ids):
+    """Профили с карточкой автора: в ней счётчики подписок."""
+    touch_feeds(*profile_feeds(user_ids))
+
+
+def touch_post_feeds(author_ids, group_ids):
+    author_ids = {pk for pk in author_ids if pk is not None}
+    group_ids = {pk for pk in group_ids if pk is not None}
+    feeds = ['index']
+    if author_ids:
+        feeds += profile_feeds(author_ids)
+    if group_ids:
+        feeds += [
+            f'group:{slug}' for slug in
+            Group.objects.filter(pk__in=group_ids).values_list(
+                'slug', flat=True
+            )
+        ]
+    touch_feeds(*feeds)
+
+
+def current_generations(feeds):
+    keys = [generation_key(feed) for feed in feeds]
+    stored = cache.get_many(keys)
+    if len(stored) < len(keys):
+        # Ленты без отметки (например, после очистки кэша) считаем
+        # изменёнными сейчас: так страница не окажется свежее, чем есть.
+        # Лента может и не существовать (404, ?group= в API), поэтому
+        # отметка живёт не дольше страниц: истечение лишь пересоберёт их
+        stamp = time.time()
+        for key in keys:
+            if key not in stored:
+                cache.add(key, stamp, settings.PAGE_CACHE_TIMEOUT)
+        stored = cache.get_many(keys)
+    generations = tuple(stored.get(key, 0) for key in keys)
+    # Свежее изменение реплика могла ещё не получить: страница из неё
+    # закэшировалась бы со старым содержимым под новым поколением
+    if time.time() - max(generations) < settings.REPLICA_STICKY_SECONDS:
+        read_primary()
+    return generations
+
+
+def feeds_for(feed, kwarg, kwargs):
+    return [ALL_FEEDS, feed if kwarg is None else f'{feed}:{kwargs[kwarg]}']
+
+
+def store(key, content, content_type, generations):
+    cache.set(key, {
+        'generations': generations,
+        'content': content,
+        'content_type': content_type,
+    }, settings.PAGE_CACHE_TIMEOUT)
+
+
+def store_stream(key, chunks, content_type, generations):
+    """Пропускает поток к клиенту и кэширует страницу, когда он дошёл."""
+    content = []
+    for chunk in chunks:
+        content.append(chunk)
+        yield chunk
+    store(key, b''.join(content), content_type, generations)
+
+
+def cached_response(entry, state):
+    response = HttpResponse(entry['content'],
+                            content_type=entry['content_type'])
+    response['X-Page-Cache'] = state
+    return response
+
+
+def cached_page(key, generations):
+    """
+    (ответ из кэша или None, взят ли замок на пересборку). Ответ None —
+    страницу пора собрать заново.
+    """
+    entry = cache.get(key)
+    if entry is None:
+        return None, False
+    if entry['generations'] == generations:
+        return cached_response(entry, 'hit'), False
+    stale_for = time.time() - max(generations)
+    if stale_for > settings.PAGE_CACHE_STALE_WINDOW:
+        return None, False
+    if not cache.add(f'{key}:lock', 1, settings.PAGE_CACHE_STALE_WINDOW):
+        return cached_response(entry, 'stale'), False
+    return None, True
+
+
+def remember(key, response, generations):
+    if response.status_code == 200 and not response.cookies:
+        if response.streaming:
+            response.streaming_content = store_stream(
+                key, response.streaming_content, response['Content-Type'],
+                generations
+            )
+        else:
+            store(key, response.content, response['Content-Type'],
+                  generations)
+    response['X-Page-Cache'] = 'miss'
+
+
+def cache_feed_page(feed, kwarg=None):
+    """
+    Кэширует страницы ленты для анонимных читателей.
+
+    Ключ — путь и курсор страницы. Страница свежая, пока не изменились
+    поколения её ленты и общее поколение сайта. Устаревшую не дольше
+    PAGE_CACHE_STALE_WINDOW секунд страницу пересобирает один запрос,
+    остальные в это время получают старую копию.
+
+    Оборачивает и async-view: к кэшу тогда обращаемся из цикла событий.
+    """
+    def lookup(request, kwargs):
+        """
+        (ответ из кэша, ключ, поколения, взят ли замок); ключ None —
+        не кэшируем.
+        """
+        if (request.method not in ('GET', 'HEAD')
+                or request.user.is_authenticated):
+            return None, None, None, False
+        cursor = request.GET.get('cursor', '')
+        key = f'page:{request.path}:{cursor}'
+        generations = current_generations(feeds_for(feed, kwarg, kwargs))
+        cached, locked = cached_page(key, generations)
+        return cached, key, generations, locked
+
+    def decorator(view):
+        if asyncio.iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                cached, key, generations, locked = lookup(request, kwargs)
+                if cached is not None:
+                    return cached
+                if key is None:
+                    return await view(request, *args, **kwargs)
+                try:
+                    response = await view(request, *args, **kwargs)
+                    remember(key, response, generations)
+                finally:
+                    # Чужой замок не трогаем: его пересборка ещё идёт
+                    if locked:
+                        cache.delete(f'{key}:lock')
+                return response
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            cached, key, generations, locked = lookup(request, kwargs)
+            if cached is not None:
+                return cached
+            if key is None:
+                return view(request, *args, **kwargs)
+            try:
+                response = view(request, *args, **kwargs)
+                remember(key, response, generations)
+            finally:
+                if locked:
+                    cache.delete(f'{key}:lock')
+            return response
+        return wrapper
+    return decorator
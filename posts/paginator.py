@@ -0,0 +1,232 @@
+import base64
+import binascii
+from collections.abc import Sequence
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+NEXT = 'n'
+PREVIOUS = 'p'
+# Предел BIGINT: больший id драйвер БД не примет
+MAX_ID = 2 ** 63 - 1
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def encode_cursor(direction, pub_date, pk):
+    raw = f'{direction}|{pub_date.isoformat()}|{pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Разбирает курсор на (направление, дата, id)."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        direction, pub_date, pk = raw.split('|')
+        pub_date = parse_datetime(pub_date)
+        pk = int(pk)
+    except (ValueError, UnicodeDecodeError, binascii.Error):
+        raise InvalidCursor(cursor)
+    if (direction not in (NEXT, PREVIOUS) or pub_date is None
+            or not 1 <= pk <= MAX_ID):
+        raise InvalidCursor(cursor)
+    return direction, pub_date, pk
+
+
+def keyset_filter(direction, pub_date, pk, date_field='pub_date',
+                  pk_field='id'):
+    """
+    Условие «строго после (pub_date, pk)» в порядке убывания для NEXT
+    и «строго до» для PREVIOUS. Граница по дате вынесена из OR, чтобы
+    СУБД начинала чтение индекса с курсора, а не с начала таблицы.
+    """
+    if direction == NEXT:
+        return Q(**{f'{date_field}__lte': pub_date}) & (
+            Q(**{f'{date_field}__lt': pub_date})
+            | Q(**{f'{pk_field}__lt': pk})
+        )
+    return Q(**{f'{date_field}__gte': pub_date}) & (
+        Q(**{f'{date_field}__gt': pub_date})
+        | Q(**{f'{pk_field}__gt': pk})
+    )
+
+
+class CursorPage(Sequence):
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return f'<CursorPage of {len(self)} items>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self):
+        if not self._has_next or not self.object_list:
+            return None
+        return self.paginator.cursor_for(self.object_list[-1], NEXT)
+
+    @property
+    def previous_cursor(self):
+        if not self._has_previous or not self.object_list:
+            return None
+        return self.paginator.cursor_for(self.object_list[0], PREVIOUS)
+
+
+class CursorPaginator:
+    """
+    Постраничный вывод по ключу (pub_date, id) вместо OFFSET.
+
+    Каждая страница стоит одного запроса с условием по индексу,
+    поэтому глубокие страницы обходятся так же, как первая.
+
+    ids — необязательный готовый источник страниц: функция
+    (курсор, per_page), которая возвращает (направление, id в порядке
+    чтения) или None. Тогда записи достаются одним in_bulk.
+    """
+
+    def __init__(self, object_list, per_page, date_field='pub_date',
+                 pk_field='id', count=None, ids=None):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.date_field = date_field
+        self.pk_field = pk_field
+        self._count = count
+        self.ids = ids
+
+    @cached_property
+    def count(self):
+        # Счётчик можно передать готовым числом или функцией, которая
+        # прочитает его только по требованию; иначе считаем по запросу
+        if callable(self._count):
+            return self._count()
+        if self._count is not None:
+            return self._count
+        return self.object_list.count()
+
+    def cursor_for(self, obj, direction):
+        return encode_cursor(
+            direction,
+            getattr(obj, self.date_field),
+            getattr(obj, self.pk_field),
+        )
+
+    def queryset_for(self, cursor=None):
+        """
+        Возвращает (направление, срез) — запрос за одну страницу плюс
+        одну запись, по которой видно, есть ли страница дальше.
+        """
+        date_field, pk_field = self.date_field, self.pk_field
+        descending = (f'-{date_field}', f'-{pk_field}')
+        if not cursor:
+            return None, self.object_list.order_by(*descending)[
+                :self.per_page + 1
+            ]
+        direction, pub_date, pk = decode_cursor(cursor)
+        keyset = keyset_filter(direction, pub_date, pk, date_field, pk_field)
+        if direction == NEXT:
+            ordering = descending
+        else:
+            ordering = (date_field, pk_field)
+        return direction, self.object_list.filter(keyset).order_by(
+            *ordering
+        )[:self.per_page + 1]
+
+    def page(self, cursor=None):
+        found = self.ids(cursor, self.per_page) if self.ids else None
+        if found is not None:
+            direction, ids = found
+            rows = self.object_list.in_bulk(ids)
+            # Источник отстал от базы (запись уже удалена) — читаем сами
+            if len(rows) == len(ids):
+                return self.make_page(direction, [rows[pk] for pk in ids])
+        direction, queryset = self.queryset_for(cursor)
+        return self.make_page(direction, list(queryset))
+
+    def make_page(self, direction, rows):
+        """
+        Страница из строк в порядке чтения: от курсора, до per_page + 1.
+        """
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if direction == PREVIOUS:
+            return CursorPage(rows[::-1], self,
+                              has_next=True, has_previous=has_more)
+        return CursorPage(rows, self, has_next=has_more,
+                          has_previous=direction == NEXT)
+
+    def get_page(self, cursor=None):
+        """
+        Как Paginator.get_page: битый курсор отдаёт первую страницу.
+        """
+        try:
+            return self.page(cursor)
+        except InvalidCursor:
+            return self.page()
+
+
+def estimated_count(queryset):
+    """
+    Приблизительное число строк таблицы без COUNT(*): статистика
+    планировщика в PostgreSQL, разброс id по первичному ключу в SQLite.
+    Для других СУБД возвращает None.
+    """
+    model = queryset.model
+    connection = connections[queryset.db]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE relname = %s',
+                (table,)
+            )
+            row = cursor.fetchone()
+            return max(int(row[0]), 0) if row else None
+        if connection.vendor == 'sqlite':
+            pk = model._meta.pk.column
+            cursor.execute(
+                f'SELECT MAX("{pk}") - MIN("{pk}") + 1 FROM "{table}"'
+            )
+            return cursor.fetchone()[0] or 0
+    return None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator для админки: на больших таблицах без фильтров вместо
+    точного COUNT(*) берёт оценку. До ADMIN_EXACT_COUNT_LIMIT строк
+    и для отфильтрованных списков считает честно.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_count(queryset)
+            if (estimate is not None
+                    and estimate > settings.ADMIN_EXACT_COUNT_LIMIT):
+                return estimate
+        return super().count
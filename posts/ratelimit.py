@@ -0,0 +1,115 @@
+"""
+Ограничение частоты записи: ведро токенов (token bucket) в кэше.
+
+RATE_LIMITS задаёт для имени маршрута вёдра по IP и по пользователю:
+(ёмкость, период в секундах) — ёмкость запросов подряд, дальше по
+одному запросу в period / ёмкость секунд. Проверяются только методы
+из RATE_LIMIT_METHODS. Отказ — 429 с Retry-After ещё до view: без
+формы, валидации и записи в БД. Ведро по IP проверяется первым — оно
+не требует загрузки сессии и пользователя.
+
+Чтение и запись ведра не атомарны: при гонке пара лишних запросов
+пройдёт. Вёдра живут в кэше default, поэтому лимит общий для всех
+процессов, только если кэш общий (memcached, Redis), а не locmem.
+
+Отказы считаются в кэше по маршруту и типу ведра (rejections(),
+manage.py ratelimit_stats) и пишутся в лог yatube.ratelimit.
+"""
+import logging
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+logger = logging.getLogger('yatube.ratelimit')
+
+SCOPES = ('ip', 'user')
+
+
+def client_ip(request):
+    # За прокси адрес клиента — в заголовке, который ставит сам прокси
+    if settings.RATE_LIMIT_IP_HEADER:
+        forwarded = request.META.get(settings.RATE_LIMIT_IP_HEADER, '')
+        if forwarded:
+            return forwarded.split(',')[0].strip()
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def bucket_key(name, scope, ident):
+    return f'ratelimit:{name}:{scope}:{ident}'
+
+
+def rejections_key(name, scope):
+    return f'ratelimit:rejected:{name}:{scope}'
+
+
+def take(key, capacity, period, now=None):
+    """
+    Забирает токен из ведра. Возвращает 0 или через сколько секунд
+    появится следующий токен.
+    """
+    now = time.time() if now is None else now
+    rate = capacity / period
+    tokens, stamp = cache.get(key, (capacity, now))
+    tokens = min(capacity, tokens + (now - stamp) * rate)
+    if tokens < 1:
+        return (1 - tokens) / rate
+    # За period ведро наполняется целиком: дольше хранить незачем
+    cache.set(key, (tokens - 1, now), period)
+    return 0
+
+
+def identity(request, scope):
+    if scope == 'ip':
+        return client_ip(request)
+    user = request.user
+    return user.pk if user.is_authenticated else None
+
+
+def check(request):
+    """Ответ 429, если запрос превысил лимит своего маршрута, иначе None."""
+    match = request.resolver_match
+    limits = settings.RATE_LIMITS.get(match.url_name if match else None)
+    if not limits or request.method not in settings.RATE_LIMIT_METHODS:
+        return None
+    for scope in SCOPES:
+        if scope not in limits:
+            continue
+        ident = identity(request, scope)
+        if ident is None:
+            continue
+        capacity, period = limits[scope]
+        wait = take(bucket_key(match.url_name, scope, ident), capacity,
+                    period)
+        if wait:
+            return reject(request, match.url_name, scope, ident, wait)
+    return None
+
+
+def reject(request, name, scope, ident, wait):
+    key = rejections_key(name, scope)
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Счётчик успели вытеснить из кэша между add и incr
+        pass
+    logger.warning('Лимит %s для %s %s: %s %s', name, scope, ident,
+                   request.method, request.path)
+    response = HttpResponse('Слишком много запросов, попробуйте позже',
+                            status=429,
+                            content_type='text/plain; charset=utf-8')
+    response['Retry-After'] = str(math.ceil(wait))
+    return response
+
+
+def rejections():
+    """Число отказов по (маршрут, ведро) с последней очистки кэша."""
+    keys = {
+        rejections_key(name, scope): (name, scope)
+        for name, limits in settings.RATE_LIMITS.items()
+        for scope in limits
+    }
+    return {keys[key]: count for key, count in cache.get_many(keys).items()}
@@ -0,0 +1,67 @@
+from contextvars import ContextVar
+
+import django
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Маршрутизация текущего запроса; None вне запроса
+current_routing = ContextVar('current_routing', default=None)
+
+
+class Routing:
+    def __init__(self):
+        # Алиас для чтения; None — основная база
+        self.read_alias = None
+        # Запрос что-то записал: следующие чтения пользователя
+        # на время REPLICA_STICKY_SECONDS уходят в основную базу
+        self.wrote = False
+
+
+class ReplicaRouter:
+    """
+    Пишем всегда в основную базу. Читаем из реплики только там, где
+    ReplicaMiddleware выставил её алиас: в лентах из REPLICA_VIEWS.
+    """
+
+    def db_for_read(self, model, **hints):
+        routing = current_routing.get()
+        if routing is None or routing.wrote:
+            return DEFAULT_DB_ALIAS
+        return routing.read_alias or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        routing = current_routing.get()
+        if routing is not None:
+            routing.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплика — копия основной базы, объекты из них совместимы
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схему на реплику приносит репликация
+        return db == DEFAULT_DB_ALIAS
+
+
+def read_primary():
+    """Дальше в этом запросе читаем из основной базы."""
+    routing = current_routing.get()
+    if routing is not None:
+        routing.read_alias = None
+
+
+def check_connections():
+    """
+    Проверка постоянных соединений в начале запроса, как
+    CONN_HEALTH_CHECKS в Django 4.1: соединение, которое оборвалось
+    между запросами, закрываем, и запрос откроет новое вместо ошибки.
+    """
+    if django.VERSION >= (4, 1):
+        return
+    for connection in connections.all():
+        if (connection.connection is None
+                or connection.in_atomic_block
+                or not connection.settings_dict['CONN_MAX_AGE']):
+            continue
+        if not connection.is_usable():
+            connection.close()
@@ -0,0 +1,110 @@
+"""
+Полнотекстовый поиск по постам.
+
+SQLite: виртуальная таблица FTS5 posts_post_fts, где rowid — id поста,
+а body — основы слов из stemmer.stem_text. Её обновляют сигналы Post.
+PostgreSQL: GIN-индекс по to_tsvector('russian', text), который СУБД
+поддерживает сама. Остальные СУБД ищут через icontains.
+"""
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+from .models import Post
+from .stemmer import WORD_RE, stem, stem_text
+
+FTS_TABLE = 'posts_post_fts'
+PG_VECTOR = (
+    "to_tsvector('russian'::regconfig, COALESCE(\"posts_post\".\"text\", ''))"
+)
+
+
+def backend():
+    if connection.vendor == 'sqlite':
+        return 'fts5'
+    if connection.vendor == 'postgresql':
+        return 'tsvector'
+    return None
+
+
+def fts_match(query):
+    # Каждое слово — основа в кавычках с префиксом: «книгами» найдёт «книга»
+    terms = {stem(word) for word in WORD_RE.findall(query)}
+    return ' '.join(f'"{term}"*' for term in sorted(terms) if term)
+
+
+def search(query, queryset=None):
+    """Фильтрует queryset постов по запросу; порядок не меняет."""
+    if queryset is None:
+        queryset = Post.objects.all()
+    query = query.strip()
+    if not query:
+        return queryset.none()
+    kind = backend()
+    if kind == 'fts5':
+        match = fts_match(query)
+        if not match:
+            return queryset.none()
+        return queryset.filter(id__in=RawSQL(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+            (match,)
+        ))
+    if kind == 'tsvector':
+        return queryset.extra(
+            where=[f"{PG_VECTOR} @@ plainto_tsquery('russian'::regconfig, %s)"],
+            params=[query],
+        )
+    return queryset.filter(text__icontains=query)
+
+
+def index_post(post_id, text):
+    if backend() != 'fts5':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT OR REPLACE INTO {FTS_TABLE} (rowid, body) VALUES (%s, %s)',
+            (post_id, stem_text(text)),
+        )
+
+
+def unindex_post(post_id):
+    if backend() != 'fts5':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                       (post_id,))
+
+
+def index_missing(batch_size=1000, rebuild=False, since=0):
+    """
+    Индексирует посты с id больше since, которых нет в FTS-таблице,
+    в том числе пропуски среди старых id: пачки идут по id, а уже
+    проиндексированные отсекает антиджойн по rowid. Нужен после
+    bulk_create, который не шлёт сигналы, и после сбоя индексации
+    отдельного поста.
+    """
+    if backend() != 'fts5':
+        return 0
+    if rebuild:
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+    missing = Post.objects.extra(where=[
+        f'NOT EXISTS (SELECT 1 FROM {FTS_TABLE} '
+        f'WHERE {FTS_TABLE}.rowid = posts_post.id)'
+    ])
+    indexed = 0
+    last_id = since
+    while True:
+        rows = list(
+            missing.filter(id__gt=last_id).order_by('id')
+            .values_list('id', 'text')[:batch_size]
+        )
+        if not rows:
+            return indexed
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT OR REPLACE INTO {FTS_TABLE} (rowid, body) '
+                f'VALUES (%s, %s)',
+                [(post_id, stem_text(text)) for post_id, text in rows],
+            )
+        indexed += len(rows)
+        last_id = rows[-1][0]
@@ -0,0 +1,151 @@
+from django.core.signals import request_started
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from . import timeline
+from .cards import bump_generation
+from .counters import bump_follow
+from .groups import invalidate as invalidate_groups
+from .jobs import enqueue
+from .models import Follow, Group, Post, User
+from .page_cache import (ALL_FEEDS, touch_feeds, touch_post_feeds,
+                         touch_profiles)
+from .routers import check_connections
+
+
+# Автора и сообщество берём из БД, а не из экземпляра: объект в памяти
+# мог устареть, и тогда счётчик уменьшился бы не у той группы
+def stored_owners(post):
+    if post.pk is None:
+        return None
+    return (
+        Post.objects.filter(pk=post.pk)
+        .values_list('author_id', 'group_id')
+        .first()
+    )
+
+
+@receiver(pre_save, sender=Post)
+def remember_owners_on_save(sender, instance, raw=False, **kwargs):
+    instance._stored_owners = None if raw else stored_owners(instance)
+
+
+@receiver(post_save, sender=Post)
+def update_counters_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_stored_owners', None)
+    if created or previous is None:
+        previous = (None, None)
+    old_author_id, old_group_id = previous
+    enqueue_counters(
+        (old_author_id, instance.author_id)
+        if old_author_id != instance.author_id else (),
+        (old_group_id, instance.group_id)
+        if old_group_id != instance.group_id else (),
+    )
+
+
+@receiver(pre_delete, sender=Post)
+def remember_owners_on_delete(sender, instance, **kwargs):
+    instance._stored_owners = stored_owners(instance)
+
+
+@receiver(post_delete, sender=Post)
+def update_counters_on_delete(sender, instance, **kwargs):
+    owners = getattr(instance, '_stored_owners', None)
+    if owners is None:
+        owners = (instance.author_id, instance.group_id)
+    author_id, group_id = owners
+    enqueue_counters((author_id,), (group_id,))
+
+
+def enqueue_counters(authors, groups):
+    authors = [pk for pk in authors if pk is not None]
+    groups = [pk for pk in groups if pk is not None]
+    if authors or groups:
+        enqueue('post_counters', authors=authors, groups=groups)
+
+
+# Ленту главной правим раньше, чем сдвигаем поколения страниц: иначе
+# страница под новым поколением успела бы собраться из старой ленты
+@receiver(post_save, sender=Post)
+def add_to_timeline(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        timeline.post_created(instance)
+
+
+@receiver(post_delete, sender=Post)
+def remove_from_timeline(sender, instance, **kwargs):
+    timeline.post_deleted(instance.pk)
+
+
+@receiver(post_save, sender=Post)
+def fan_out_to_followers(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        enqueue('fan_out', post_id=instance.pk)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def touch_feeds_on_post_change(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    old_author_id, old_group_id = (
+        getattr(instance, '_stored_owners', None) or (None, None)
+    )
+    touch_post_feeds((instance.author_id, old_author_id),
+                     (instance.group_id, old_group_id))
+
+
+@receiver(post_save, sender=Post)
+def index_post_text(sender, instance, raw=False, **kwargs):
+    enqueue('index_posts', post_id=instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post_text(sender, instance, **kwargs):
+    enqueue('index_posts', post_id=instance.pk)
+
+
+@receiver(post_save, sender=Follow)
+def update_on_follow(sender, instance, created, raw=False, **kwargs):
+    if not created or raw:
+        return
+    bump_follow(instance.user_id, instance.author_id, 1)
+    enqueue('sync_follow', user_id=instance.user_id,
+            author_id=instance.author_id)
+    touch_profiles(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def update_on_unfollow(sender, instance, **kwargs):
+    bump_follow(instance.user_id, instance.author_id, -1)
+    enqueue('sync_follow', user_id=instance.user_id,
+            author_id=instance.author_id)
+    touch_profiles(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def reset_cards_on_group_change(sender, **kwargs):
+    invalidate_groups()
+    bump_generation()
+    touch_feeds(ALL_FEEDS)
+
+
+@receiver(post_save, sender=User)
+def reset_cards_on_username_change(sender, created, update_fields=None,
+                                   **kwargs):
+    # Вход пользователя сохраняет только last_login — карточки не трогаем
+    if created:
+        return
+    if update_fields is None or 'username' in update_fields:
+        bump_generation()
+        touch_feeds(ALL_FEEDS)
+
+
+@receiver(request_started)
+def check_connections_on_request(sender, **kwargs):
+    check_connections()
@@ -0,0 +1,52 @@
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404
+from django.utils._os import safe_join
+from django.utils.cache import patch_cache_control, patch_vary_headers
+
+from .compression import SUFFIXES, negotiate
+
+# Имя с хэшем содержимого от ManifestStaticFilesStorage:
+# style.1a2b3c4d5e6f.css
+HASHED_RE = re.compile(r'\.[0-9a-f]{12}\.[^./]+$')
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+
+
+def serve(request, path):
+    """
+    Отдаёт файл из STATIC_ROOT, а если клиент принимает сжатие и
+    collectstatic собрал вариант .br или .gz — его. Файлы с хэшем
+    в имени кэшируются на год.
+    """
+    try:
+        full_path = safe_join(settings.STATIC_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    if not os.path.isfile(full_path):
+        raise Http404
+    content_type, _ = mimetypes.guess_type(full_path)
+    encoding = negotiate(
+        request.META.get('HTTP_ACCEPT_ENCODING', ''),
+        [encoding for encoding, suffix in SUFFIXES.items()
+         if os.path.isfile(full_path + suffix)],
+    )
+    if encoding is not None:
+        full_path += SUFFIXES[encoding]
+    response = FileResponse(
+        open(full_path, 'rb'),
+        content_type=content_type or 'application/octet-stream',
+    )
+    if encoding is not None:
+        response['Content-Encoding'] = encoding
+    patch_vary_headers(response, ('Accept-Encoding',))
+    if HASHED_RE.search(path):
+        patch_cache_control(response, public=True,
+                            max_age=IMMUTABLE_MAX_AGE, immutable=True)
+    else:
+        patch_cache_control(response, public=True,
+                            max_age=settings.STATIC_MAX_AGE)
+    return response
@@ -0,0 +1,48 @@
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.contrib.staticfiles.utils import matches_patterns
+from django.core.files.base import ContentFile
+
+from .compression import SUFFIXES, available, compress
+
+# Что имеет смысл сжимать: картинки и шрифты уже сжаты
+COMPRESS_PATTERNS = ('*.css', '*.js', '*.map', '*.svg', '*.html', '*.txt',
+                     '*.json', '*.xml', '*.ico', '*.ttf', '*.eot')
+# Файлы меньше этого не сжимаем: выигрыш съедят заголовки
+COMPRESS_MIN_SIZE = 256
+# Статика сжимается один раз при collectstatic — берём максимум
+COMPRESS_LEVELS = {'br': 11, 'gzip': 9}
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    Имена с хэшем содержимого, как у ManifestStaticFilesStorage, и рядом
+    с каждым таким файлом готовые варианты .gz и .br. Содержимое файла
+    с хэшем в имени не меняется, поэтому его можно кэшировать навсегда,
+    а уже сжатые варианты не пересобираются при следующем collectstatic.
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name in sorted(set(self.hashed_files.values())):
+            if not matches_patterns(name, COMPRESS_PATTERNS):
+                continue
+            for compressed in self.compress_file(name):
+                yield name, compressed, True
+
+    def compress_file(self, name):
+        with self.open(name) as source:
+            data = source.read()
+        if len(data) < COMPRESS_MIN_SIZE:
+            return
+        for encoding in available():
+            compressed_name = name + SUFFIXES[encoding]
+            if self.exists(compressed_name):
+                continue
+            compressed = compress(data, encoding, COMPRESS_LEVELS[encoding])
+            # Вариант, который почти не меньше оригинала, не нужен
+            if len(compressed) > len(data) * 0.95:
+                continue
+            self._save(compressed_name, ContentFile(compressed))
+            yield compressed_name
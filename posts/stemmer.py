@@ -0,0 +1,142 @@
+"""
+Стеммер Snowball для русского языка.
+
+У SQLite FTS5 нет русского токенизатора, поэтому в индекс и в запрос
+попадают основы слов, посчитанные здесь.
+Алгоритм: https://snowballstem.org/algorithms/russian/stemmer.html
+"""
+import re
+
+VOWELS = 'аеиоуыэюя'
+
+PERFECTIVE_GERUND = (
+    ('вшись', 'вши', 'в'),
+    ('ившись', 'ывшись', 'ивши', 'ывши', 'ив', 'ыв'),
+)
+REFLEXIVE = ('ся', 'сь')
+ADJECTIVE = (
+    'ими', 'ыми', 'его', 'ого', 'ему', 'ому', 'ее', 'ие', 'ые', 'ое', 'ей',
+    'ий', 'ый', 'ой', 'ем', 'им', 'ым', 'ом', 'их', 'ых', 'ую', 'юю', 'ая',
+    'яя', 'ою', 'ею',
+)
+PARTICIPLE = (
+    ('ем', 'нн', 'вш', 'ющ', 'щ'),
+    ('ивш', 'ывш', 'ующ'),
+)
+VERB = (
+    ('ете', 'йте', 'ешь', 'нно', 'ла', 'на', 'ли', 'ем', 'ло', 'но', 'ет',
+     'ют', 'ны', 'ть', 'й', 'л', 'н'),
+    ('ейте', 'уйте', 'ила', 'ыла', 'ена', 'ите', 'или', 'ыли', 'ило', 'ыло',
+     'ено', 'ует', 'уют', 'ены', 'ить', 'ыть', 'ишь', 'ей', 'уй', 'ил', 'ыл',
+     'им', 'ым', 'ен', 'ят', 'ит', 'ыт', 'ую', 'ю'),
+)
+NOUN = (
+    'иями', 'ями', 'ами', 'ией', 'иям', 'ием', 'иях', 'ев', 'ов', 'ие', 'ье',
+    'еи', 'ии', 'ей', 'ой', 'ий', 'ям', 'ем', 'ам', 'ом', 'ах', 'ях', 'ию',
+    'ью', 'ия', 'ья', 'а', 'е', 'и', 'й', 'о', 'у', 'ы', 'ь', 'ю', 'я',
+)
+SUPERLATIVE = ('ейше', 'ейш')
+DERIVATIONAL = ('ость', 'ост')
+
+WORD_RE = re.compile(r'\w+')
+
+
+def by_length(endings):
+    return tuple(sorted(endings, key=len, reverse=True))
+
+
+PERFECTIVE_GERUND = tuple(by_length(group) for group in PERFECTIVE_GERUND)
+PARTICIPLE = tuple(by_length(group) for group in PARTICIPLE)
+VERB = tuple(by_length(group) for group in VERB)
+ADJECTIVE = by_length(ADJECTIVE)
+NOUN = by_length(NOUN)
+
+
+def regions(word):
+    """Начала областей RV и R2 по правилам Snowball."""
+    rv = r1 = r2 = len(word)
+    for i, char in enumerate(word):
+        if char in VOWELS:
+            rv = i + 1
+            break
+    for i in range(1, len(word)):
+        if word[i] not in VOWELS and word[i - 1] in VOWELS:
+            r1 = i + 1
+            break
+    for i in range(r1 + 1, len(word)):
+        if word[i] not in VOWELS and word[i - 1] in VOWELS:
+            r2 = i + 1
+            break
+    return rv, r2
+
+
+def strip(rv_part, endings):
+    for ending in endings:
+        if rv_part.endswith(ending):
+            return rv_part[:-len(ending)]
+    return None
+
+
+def strip_grouped(rv_part, groups):
+    """Окончания первой группы должны идти после «а» или «я»."""
+    first, second = groups
+    for ending in by_length(first + second):
+        if not rv_part.endswith(ending):
+            continue
+        stem = rv_part[:-len(ending)]
+        if ending in second or stem.endswith(('а', 'я')):
+            return stem
+    return None
+
+
+def strip_adjectival(rv_part):
+    stem = strip(rv_part, ADJECTIVE)
+    if stem is None:
+        return None
+    participle = strip_grouped(stem, PARTICIPLE)
+    return stem if participle is None else participle
+
+
+def stem(word):
+    word = word.lower().replace('ё', 'е')
+    rv, r2 = regions(word)
+    prefix, part = word[:rv], word[rv:]
+
+    stemmed = strip_grouped(part, PERFECTIVE_GERUND)
+    if stemmed is None:
+        reflexive = strip(part, REFLEXIVE)
+        if reflexive is not None:
+            part = reflexive
+        for step in (strip_adjectival,
+                     lambda value: strip_grouped(value, VERB),
+                     lambda value: strip(value, NOUN)):
+            stemmed = step(part)
+            if stemmed is not None:
+                break
+    if stemmed is not None:
+        part = stemmed
+
+    if part.endswith('и'):
+        part = part[:-1]
+
+    r2_in_part = max(r2 - rv, 0)
+    for ending in DERIVATIONAL:
+        if part.endswith(ending) and len(part) - len(ending) >= r2_in_part:
+            part = part[:-len(ending)]
+            break
+
+    if part.endswith('нн'):
+        part = part[:-1]
+    else:
+        superlative = strip(part, SUPERLATIVE)
+        if superlative is not None:
+            part = superlative
+            if part.endswith('нн'):
+                part = part[:-1]
+        elif part.endswith('ь'):
+            part = part[:-1]
+    return prefix + part
+
+
+def stem_text(text):
+    return ' '.join(stem(word) for word in WORD_RE.findall(text))
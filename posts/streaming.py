@@ -0,0 +1,59 @@
+"""
+Потоковый рендер лент (FEED_STREAMING): шапка страницы с навигацией
+уходит клиенту сразу, а карточки постов — пачками по мере рендера.
+Шаблоны те же, что и для обычного render().
+
+Посты читаются из БД во view, до ответа: запросы идут, пока живы
+маршрутизация по репликам и замеры SQL из middleware. Поток только
+рендерит. Страница собирается публичным API шаблонов: оболочка
+рендерится целиком с меткой stream_marker вместо списка постов и
+режется по ней, посты — шаблоном includes/post_items.html, пачками
+по STREAM_BATCH_SIZE. Так устроены обе ленты, Django и Jinja2.
+
+Только под WSGI: ASGI-обработчик Django 3.2 читает поток в цикле
+событий, где рендер заблокировал бы остальные запросы, поэтому там
+страница собирается целиком. Ошибка посреди потока обрывает
+страницу — заголовки к этому времени уже отправлены.
+"""
+import secrets
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from django.middleware.csrf import get_token
+from django.shortcuts import render
+from django.template import loader
+
+ITEMS_TEMPLATE = 'includes/post_items.html'
+# Постов в одном куске потока
+STREAM_BATCH_SIZE = 5
+
+
+def enabled(request):
+    return (settings.FEED_STREAMING
+            and not isinstance(request, ASGIRequest))
+
+
+def render_feed(request, template_name, context):
+    page = context['page']
+    if not enabled(request) or not page:
+        return render(request, template_name, context)
+    template = loader.get_template(template_name)
+    marker = secrets.token_hex(16)
+    shell = template.render(dict(context, stream_marker=marker), request)
+    head, tail = shell.split(marker)
+    # Куски после заголовков тоже могут вывести токен CSRF: cookie
+    # с ним должна уйти сейчас, а не когда ответ уже отправлен
+    get_token(request)
+    items = template.backend.get_template(ITEMS_TEMPLATE)
+    return StreamingHttpResponse(
+        chunks(request, items, context, list(page), head, tail)
+    )
+
+
+def chunks(request, items, context, posts, head, tail):
+    yield head
+    for start in range(0, len(posts), STREAM_BATCH_SIZE):
+        batch = posts[start:start + STREAM_BATCH_SIZE]
+        yield items.render(dict(context, posts=batch), request)
+    yield tail
@@ -0,0 +1,51 @@
+"""Фоновые задачи для posts.jobs: побочные эффекты записи постов."""
+from . import follows
+from .counters import sync_posts_counts
+from .jobs import task
+from .models import Follow, Post
+from .page_cache import touch_post_feeds
+from .search import index_post, unindex_post
+
+
+@task('post_counters', batch=True)
+def update_counters(payloads):
+    """Пересчитывает затронутых авторов и группы пачки по разу."""
+    authors, groups = set(), set()
+    for payload in payloads:
+        authors.update(payload['authors'])
+        groups.update(payload['groups'])
+    sync_posts_counts(authors, groups)
+    # Счётчики есть на страницах профиля и сообщества: закэшированные
+    # до выполнения задачи показывали бы старое число
+    touch_post_feeds(authors, groups)
+
+
+@task('index_posts', batch=True)
+def index_posts(payloads):
+    """Индексирует посты в их текущем виде; удалённые убирает из индекса."""
+    ids = {payload['post_id'] for payload in payloads}
+    texts = dict(Post.objects.filter(pk__in=ids).values_list('id', 'text'))
+    for pk in ids:
+        if pk in texts:
+            index_post(pk, texts[pk])
+        else:
+            unindex_post(pk)
+
+
+@task('fan_out', batch=True)
+def fan_out(payloads):
+    ids = {payload['post_id'] for payload in payloads}
+    for post in Post.objects.filter(pk__in=ids).only('author', 'pub_date'):
+        follows.fan_out(post)
+
+
+@task('sync_follow')
+def sync_follow(user_id, author_id):
+    """
+    Приводит входящие к текущему состоянию подписки, поэтому порядок
+    задач «подписался» и «отписался» не важен.
+    """
+    if Follow.objects.filter(user_id=user_id, author_id=author_id).exists():
+        follows.backfill(user_id, author_id)
+    else:
+        follows.drop(user_id, author_id)
@@ -0,0 +1,61 @@
+import re
+
+from django.template import TemplateDoesNotExist
+from django.template.loaders.base import Loader
+
+INCLUDE_RE = re.compile(
+    r'{%\s*include\s+(?P<quote>["\'])(?P<name>[^"\']+)(?P=quote)'
+    r'(?P<extra>[^%]*?)\s*%}'
+)
+# Такие шаблоны встраивать нельзя: блоки и наследование работают
+# только на уровне шаблона целиком
+UNSAFE_RE = re.compile(r'{%\s*(block|extends)\b')
+
+
+class FlatteningLoader(Loader):
+    """
+    Встраивает {% include "имя" %} с постоянным именем прямо в текст
+    шаблона: include в цикле перестаёт искать шаблон и создавать узел
+    на каждой итерации. Аргументы with превращаются в {% with %},
+    include с only и шаблоны с блоками остаются как есть.
+
+    Номера строк в отладочных сообщениях смещаются, поэтому загрузчик
+    включается вместе с кэшем шаблонов, то есть в продакшене.
+    """
+
+    def __init__(self, engine, loaders):
+        super().__init__(engine)
+        self.loaders = engine.get_template_loaders(loaders)
+
+    def get_template_sources(self, template_name):
+        for loader in self.loaders:
+            yield from loader.get_template_sources(template_name)
+
+    def get_contents(self, origin):
+        return self.flatten(origin.loader.get_contents(origin),
+                            (origin.template_name,))
+
+    def source(self, template_name):
+        for origin in self.get_template_sources(template_name):
+            try:
+                return origin.loader.get_contents(origin)
+            except TemplateDoesNotExist:
+                continue
+        return None
+
+    def flatten(self, contents, seen):
+        def inline(match):
+            name = match.group('name')
+            extra = match.group('extra').split()
+            if (name in seen or name.startswith('.') or 'only' in extra
+                    or (extra and extra[0] != 'with')):
+                return match.group(0)
+            included = self.source(name)
+            if included is None or UNSAFE_RE.search(included):
+                return match.group(0)
+            included = self.flatten(included, seen + (name,))
+            if extra:
+                return (f'{{% with {" ".join(extra[1:])} %}}'
+                        f'{included}{{% endwith %}}')
+            return included
+        return INCLUDE_RE.sub(inline, contents)
@@ -0,0 +1,19 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from posts.cards import get_generation, render_card
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def post_card(context, post):
+    # Поколение читаем из кэша один раз за рендер страницы
+    render_context = context.render_context
+    if 'post_card_generation' not in render_context:
+        render_context['post_card_generation'] = get_generation()
+    return mark_safe(render_card(
+        post,
+        context.get('user'),
+        render_context['post_card_generation'],
+    ))
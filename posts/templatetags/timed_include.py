@@ -0,0 +1,26 @@
+from django import template
+from django.template.loader_tags import IncludeNode, do_include
+
+from posts.timing import timed_render
+
+register = template.Library()
+
+
+class TimedIncludeNode(IncludeNode):
+    def render(self, context):
+        with timed_render('include', str(self.template.var)):
+            return super().render(context)
+
+
+@register.tag('include')
+def timed_include(parser, token):
+    """
+    {% include %} с замером: подключается через OPTIONS['builtins']
+    и заменяет встроенный тег во всех шаблонах.
+    """
+    node = do_include(parser, token)
+    return TimedIncludeNode(
+        node.template,
+        extra_context=node.extra_context,
+        isolated_context=node.isolated_context,
+    )
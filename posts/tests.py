@@ -1,11 +1,57 @@
-from django.test import Client, TestCase
-from django.urls import reverse
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+import unittest
+import zlib
+from unittest import mock
+from contextlib import nullcontext
+from datetime import timedelta
+from io import StringIO
 
-from posts.models import Group, Post, User
+from asgiref.sync import async_to_sync
+from asgiref.testing import ApplicationCommunicator
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import FileSystemStorage
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError, connection
+from django.template import engines
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.test import (Client, RequestFactory, TestCase,
+                         TransactionTestCase, override_settings)
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
+
+from posts import async_views, benchmark, timeline, views
+from posts import follows, groups, jobs, ratelimit, static_serve
+from posts.cards import card_key, get_generation
+from posts.compression import negotiate
+from posts.counters import recount
+from posts.forms import PostForm
+from posts.bulk import keep_auto_dates
+from posts.middleware import (CompressionMiddleware, RateLimitMiddleware,
+                               ReplicaMiddleware, RequestTimingMiddleware)
+from posts.models import (AuthorStats, Follow, Group, InboxEntry, Job, Post,
+                          User)
+from posts.page_cache import current_generations, generation_key
+from posts.paginator import NEXT, CursorPaginator, encode_cursor
+from posts.routers import ReplicaRouter
+from posts.search import index_missing, unindex_post
+from posts.static_storage import CompressedManifestStaticFilesStorage
+from posts.template_loaders import FlatteningLoader
+from posts.timing import Jinja2, timed_sync_to_async
+from yatube.asgi import application
+from yatube.template_settings import templates
 
 
 class TestProfile(TestCase):
     def setUp(self):
+        cache.clear()
         self.client = Client()
         self.user = User.objects.create_user(
             username='HaroldFinch'
@@ -25,6 +71,9 @@ class TestProfile(TestCase):
         )
 
 
+# Побочные эффекты записи проверяются сразу после неё,
+# без обработчика очереди
+@override_settings(JOBS_EAGER=True)
 class TestPostCreaton(TestCase):
     def setUp(self):
         self.client = Client()
@@ -224,3 +273,1723 @@ class TestUnAuthAccess(TestCase):
         self.assertEqual(Post.objects.count(), 0,
                          msg='Сайт позволяет создавать посты'
                              ' неавторизованным пользователям')
+
+
+@override_settings(POSTS_PER_PAGE=10)
+class TestCursorPagination(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='HaroldFinch')
+        Post.objects.bulk_create(
+            Post(text=f'Пост {i}', author=self.user) for i in range(25)
+        )
+        # Одинаковая дата у всех постов: порядок должен держаться на id
+        Post.objects.update(pub_date=timezone.now())
+        self.expected = list(
+            Post.objects.order_by('-pub_date', '-id').values_list(
+                'id', flat=True
+            )
+        )
+
+    def get_page(self, cursor=None):
+        params = {'cursor': cursor} if cursor else {}
+        return self.client.get(reverse('index'), params).context['page']
+
+    def test_walk_forward_and_back(self):
+        pages = [self.get_page()]
+        while pages[-1].has_next():
+            pages.append(self.get_page(pages[-1].next_cursor))
+        seen = [post.id for page in pages for post in page]
+        self.assertEqual(seen, self.expected,
+                         msg='Курсор теряет или дублирует записи')
+        self.assertEqual([len(page) for page in pages], [10, 10, 5])
+        self.assertFalse(pages[0].has_previous())
+
+        # Возвращаемся назад по previous_cursor и получаем те же страницы
+        back = self.get_page(pages[-1].previous_cursor)
+        self.assertEqual([post.id for post in back],
+                         [post.id for post in pages[1]])
+        first = self.get_page(back.previous_cursor)
+        self.assertEqual([post.id for post in first], self.expected[:10])
+        self.assertFalse(first.has_previous())
+
+    def test_deep_page_has_no_offset(self):
+        page = self.get_page()
+        with CaptureQueriesContext(connection) as queries:
+            deep = page.paginator.get_page(page.next_cursor)
+        self.assertEqual(len(deep), 10)
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('OFFSET', queries[0]['sql'].upper())
+
+    def test_broken_cursor_returns_first_page(self):
+        page = self.get_page('not-a-cursor')
+        self.assertEqual([post.id for post in page], self.expected[:10])
+
+    def test_out_of_range_id_returns_first_page(self):
+        url = reverse('profile', args=[self.user.username])
+        for pk in (10 ** 30, 0, -1):
+            with self.subTest(pk=pk):
+                cursor = encode_cursor(NEXT, timezone.now(), pk)
+                response = self.client.get(url, {'cursor': cursor})
+                self.assertEqual(
+                    [post.id for post in response.context['page']],
+                    self.expected[:10]
+                )
+
+
+class TestFeedIndexes(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='HaroldFinch')
+        self.group = Group.objects.create(
+            title='Person of Interest',
+            slug='PoV'
+        )
+        Post.objects.create(text='Пост', author=self.user, group=self.group)
+
+    def test_feeds_use_indexes(self):
+        out = StringIO()
+        # --fail-on-sort упадёт с CommandError, если лента сортирует
+        # всю таблицу вместо чтения по индексу
+        call_command('explain_feeds', '--fail-on-sort', stdout=out)
+        for feed in ('index', 'group', 'profile'):
+            self.assertIn(feed, out.getvalue())
+
+
+@override_settings(JOBS_EAGER=True)
+class TestCounters(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='HaroldFinch')
+        self.group = Group.objects.create(
+            title='Person of Interest',
+            slug='PoV'
+        )
+        self.group2 = Group.objects.create(
+            title='Game of Thrones',
+            slug='GoT'
+        )
+        self.client.force_login(self.user)
+
+    def assertCounts(self, author, group, group2):
+        self.group.refresh_from_db()
+        self.group2.refresh_from_db()
+        self.assertEqual(AuthorStats.objects.get(user=self.user).posts_count,
+                         author, msg='Счётчик постов автора не совпадает')
+        self.assertEqual(self.group.posts_count, group,
+                         msg='Счётчик постов сообщества не совпадает')
+        self.assertEqual(self.group2.posts_count, group2,
+                         msg='Счётчик постов сообщества не совпадает')
+
+    def test_create_edit_delete(self):
+        self.client.post(reverse('new_post'),
+                         {'text': 'Пост', 'group': self.group.id})
+        post = Post.objects.get()
+        self.assertCounts(1, 1, 0)
+        self.client.post(
+            reverse('post_edit', args=[self.user.username, post.id]),
+            {'text': 'Пост', 'group': self.group2.id}
+        )
+        self.assertCounts(1, 0, 1)
+        post.delete()
+        self.assertCounts(0, 0, 0)
+
+    def test_recount_repairs_drift(self):
+        Post.objects.create(text='Пост', author=self.user, group=self.group)
+        Group.objects.update(posts_count=42)
+        AuthorStats.objects.all().delete()
+        call_command('recount', stdout=StringIO())
+        self.assertCounts(1, 1, 0)
+
+    def test_author_card_uses_counter(self):
+        Post.objects.create(text='Пост', author=self.user, group=self.group)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse('profile', args=[self.user.username])
+            )
+        self.assertContains(response, 'Записей: 1')
+        self.assertFalse(
+            any('COUNT(' in query['sql'] for query in queries),
+            msg='Профиль всё ещё считает посты через COUNT'
+        )
+
+
+class TestPostCardCache(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client2 = Client()
+        self.user = User.objects.create_user(username='HaroldFinch')
+        self.user2 = User.objects.create_user(username='JohnReese')
+        self.group = Group.objects.create(
+            title='Person of Interest',
+            slug='PoV'
+        )
+        self.post = Post.objects.create(text='Only the paranoid survive',
+                                        author=self.user, group=self.group)
+        self.client.force_login(self.user)
+        self.client2.force_login(self.user2)
+        self.edit_url = reverse('post_edit',
+                                args=[self.user.username, self.post.id])
+
+    def test_card_is_cached_once_for_all_users(self):
+        self.client.get(reverse('index'))
+        key = card_key(self.post, get_generation())
+        self.assertIsNotNone(cache.get(key),
+                             msg='Карточка поста не попала в кэш')
+        # Ссылка на редактирование видна только автору,
+        # хотя карточка в кэше одна
+        self.assertContains(self.client.get(reverse('index')),
+                            self.edit_url)
+        self.assertNotContains(self.client2.get(reverse('index')),
+                               self.edit_url)
+
+    def test_edit_bumps_version(self):
+        self.client.get(reverse('index'))
+        self.client.post(self.edit_url, {'text': 'No, not your rules.',
+                                         'group': self.group.id})
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.version, 2)
+        response = self.client2.get(reverse('index'))
+        self.assertContains(response, 'No, not your rules.')
+        self.assertNotContains(response, 'Only the paranoid survive')
+
+    def test_group_rename_resets_cards(self):
+        self.client.get(reverse('index'))
+        self.group.title = 'Westworld'
+        self.group.save()
+        self.assertContains(self.client.get(reverse('index')), 'Westworld')
+
+
+class TestPageCache(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='HaroldFinch')
+        self.group = Group.objects.create(
+            title='Person of Interest',
+            slug='PoV'
+        )
+        self.post = Post.objects.create(text='Only the paranoid survive',
+                                        author=self.user, group=self.group)
+        self.urls = (
+            reverse('index'),
+            reverse('group', args=[self.group.slug]),
+            reverse('profile', args=[self.user.username]),
+        )
+
+    def test_anonymous_hit_without_queries(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.assertEqual(
+                    self.client.get(url)['X-Page-Cache'], 'miss'
+                )
+                with self.assertNumQueries(0):
+                    response = self.client.get(url)
+                self.assertEqual(response['X-Page-Cache'], 'hit')
+                self.assertContains(response, self.post.text)
+
+    def test_authenticated_bypass(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('index'))
+        self.assertFalse(response.has_header('X-Page-Cache'))
+
+    @override_settings(PAGE_CACHE_STALE_WINDOW=0)
+    def test_post_change_invalidates_feeds(self):
+        for url in self.urls:
+            self.client.get(url)
+        self.post.text = 'No, not your rules.'
+        self.post.save()
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response['X-Page-Cache'], 'miss')
+                self.assertContains(response, 'No, not your rules.')
+
+    @override_settings(PAGE_CACHE_STALE_WINDOW=60)
+    def test_stale_while_revalidate(self):
+        url = reverse('index')
+        self.client.get(url)
+        self.post.text = 'No, not your rules.'
+        self.post.save()
+        # Пока один запрос пересобирает страницу, остальные
+        # получают устаревшую копию без обращения к БД
+        cache.add(f'page:{url}::lock', 1)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response['X-Page-Cache'], 'stale')
+        self.assertContains(response, 'Only the paranoid survive')
+        cache.delete(f'page:{url}::lock')
+        response = self.client.get(url)
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+        self.assertContains(response, 'No, not your rules.')
+        # Пересобравший страницу запрос снимает свой замок
+        self.assertIsNone(cache.get(f'page:{url}::lock'))
+
+    @override_settings(PAGE_CACHE_STALE_WINDOW=60)
+    def test_miss_keeps_foreign_lock(self):
+        url = reverse('index')
+        cache.add(f'page:{url}::lock', 1)
+        # Копии нет: запрос собирает страницу, но замок чужой
+        self.assertEqual(self.client.get(url)['X-Page-Cache'], 'miss')
+        self.assertEqual(cache.get(f'page:{url}::lock'), 1)
+
+    def test_unknown_feed_generation_expires(self):
+        with mock.patch.object(cache, 'add', wraps=cache.add) as add:
+            self.client.get(reverse('group', args=['missing']))
+        add.assert_called_once_with(generation_key('group:missing'),
+                                    mock.ANY, settings.PAGE_CACHE_TIMEOUT)
+
+
+class TestConditionalGet(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='HaroldFinch')
+        self.group = Group.objects.create(
+            title='Person of Interest',
+            slug='PoV'
+        )
+        self.post = Post.objects.create(text='Only the paranoid survive',
+                                        author=self.user, group=self.group)
+        self.post_url = reverse('post',
+                                args=[self.user.username, self.post.id])
+
+    def test_feed_not_modified_without_queries(self):
+        for url in (reverse('index'),
+                    reverse('group', args=[self.group.slug]),
+                    reverse('profile', args=[self.user.username])):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertTrue(response.has_header('ETag'))
+                self.assertTrue(response.has_header('Last-Modified'))
+                with self.assertNumQueries(0):
+                    response = self.client.get(
+                        url, HTTP_IF_NONE_MATCH=response['ETag']
+                    )
+                self.assertEqual(response.status_code, 304)
+
+    def test_post_not_modified_until_edit(self):
+        response = self.client.get(self.post_url)
+        etag = response['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(self.post_url,
+                                       HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(
+            self.post_url,
+            HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        )
+        self.assertEqual(response.status_code, 304)
+
+        self.post.text = 'No, not your rules.'
+        self.post.save()
+        response = self.client.get(self.post_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'No, not your rules.')
+
+    def test_etag_depends_on_user(self):
+        anonymous = self.client.get(reverse('index'))['ETag']
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('index'),
+                                   HTTP_IF_NONE_MATCH=anonymous)
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(JOBS_EAGER=True)
+class TestFeedQueries(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='HaroldFinch',
+                                             first_name='Harold')
+        self.group = Group.objects.create(
+            title='Person of Interest',
+            slug='PoV'
+        )
+        # Разные авторы и сообщества, чтобы N+1 был заметен
+        for i in range(10):
+            author = User.objects.create_user(username=f'author{i}')
+            group = Group.objects.create(title=f'Группа {i}', slug=f'g{i}')
+            Post.objects.create(text=f'Пост {i}', author=author, group=group)
+        for i in range(10):
+            self.post = Post.objects.create(text=f'Пост {i}',
+                                            author=self.user,
+                                            group=self.group)
+
+    def assertQueries(self, url, expected):
+        # Чистим кэш, чтобы считать запросы рендера, а не попадания в кэш
+        cache.clear()
+        with self.assertNumQueries(expected):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_feed_query_counts(self):
+        # После очистки кэша лента главной собирается заново
+        self.assertQueries(reverse('index'), 2)
+        # Справочник сообществ сброшен созданием групп: его версия,
+        # сама таблица и посты
+        self.assertQueries(reverse('group', args=[self.group.slug]), 3)
+        self.assertQueries(reverse('profile', args=[self.user.username]), 2)
+        # Запрос версии поста для ETag и сам пост
+        response = self.assertQueries(
+            reverse('post', args=[self.user.username, self.post.id]), 2
+        )
+        self.assertContains(response, 'Harold')
+        self.assertContains(response, 'Записей: 10')
+
+    def test_index_hydrates_from_timeline(self):
+        cache.clear()
+        timeline.read()
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('index'))
+        self.assertEqual(len(response.context['page']), 10)
+
+    def test_group_context_has_no_queryset(self):
+        response = self.client.get(reverse('group', args=[self.group.slug]))
+        self.assertNotIn('posts', response.context)
+
+    def test_group_count_survives_deleted_group(self):
+        response = self.client.get(reverse('group', args=[self.group.slug]))
+        paginator = response.context['paginator']
+        self.group.delete()
+        with self.assertNumQueries(1):
+            self.assertEqual(paginator.count, 0)
+
+
+class TestBenchmark(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_seed_and_run_all_routes(self):
+        author = benchmark.seed(users=5, groups=2, posts=30, batch_size=7)
+        self.assertEqual(Post.objects.count(), 30)
+        self.assertEqual(author.stats.posts_count, author.posts.count())
+        dates = list(Post.objects.values_list('pub_date', flat=True))
+        self.assertEqual(len(set(dates)), 30,
+                         msg='bulk_create затёр даты публикации')
+
+        results = benchmark.run(author, repeat=1)
+        names = {name for name, _ in benchmark.bench_urls()}
+        self.assertEqual({key.split('|')[0] for key in results}, names)
+        for key, row in results.items():
+            with self.subTest(route=key):
+                self.assertIn(row['status'], (200, 302))
+
+    def test_regressions(self):
+        baseline = {'index|anon': {'queries': 1, 'p95_ms': 10, 'bytes': 100}}
+        same = {'index|anon': {'queries': 1, 'p95_ms': 11, 'bytes': 100}}
+        worse = {'index|anon': {'queries': 2, 'p95_ms': 11, 'bytes': 200}}
+        self.assertEqual(benchmark.regressions(same, baseline, 0.25), [])
+        self.assertEqual(
+            len(benchmark.regressions(worse, baseline, 0.25)), 2
+        )
+
+
+class TestRequestTiming(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='HaroldFinch')
+        Post.objects.create(text='Пост', author=self.user)
+
+    @override_settings(REQUEST_TIMING_SAMPLE_RATE=1)
+    def test_server_timing_header(self):
+        timeline.read()
+        with self.assertLogs('yatube.timing', 'INFO') as logs:
+            response = self.client.get(reverse('index'))
+        header = response['Server-Timing']
+        for metric in ('db;', 'db-slowest;', 'tpl;', 'view;', 'total;'):
+            self.assertIn(metric, header)
+        self.assertIn('desc="1 queries"', header)
+        self.assertIn('"path": "/"', logs.output[0])
+
+    @override_settings(REQUEST_TIMING_SAMPLE_RATE=0)
+    def test_sampling_off(self):
+        response = self.client.get(reverse('index'))
+        self.assertFalse(response.has_header('Server-Timing'))
+
+    @override_settings(REQUEST_TIMING_SAMPLE_RATE=1,
+                       REQUEST_TIMING_DETECT_N_PLUS_ONE=True,
+                       REQUEST_TIMING_N_PLUS_ONE_THRESHOLD=3)
+    def test_n_plus_one_flagged(self):
+        # View, который по запросу на пост достаёт автора — типичный N+1
+        def view(request):
+            for post in Post.objects.all():
+                User.objects.get(pk=post.author_id)
+            return HttpResponse()
+
+        for i in range(3):
+            Post.objects.create(text=f'Пост {i}', author=self.user)
+        middleware = RequestTimingMiddleware(view)
+        with self.assertLogs('yatube.timing', 'WARNING') as logs:
+            response = middleware(RequestFactory().get('/'))
+        self.assertEqual(response['X-N-Plus-One'], '1')
+        self.assertIn('"count": 4', logs.output[0])
+
+    @override_settings(REQUEST_TIMING_SAMPLE_RATE=1)
+    def test_async_view_queries_counted(self):
+        async def view(request):
+            count = await timed_sync_to_async(Post.objects.count)()
+            return HttpResponse(str(count))
+
+        middleware = RequestTimingMiddleware(view)
+        with self.assertLogs('yatube.timing', 'INFO'):
+            response = async_to_sync(middleware)(RequestFactory().get('/'))
+        self.assertIn('desc="1 queries"', response['Server-Timing'])
+
+
+class TestImportPosts(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='HaroldFinch')
+        self.group = Group.objects.create(
+            title='Person of Interest',
+            slug='PoV'
+        )
+
+    def import_file(self, suffix, content, *args):
+        with tempfile.NamedTemporaryFile('w', suffix=suffix, delete=False,
+                                         encoding='utf-8') as source:
+            source.write(content)
+        self.addCleanup(os.remove, source.name)
+        out = StringIO()
+        call_command('import_posts', source.name, '--batch-size', '2',
+                     *args, stdout=out, stderr=StringIO())
+        return out.getvalue()
+
+    def test_jsonl_keeps_pub_date_and_counters(self):
+        records = [
+            {'author': 'HaroldFinch', 'group': 'PoV', 'text': f'Пост {i}',
+             'pub_date': f'2011-09-2{i}T21:00:00+00:00'}
+            for i in range(5)
+        ]
+        records.append({'author': 'Nobody', 'text': 'Потерянный пост'})
+        out = self.import_file(
+            '.jsonl', '\n'.join(json.dumps(record) for record in records)
+        )
+        self.assertIn('Готово: 5 постов', out)
+        self.assertIn('пропущено 1', out)
+        self.assertEqual(
+            sorted(post.pub_date.day for post in Post.objects.all()),
+            [20, 21, 22, 23, 24],
+            msg='Импорт не сохранил pub_date из источника'
+        )
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 5)
+        self.assertEqual(self.user.stats.posts_count, 5)
+
+    def test_csv_creates_missing(self):
+        self.import_file(
+            '.csv',
+            'author,group,text,pub_date\n'
+            'JohnReese,GoT,"Первый, с запятой",2012-01-01 10:00:00\n'
+            'JohnReese,,Второй,\n',
+            '--create-missing',
+        )
+        author = User.objects.get(username='JohnReese')
+        self.assertEqual(author.posts.count(), 2)
+        self.assertEqual(Group.objects.get(slug='GoT').posts_count, 1)
+        self.assertTrue(
+            author.posts.filter(text='Первый, с запятой').exists()
+        )
+
+
+class TestExportPosts(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.staff = User.objects.create_user(username='Root', is_staff=True)
+        self.user = User.objects.create_user(username='HaroldFinch')
+        self.group = Group.objects.create(
+            title='Person of Interest',
+            slug='PoV'
+        )
+        for i in range(7):
+            Post.objects.create(text=f'Пост {i}', author=self.user,
+                                group=self.group if i % 2 else None)
+        # Одинаковые даты проверяют, что пачки не теряют записи на стыке
+        Post.objects.update(pub_date=timezone.now())
+        self.client.force_login(self.staff)
+
+    def export(self, **params):
+        with self.settings(EXPORT_BATCH_SIZE=3):
+            response = self.client.get(reverse('export_posts'), params)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_jsonl_streams_all_posts_in_batches(self):
+        lines = self.export().splitlines()
+        ids = [json.loads(line)['id'] for line in lines]
+        self.assertEqual(ids, list(
+            Post.objects.order_by('-pub_date', '-id').values_list(
+                'id', flat=True)
+        ))
+        record = json.loads(lines[0])
+        self.assertEqual(record['author'], 'HaroldFinch')
+
+    def test_filters(self):
+        lines = self.export(group='PoV').splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(all(json.loads(line)['group'] == 'PoV'
+                            for line in lines))
+        self.assertEqual(self.export(until='2000-01-01'), '')
+        self.assertEqual(
+            len(self.export(format='csv', author='HaroldFinch').splitlines()),
+            8
+        )
+
+    def test_invalid_dates(self):
+        for value in ('вчера', '2020-02-30', '2020-13-01T00:00'):
+            with self.subTest(value=value):
+                response = self.client.get(reverse('export_posts'),
+                                           {'since': value})
+                self.assertEqual(response.status_code, 400)
+                with self.assertRaises(CommandError):
+                    call_command('export_posts', '--until', value,
+                                 stdout=StringIO())
+
+    def test_staff_only(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('export_posts'))
+        self.assertEqual(response.status_code, 302)
+
+    def test_command_output_can_be_imported(self):
+        out = StringIO()
+        call_command('export_posts', '--batch-size', '2', stdout=out)
+        Post.objects.all().delete()
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False,
+                                         encoding='utf-8') as source:
+            source.write(out.getvalue())
+        self.addCleanup(os.remove, source.name)
+        call_command('import_posts', source.name, stdout=StringIO())
+        self.assertEqual(Post.objects.count(), 7)
+
+
+@override_settings(JOBS_EAGER=True)
+class TestSearch(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='HaroldFinch')
+        self.post = Post.objects.create(
+            text='Машина наблюдает за всеми жителями города',
+            author=self.user
+        )
+        Post.objects.create(text='Совсем другой пост', author=self.user)
+
+    def found(self, query):
+        response = self.client.get(reverse('search'), {'q': query})
+        return [post.id for post in response.context['page']]
+
+    def test_russian_word_forms(self):
+        for query in ('машины', 'жителей', 'наблюдали город'):
+            with self.subTest(query=query):
+                self.assertEqual(self.found(query), [self.post.id])
+        self.assertEqual(self.found('самолёт'), [])
+        self.assertEqual(self.found(''), [])
+
+    def test_index_follows_edit_and_delete(self):
+        self.post.text = 'Самаритянин отключил машину'
+        self.post.save()
+        self.assertEqual(self.found('жители'), [])
+        self.assertEqual(self.found('самаритянина'), [self.post.id])
+        self.post.delete()
+        self.assertEqual(self.found('самаритянина'), [])
+
+    @unittest.skipUnless(connection.vendor == 'sqlite', 'нужен FTS5')
+    def test_index_missing_fills_gaps(self):
+        newer = Post.objects.create(text='Самаритянин', author=self.user)
+        # Старый пост выпал из индекса, новый на месте
+        unindex_post(self.post.id)
+        self.assertEqual(index_missing(batch_size=1), 1)
+        self.assertEqual(self.found('машины'), [self.post.id])
+        self.assertEqual(self.found('самаритянин'), [newer.id])
+        self.assertEqual(index_missing(), 0)
+
+    def test_pagination_keeps_query(self):
+        for i in range(12):
+            Post.objects.create(text=f'Машина номер {i}', author=self.user)
+        response = self.client.get(reverse('search'), {'q': 'машина'})
+        page = response.context['page']
+        self.assertContains(response, f'?q=%D0%BC%D0%B0%D1%88%D0%B8%D0%BD'
+                                      f'%D0%B0&amp;cursor={page.next_cursor}')
+        response = self.client.get(
+            reverse('search'), {'q': 'машина', 'cursor': page.next_cursor}
+        )
+        self.assertEqual(len(response.context['page']), 3)
+
+    def test_admin_uses_index(self):
+        admin = User.objects.create_superuser('Root', 'root@example.com',
+                                              'password')
+        self.client.force_login(admin)
+        response = self.client.get('/admin/posts/post/', {'q': 'жителям'})
+        self.assertEqual(
+            [post.id for post in response.context['cl'].result_list],
+            [self.post.id]
+        )
+
+
+class TestAdminScaling(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.admin = User.objects.create_superuser('Root', 'root@example.com',
+                                                   'password')
+        self.group = Group.objects.create(
+            title='Person of Interest',
+            slug='PoV'
+        )
+        for i in range(5):
+            author = User.objects.create_user(username=f'author{i}')
+            Post.objects.create(text=f'Пост {i}', author=author)
+        self.client.force_login(self.admin)
+
+    def test_changelist_has_no_per_row_queries(self):
+        url = '/admin/posts/post/'
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(len(response.context['cl'].result_list), 5)
+        Post.objects.create(text='Ещё пост', author=self.admin)
+        with self.assertNumQueries(len(queries)):
+            self.client.get(url)
+
+    @override_settings(ADMIN_EXACT_COUNT_LIMIT=0)
+    def test_estimated_count_without_count_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/admin/posts/post/')
+        self.assertEqual(response.context['cl'].result_count, 5)
+        self.assertFalse(
+            any('COUNT(' in query['sql'] for query in queries),
+            msg='Админка считает посты через COUNT(*)'
+        )
+
+    def test_group_search(self):
+        response = self.client.get('/admin/posts/group/', {'q': 'Interest'})
+        self.assertEqual(list(response.context['cl'].result_list),
+                         [self.group])
+
+    def test_foreign_keys_use_autocomplete(self):
+        response = self.client.get('/admin/posts/post/add/')
+        widgets = response.context['adminform'].form.fields
+        for field in ('author', 'group'):
+            self.assertEqual(
+                type(widgets[field].widget.widget).__name__,
+                'AutocompleteSelect'
+            )
+
+
+class TestGroupDirectory(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.group = Group.objects.create(
+            title='Person of Interest',
+            slug='PoV'
+        )
+        groups.directory()
+
+    def test_lookup_and_choices_without_queries(self):
+        with self.assertNumQueries(0):
+            group = groups.get_group_or_404('PoV')
+            choices = list(PostForm().fields['group'].choices)
+        self.assertEqual(group.pk, self.group.pk)
+        self.assertEqual([label for _, label in choices],
+                         ['---------', 'Person of Interest'])
+
+    def test_invalidated_on_save_and_delete(self):
+        self.group.title = 'Westworld'
+        self.group.save()
+        self.assertEqual(groups.get_group_or_404('PoV').title, 'Westworld')
+        self.group.delete()
+        with self.assertRaises(Http404):
+            groups.get_group_or_404('PoV')
+
+    @override_settings(GROUP_DIRECTORY_LOCAL_TTL=0)
+    def test_change_from_other_process_seen_after_ttl(self):
+        # Другой процесс: его сигналы не сбрасывают нашу копию
+        with mock.patch('posts.signals.invalidate_groups'):
+            Group.objects.create(title='Westworld', slug='ww')
+            self.group.title = 'Machine'
+            self.group.save()
+        self.assertEqual(groups.get_group_or_404('ww').title, 'Westworld')
+        self.assertEqual(groups.get_group_or_404('PoV').title, 'Machine')
+
+    def test_form_still_validates_group(self):
+        form = PostForm({'text': 'Пост', 'group': self.group.pk})
+        self.assertTrue(form.is_valid())
+        self.assertEqual(form.cleaned_data['group'], self.group)
+        form = PostForm({'text': 'Пост', 'group': 100500})
+        self.assertFalse(form.is_valid())
+
+
+class TestAsyncFeeds(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        self.user = User.objects.create_user(username='HaroldFinch')
+        self.group = Group.objects.create(
+            title='Person of Interest',
+            slug='PoV'
+        )
+        self.post = Post.objects.create(text='Машина следит за всеми',
+                                        author=self.user, group=self.group)
+        self.pages = (
+            ('index', {}),
+            ('group_posts', {'slug': self.group.slug}),
+            ('profile', {'username': self.user.username}),
+            ('post_view', {'username': self.user.username,
+                           'post_id': self.post.id}),
+        )
+
+    def test_same_pages_as_sync_views(self):
+        for name, kwargs in self.pages:
+            with self.subTest(view=name):
+                cache.clear()
+                sync_response = getattr(views, name)(
+                    self.anonymous_request(), **kwargs
+                )
+                cache.clear()
+                async_response = async_to_sync(getattr(async_views, name))(
+                    self.factory.get('/'), **kwargs
+                )
+                self.assertEqual(async_response.status_code, 200)
+                self.assertEqual(async_response.content,
+                                 sync_response.content)
+
+    def test_not_modified(self):
+        for name, kwargs in self.pages:
+            with self.subTest(view=name):
+                view = async_to_sync(getattr(async_views, name))
+                etag = view(self.factory.get('/'), **kwargs)['ETag']
+                response = view(
+                    self.factory.get('/', HTTP_IF_NONE_MATCH=etag), **kwargs
+                )
+                self.assertEqual(response.status_code, 304)
+
+    def test_missing_post(self):
+        with self.assertRaises(Http404):
+            async_to_sync(async_views.post_view)(
+                self.factory.get('/'), username=self.user.username,
+                post_id=self.post.id + 1
+            )
+
+    def anonymous_request(self):
+        request = self.factory.get('/')
+        request.user = async_views.AnonymousUser()
+        return request
+
+
+class TestAsgiApplication(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='HaroldFinch')
+        Post.objects.create(text='Машина следит за всеми', author=self.user)
+
+    async def get(self, path):
+        communicator = ApplicationCommunicator(application, {
+            'type': 'http', 'method': 'GET', 'path': path,
+            'query_string': b'', 'headers': [(b'host', b'testserver')],
+            'http_version': '1.1',
+        })
+        await communicator.send_input({'type': 'http.request'})
+        start = await communicator.receive_output(5)
+        body = await communicator.receive_output(5)
+        return start, body
+
+    @override_settings(REQUEST_TIMING_SAMPLE_RATE=1)
+    def test_feed_through_asgi(self):
+        with self.assertLogs('yatube.timing', 'INFO'):
+            start, body = async_to_sync(self.get)('/')
+        self.assertEqual(start['status'], 200)
+        self.assertIn('Машина следит за всеми', body['body'].decode())
+        headers = {name.lower() for name, _ in start['headers']}
+        self.assertIn(b'server-timing', headers)
+
+
+@override_settings(DATABASE_REPLICA='replica')
+class TestReplicaRouting(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        self.router = ReplicaRouter()
+        # Ленты давно не менялись: реплика их уже догнала
+        for feed in ('all', 'index'):
+            cache.set(generation_key(feed), 0, None)
+
+    def request(self, path, method='get', cookies=None, write=False,
+                read_feed=False):
+        def view(request):
+            middleware.process_view(request, None, (), {})
+            if read_feed:
+                current_generations(['all', 'index'])
+            if write:
+                self.router.db_for_write(Post)
+            return HttpResponse(self.router.db_for_read(Post))
+
+        middleware = ReplicaMiddleware(view)
+        request = getattr(self.factory, method)(path)
+        request.COOKIES.update(cookies or {})
+        request.resolver_match = resolve(path)
+        return middleware(request)
+
+    def test_feeds_read_from_replica(self):
+        for path in ('/', '/HaroldFinch/'):
+            with self.subTest(path=path):
+                self.assertEqual(self.request(path).content, b'replica')
+        self.assertEqual(self.request('/new/').content, b'default')
+
+    def test_writes_stick_to_primary(self):
+        response = self.request('/new/', 'post', write=True)
+        self.assertEqual(response.content, b'default')
+        cookie = response.cookies[ReplicaMiddleware.cookie_name]
+        response = self.request(
+            '/', cookies={cookie.key: cookie.value}
+        )
+        self.assertEqual(response.content, b'default')
+        self.assertNotIn(ReplicaMiddleware.cookie_name, response.cookies)
+
+    def test_recently_changed_feed_reads_primary(self):
+        self.assertEqual(self.request('/', read_feed=True).content,
+                         b'replica')
+        cache.set(generation_key('index'), time.time(), None)
+        self.assertEqual(self.request('/', read_feed=True).content,
+                         b'default')
+
+    @override_settings(DATABASE_REPLICA='')
+    def test_without_replica(self):
+        self.assertEqual(self.request('/').content, b'default')
+        response = self.request('/new/', 'post', write=True)
+        self.assertFalse(response.cookies)
+
+
+@override_settings(TIMELINE_SIZE=15)
+class TestTimeline(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='HaroldFinch')
+        start = timezone.now() - timedelta(days=1)
+        with keep_auto_dates(Post, 'pub_date'):
+            Post.objects.bulk_create(
+                Post(text=f'Пост {i}', author=self.user,
+                     pub_date=start + timedelta(minutes=i // 2))
+                for i in range(30)
+            )
+        timeline.invalidate()
+
+    def walk(self, paginator):
+        """id всех страниц вперёд до конца и обратно до начала."""
+        pages, page = [], paginator.get_page()
+        while True:
+            pages.append([post.id for post in page])
+            if not page.has_next():
+                break
+            page = paginator.get_page(page.next_cursor)
+        while page.has_previous():
+            page = paginator.get_page(page.previous_cursor)
+            pages.append([post.id for post in page])
+        return pages
+
+    def test_pages_match_plain_paginator(self):
+        plain = CursorPaginator(Post.objects.all(), 4)
+        materialized = CursorPaginator(Post.objects.all(), 4,
+                                       ids=timeline.window)
+        self.assertEqual(self.walk(materialized), self.walk(plain))
+
+    def test_first_pages_come_from_cache(self):
+        timeline.read()
+        with self.assertNumQueries(0):
+            direction, ids = timeline.window(None, 4)
+        self.assertEqual(len(ids), 5)
+        # За концом ленты источника нет — страницу читает запрос
+        last = Post.objects.order_by('pub_date', 'id').first()
+        cursor = encode_cursor(NEXT, last.pub_date, last.pk)
+        self.assertIsNone(timeline.window(cursor, 4))
+
+    def test_updated_on_create_and_delete(self):
+        timeline.read()
+        with self.assertNumQueries(0):
+            post = Post(text='Новый пост', author=self.user)
+            post.pub_date = timezone.now()
+            post.pk = 100500
+            timeline.post_created(post)
+        self.assertEqual(timeline.window(None, 4)[1][0], 100500)
+        timeline.post_deleted(100500)
+        self.assertNotIn(100500, timeline.window(None, 4)[1])
+
+    def test_signals_keep_timeline_fresh(self):
+        timeline.read()
+        post = Post.objects.create(text='Новый пост', author=self.user)
+        self.assertEqual(timeline.window(None, 4)[1][0], post.pk)
+        post.delete()
+        self.assertNotIn(post.pk, timeline.window(None, 4)[1])
+
+    def test_stale_timeline_falls_back_to_query(self):
+        timeline.read()
+        newest = Post.objects.order_by('-pub_date', '-id').first()
+        # Удаление в обход сигналов: лента о нём не знает
+        Post.objects.filter(pk=newest.pk)._raw_delete('default')
+        paginator = CursorPaginator(Post.objects.all(), 4,
+                                    ids=timeline.window)
+        page = paginator.get_page()
+        self.assertNotIn(newest, list(page))
+        self.assertEqual(len(page), 4)
+
+
+class TestTemplateModes(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='HaroldFinch')
+        self.group = Group.objects.create(title='Группа', slug='group')
+        for i in range(3):
+            Post.objects.create(text=f'Пост {i}', author=self.user,
+                                group=self.group)
+        self.urls = [
+            reverse('index'),
+            reverse('group', kwargs={'slug': self.group.slug}),
+            reverse('profile', kwargs={'username': self.user.username}),
+        ]
+
+    def pages(self, **options):
+        pages = []
+        config = templates(settings.TEMPLATES_DIR, **options)
+        with override_settings(TEMPLATES=config):
+            for url in self.urls:
+                cache.clear()
+                content = self.client.get(url).content.decode()
+                # Шаблоны расходятся только комментариями и отступами
+                content = re.sub(r'<!--.*?-->', '', content, flags=re.S)
+                pages.append(' '.join(content.split()))
+        return pages
+
+    def test_flattening_inlines_includes(self):
+        engine = engines['django'].engine
+        loader = FlatteningLoader(engine, engine.loaders)
+        origin = next(loader.get_template_sources('index.html'))
+        contents = loader.get_contents(origin)
+        self.assertNotIn('includes/post_item.html', contents)
+        self.assertNotIn('includes/nav.html', contents)
+
+    def test_cached_and_flattened_render_the_same(self):
+        plain = self.pages()
+        self.assertEqual(self.pages(cache=True), plain)
+        self.assertEqual(self.pages(cache=True, flatten=True), plain)
+
+    @unittest.skipUnless(Jinja2, 'jinja2 не установлен')
+    def test_jinja2_renders_the_same(self):
+        self.assertEqual(self.pages(cache=True, jinja2=True), self.pages())
+
+    @override_settings(REQUEST_TIMING_SAMPLE_RATE=1,
+                       REQUEST_TIMING_PROFILE_TEMPLATES=True)
+    def test_profile_includes(self):
+        with self.assertLogs('yatube.timing', 'INFO') as logs:
+            self.client.get(self.urls[0])
+        record = json.loads(logs.output[0].split(':', 2)[2])
+        profile = {(entry['kind'], entry['name']): entry
+                   for entry in record['templates']}
+        self.assertEqual(
+            profile['include', 'includes/post_item.html']['count'], 3
+        )
+        # Время вложенных шаблонов входит в время страницы, а не
+        # складывается с ним
+        page = profile['template', 'index.html']['ms']
+        self.assertLessEqual(record['template_ms'], page + 0.01)
+
+
+def gunzip(data):
+    return zlib.decompress(data, 31)
+
+
+@override_settings(RESPONSE_COMPRESSION=('gzip',))
+class TestCompression(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='HaroldFinch')
+        for i in range(5):
+            Post.objects.create(text=f'Пост {i}', author=self.user)
+
+    def test_negotiate(self):
+        self.assertEqual(negotiate('gzip, br', ('br', 'gzip')), 'br')
+        self.assertEqual(negotiate('gzip;q=1, br;q=0', ('br', 'gzip')),
+                         'gzip')
+        self.assertEqual(negotiate('*', ('gzip',)), 'gzip')
+        self.assertIsNone(negotiate('identity', ('br', 'gzip')))
+        self.assertIsNone(negotiate('', ('gzip',)))
+
+    def test_feed_compressed(self):
+        plain = self.client.get(reverse('index'))
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        response = self.client.get(reverse('index'),
+                                   HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(gunzip(response.content), plain.content)
+        self.assertLess(len(response.content), len(plain.content))
+        # Слабый ETag сжатой страницы по-прежнему даёт 304
+        self.assertTrue(response['ETag'].startswith('W/'))
+        response = self.client.get(reverse('index'),
+                                   HTTP_ACCEPT_ENCODING='gzip',
+                                   HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    @override_settings(RESPONSE_COMPRESSION=())
+    def test_compression_off(self):
+        response = self.client.get(reverse('index'),
+                                   HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_streaming_flushed_per_chunk(self):
+        chunks = [f'<p>{i}</p>'.encode() * 100 for i in range(3)]
+        middleware = CompressionMiddleware(
+            lambda request: StreamingHttpResponse(iter(chunks))
+        )
+        response = middleware(
+            RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip')
+        )
+        parts = list(response.streaming_content)
+        decompressor = zlib.decompressobj(31)
+        # Первый кусок разжимается целиком, не дожидаясь остальных
+        self.assertEqual(decompressor.decompress(parts[0]), chunks[0])
+        self.assertEqual(gunzip(b''.join(parts)), b''.join(chunks))
+
+
+class TestStaticPipeline(TestCase):
+    def setUp(self):
+        source = tempfile.mkdtemp()
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, source)
+        self.addCleanup(shutil.rmtree, self.root)
+        os.makedirs(os.path.join(source, 'css'))
+        with open(os.path.join(source, 'css', 'site.css'), 'w') as file:
+            file.write('body { margin: 0; }\n' * 100)
+        with open(os.path.join(source, 'css', 'tiny.css'), 'w') as file:
+            file.write('p {}')
+        self.storage = CompressedManifestStaticFilesStorage(
+            location=self.root, base_url='/static/'
+        )
+        source_storage = FileSystemStorage(location=source)
+        paths = {
+            'css/site.css': (source_storage, 'css/site.css'),
+            'css/tiny.css': (source_storage, 'css/tiny.css'),
+        }
+        for path, (_, name) in paths.items():
+            with source_storage.open(name) as file:
+                self.storage.save(path, file)
+        list(self.storage.post_process(paths))
+        self.hashed = self.storage.hashed_files['css/site.css']
+
+    def test_collect_builds_compressed_variants(self):
+        self.assertRegex(self.hashed, static_serve.HASHED_RE)
+        self.assertTrue(self.storage.exists(self.hashed + '.gz'))
+        # Маленькие файлы не сжимаются
+        tiny = self.storage.hashed_files['css/tiny.css']
+        self.assertFalse(self.storage.exists(tiny + '.gz'))
+
+    def test_serve_compressed_variant(self):
+        with override_settings(STATIC_ROOT=self.root):
+            response = static_serve.serve(
+                RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip'),
+                self.hashed,
+            )
+            plain = static_serve.serve(RequestFactory().get('/'),
+                                       'css/site.css')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(gunzip(b''.join(response.streaming_content)),
+                         b''.join(plain.streaming_content))
+        self.assertNotIn('immutable', plain['Cache-Control'])
+
+    def test_serve_outside_root(self):
+        with override_settings(STATIC_ROOT=self.root):
+            with self.assertRaises(Http404):
+                static_serve.serve(RequestFactory().get('/'),
+                                   '../etc/passwd')
+
+
+class TestFeedStreaming(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='HaroldFinch')
+        self.group = Group.objects.create(title='Группа', slug='group')
+        for i in range(5):
+            Post.objects.create(text=f'Пост {i}', author=self.user,
+                                group=self.group)
+        self.urls = [
+            reverse('index'),
+            reverse('group', kwargs={'slug': self.group.slug}),
+            reverse('profile', kwargs={'username': self.user.username}),
+            reverse('search') + '?q=Пост',
+        ]
+
+    def pages(self, client):
+        pages = []
+        for url in self.urls:
+            cache.clear()
+            response = client.get(url)
+            if response.streaming:
+                pages.append(b''.join(response.streaming_content))
+            else:
+                pages.append(response.content)
+        return pages
+
+    def test_same_html_as_render(self):
+        author = Client()
+        author.force_login(self.user)
+        for client in (self.client, author):
+            plain = self.pages(client)
+            with override_settings(FEED_STREAMING=True):
+                self.assertEqual(self.pages(client), plain)
+
+    @unittest.skipUnless(Jinja2, 'jinja2 не установлен')
+    def test_same_html_with_jinja2(self):
+        config = templates(settings.TEMPLATES_DIR, jinja2=True)
+        with override_settings(TEMPLATES=config):
+            plain = self.pages(self.client)
+            with override_settings(FEED_STREAMING=True):
+                self.assertEqual(self.pages(self.client), plain)
+
+    @override_settings(FEED_STREAMING=True)
+    def test_no_queries_while_streaming(self):
+        response = self.client.get(reverse('index'))
+        self.assertTrue(response.streaming)
+        # Посты прочитаны во view: поток только рендерит
+        with CaptureQueriesContext(connection) as captured:
+            chunks = [chunk.decode() for chunk in response.streaming_content]
+        self.assertEqual(len(captured), 0)
+        self.assertIn('<nav', chunks[0])
+        self.assertNotIn('Пост', chunks[0])
+        # Шапка, пачка из пяти постов и подвал
+        self.assertEqual(len(chunks), 3)
+        self.assertEqual(chunks[1].count('Пост'), 5)
+        # Токен CSRF разрешён до отправки заголовков
+        self.assertIn(settings.CSRF_COOKIE_NAME, response.cookies)
+
+    @override_settings(FEED_STREAMING=True)
+    def test_empty_feed_rendered_whole(self):
+        response = self.client.get(reverse('search') + '?q=нетакого')
+        self.assertFalse(response.streaming)
+        self.assertContains(response, 'ничего не найдено')
+
+    @override_settings(FEED_STREAMING=True)
+    def test_streamed_page_cached(self):
+        response = self.client.get(reverse('index'))
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+        content = b''.join(response.streaming_content)
+        response = self.client.get(reverse('index'))
+        self.assertEqual(response['X-Page-Cache'], 'hit')
+        self.assertEqual(response.content, content)
+
+
+@override_settings(JOBS_EAGER=True)
+class TestFollow(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.reader = User.objects.create_user(username='reader')
+        self.author = User.objects.create_user(username='HaroldFinch')
+        self.other = User.objects.create_user(username='JohnReese')
+        self.client = Client()
+        self.client.force_login(self.reader)
+        self.follow_url = reverse('profile_follow',
+                                  args=[self.author.username])
+        self.unfollow_url = reverse('profile_unfollow',
+                                    args=[self.author.username])
+
+    def feed(self):
+        posts, cursor = [], None
+        while True:
+            url = reverse('follow_index')
+            if cursor:
+                url += f'?cursor={cursor}'
+            page = self.client.get(url).context['page']
+            posts += [post.text for post in page]
+            if not page.has_next():
+                return posts
+            cursor = page.next_cursor
+
+    def test_follow_and_unfollow(self):
+        self.assertEqual(self.client.get(self.follow_url).status_code, 405)
+        self.client.post(self.follow_url)
+        self.client.post(self.follow_url)
+        self.assertEqual(Follow.objects.count(), 1)
+        self.author.stats.refresh_from_db()
+        self.assertEqual(self.author.stats.followers_count, 1)
+        self.assertEqual(self.reader.stats.following_count, 1)
+        response = self.client.get(reverse('profile',
+                                           args=[self.author.username]))
+        self.assertContains(response, 'Подписчиков: 1')
+        self.assertContains(response, 'Отписаться')
+
+        self.client.post(self.unfollow_url)
+        self.assertFalse(Follow.objects.exists())
+        self.author.stats.refresh_from_db()
+        self.assertEqual(self.author.stats.followers_count, 0)
+        self.assertFalse(InboxEntry.objects.exists())
+
+    def test_cannot_follow_self(self):
+        self.client.post(reverse('profile_follow',
+                                 args=[self.reader.username]))
+        self.assertFalse(Follow.objects.exists())
+
+    def test_new_posts_fan_out(self):
+        Post.objects.create(text='Старый пост', author=self.author)
+        self.client.post(self.follow_url)
+        Post.objects.create(text='Новый пост', author=self.author)
+        Post.objects.create(text='Чужой пост', author=self.other)
+        self.assertEqual(InboxEntry.objects.filter(user=self.reader).count(),
+                         2)
+        self.assertEqual(self.feed(), ['Новый пост', 'Старый пост'])
+
+    @override_settings(FOLLOW_PULL_POSTS_PER_DAY=3, POSTS_PER_PAGE=2)
+    def test_prolific_author_pulled_on_read(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.reader, author=self.other)
+        for i in range(6):
+            Post.objects.create(text=f'Автор {i}', author=self.author)
+            Post.objects.create(text=f'Другой {i}', author=self.other)
+        self.assertTrue(
+            AuthorStats.objects.get(user=self.other).pull_feed
+        )
+        # Часть постов успела разойтись по входящим, остальные
+        # подмешиваются при чтении — без пропусков и повторов
+        expected = list(
+            Post.objects.order_by('-pub_date', '-id')
+            .values_list('text', flat=True)
+        )
+        self.assertEqual(self.feed(), expected)
+
+    def test_page_cost_does_not_grow_with_follows(self):
+        def page_queries():
+            with CaptureQueriesContext(connection) as captured:
+                self.client.get(reverse('follow_index'))
+            return len(captured)
+
+        Follow.objects.create(user=self.reader, author=self.author)
+        Post.objects.create(text='Пост', author=self.author)
+        few = page_queries()
+        for i in range(20):
+            author = User.objects.create_user(username=f'author-{i}')
+            Follow.objects.create(user=self.reader, author=author)
+            Post.objects.create(text=f'Пост {i}', author=author)
+        self.assertEqual(page_queries(), few)
+
+    def test_bulk_fan_out_and_recount(self):
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        last_id = Post.objects.count()
+        with keep_auto_dates(Post, 'pub_date', 'updated_at'):
+            Post.objects.bulk_create(
+                Post(text=f'Пост {i}', author=self.author,
+                     pub_date=timezone.now() - timedelta(hours=i),
+                     updated_at=timezone.now())
+                for i in range(3)
+            )
+        follows.fan_out_since(last_id)
+        self.assertEqual(len(self.feed()), 3)
+        # Подписка в обход сигналов: счётчики чинит recount
+        Follow.objects.bulk_create([Follow(user=self.other,
+                                           author=self.author)])
+        recount()
+        self.author.stats.refresh_from_db()
+        self.assertEqual(self.author.stats.followers_count, 2)
+        follow.delete()
+        self.author.stats.refresh_from_db()
+        self.assertEqual(self.author.stats.followers_count, 1)
+
+
+@override_settings(JOBS_EAGER=False)
+class TestJobs(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='HaroldFinch')
+        self.reader = User.objects.create_user(username='reader')
+        self.group = Group.objects.create(title='Machine', slug='machine')
+        Follow.objects.create(user=self.reader, author=self.user)
+        jobs.run_pending()
+
+    def test_post_side_effects_are_queued(self):
+        for i in range(3):
+            Post.objects.create(text=f'Пост номер {i}', author=self.user,
+                                group=self.group)
+        self.assertEqual(
+            sorted(Job.objects.values_list('name', flat=True).distinct()),
+            ['fan_out', 'index_posts', 'post_counters'],
+        )
+        self.user.stats.refresh_from_db()
+        self.assertEqual(self.user.stats.posts_count, 0)
+        self.assertFalse(InboxEntry.objects.exists())
+        # Пакетные задачи: по одному вызову на имя, а не на пост
+        with CaptureQueriesContext(connection) as batched:
+            self.assertEqual(jobs.run_pending(), (9, 0))
+        self.assertFalse(Job.objects.exists())
+        self.user.stats.refresh_from_db()
+        self.group.refresh_from_db()
+        self.assertEqual(self.user.stats.posts_count, 3)
+        self.assertEqual(self.group.posts_count, 3)
+        self.assertEqual(InboxEntry.objects.filter(user=self.reader).count(),
+                         3)
+        response = self.client.get(reverse('search') + '?q=номер')
+        self.assertEqual(len(response.context['page']), 3)
+
+        Post.objects.create(text='Ещё один', author=self.user,
+                            group=self.group)
+        with CaptureQueriesContext(connection) as single:
+            jobs.run_pending()
+        self.assertLess(len(batched), 3 * len(single))
+
+    def test_counters_refresh_cached_pages(self):
+        url = reverse('profile', args=[self.user.username])
+        self.client.get(url)
+        Post.objects.create(text='Пост', author=self.user)
+        self.client.get(url)
+        jobs.run_pending()
+        response = self.client.get(url)
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+        self.assertEqual(response.context['paginator'].count, 1)
+
+    def test_counters_converge_in_any_order(self):
+        post = Post.objects.create(text='Пост', author=self.user)
+        post.group = self.group
+        post.save()
+        post.delete()
+        # Повтор задачи (например, после сбоя обработчика) не портит счётчики
+        payloads = list(Job.objects.filter(name='post_counters')
+                        .values_list('payload', flat=True))
+        jobs.run_pending()
+        jobs.execute('post_counters', payloads)
+        self.user.stats.refresh_from_db()
+        self.group.refresh_from_db()
+        self.assertEqual(self.user.stats.posts_count, 0)
+        self.assertEqual(self.group.posts_count, 0)
+
+    def test_unfollow_before_backfill(self):
+        Post.objects.create(text='Пост', author=self.user)
+        Follow.objects.filter(user=self.reader).delete()
+        Follow.objects.create(user=self.reader, author=self.user)
+        Follow.objects.filter(user=self.reader).delete()
+        jobs.run_pending()
+        self.assertFalse(InboxEntry.objects.filter(user=self.reader).exists())
+
+    def test_failed_job_retried_with_backoff(self):
+        calls = []
+
+        @jobs.task('test_flaky')
+        def flaky(n):
+            calls.append(n)
+            raise ValueError('сбой')
+
+        self.addCleanup(jobs.TASKS.pop, 'test_flaky')
+        with override_settings(JOB_MAX_ATTEMPTS=2, JOB_RETRY_DELAY=10):
+            job = jobs.enqueue('test_flaky', n=1)
+            with self.assertLogs('yatube.jobs', 'WARNING'):
+                self.assertEqual(jobs.run_pending(), (0, 1))
+            job.refresh_from_db()
+            self.assertEqual(job.attempts, 1)
+            self.assertEqual(job.state, Job.PENDING)
+            self.assertIn('ValueError', job.last_error)
+            self.assertGreater(job.run_at,
+                               timezone.now() + timedelta(seconds=5))
+            # До срока повтора задача не берётся
+            self.assertEqual(jobs.run_pending(), (0, 0))
+
+            Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+            with self.assertLogs('yatube.jobs', 'WARNING'):
+                jobs.run_pending()
+            job.refresh_from_db()
+            self.assertEqual(job.state, Job.FAILED)
+            Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+            self.assertEqual(jobs.run_pending(), (0, 0))
+        self.assertEqual(calls, [1, 1])
+
+    def test_rolled_back_save_leaves_no_jobs(self):
+        # Сбой в сигнале после постановки задач откатывает и пост
+        with mock.patch('posts.signals.touch_post_feeds',
+                        side_effect=DatabaseError), \
+                self.assertRaises(DatabaseError):
+            Post.objects.create(text='Пост', author=self.user)
+        self.assertFalse(Post.objects.exists())
+        self.assertFalse(Job.objects.exists())
+        # Сбой при постановке задачи не оставляет поста без неё
+        with mock.patch.object(Job.objects, 'create',
+                               side_effect=DatabaseError), \
+                self.assertRaises(DatabaseError):
+            Post.objects.create(text='Пост', author=self.user)
+        self.assertFalse(Post.objects.exists())
+
+    def test_unknown_task(self):
+        with self.assertRaises(LookupError):
+            jobs.enqueue('no_such_task')
+
+    def test_claimed_job_not_taken_twice(self):
+        Post.objects.create(text='Пост', author=self.user)
+        claimed = jobs.claim(10, 'first')
+        self.assertEqual(len(claimed), 3)
+        self.assertEqual(jobs.claim(10, 'second'), [])
+        # Аренда истекла — задачи упавшего обработчика забирает другой
+        Job.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(len(jobs.claim(10, 'second')), 3)
+
+    def test_run_jobs_command(self):
+        Post.objects.create(text='Пост', author=self.user)
+        with self.assertRaises(CommandError):
+            call_command('run_jobs', '--once', stdout=StringIO())
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location)
+        out = StringIO()
+        with override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': location,
+        }}):
+            call_command('run_jobs', '--once', stdout=out)
+        self.assertIn('Выполнено задач: 3', out.getvalue())
+        self.assertFalse(Job.objects.exists())
+
+
+@override_settings(JOBS_EAGER=True)
+class TestApi(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='HaroldFinch')
+        self.other = User.objects.create_user(username='JohnReese')
+        self.group = Group.objects.create(title='Machine', slug='machine')
+        self.posts = [
+            Post.objects.create(text=f'Пост номер {i}', author=self.author,
+                                group=self.group if i % 2 else None)
+            for i in range(25)
+        ]
+        self.client = Client()
+
+    def get(self, url, **headers):
+        response = self.client.get(url, **headers)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        return response, json.loads(response.content)
+
+    def test_cursor_pagination(self):
+        url, texts = reverse('api_posts'), []
+        while url:
+            response, data = self.get(url)
+            texts += [post['text'] for post in data['results']]
+            url = data['next']
+        self.assertEqual(texts,
+                         [post.text for post in reversed(self.posts)])
+        _, data = self.get(reverse('api_posts') + '?limit=5')
+        _, second = self.get(data['next'])
+        _, first = self.get(second['previous'])
+        self.assertEqual(first['results'], data['results'])
+        response, _ = self.get(reverse('api_posts') + '?cursor=broken')
+        self.assertEqual(response.status_code, 400)
+
+    def test_filters(self):
+        _, data = self.get(reverse('api_posts') + '?group=machine&limit=100')
+        self.assertEqual(len(data['results']), 12)
+        self.assertEqual(data['results'][0]['group'],
+                         {'id': self.group.pk, 'slug': 'machine',
+                          'title': 'Machine'})
+        _, data = self.get(reverse('api_posts') + '?author=JohnReese')
+        self.assertEqual(data['results'], [])
+        response, _ = self.get(reverse('api_posts') + '?author=missing')
+        self.assertEqual(response.status_code, 404)
+
+    def test_sparse_fields(self):
+        _, data = self.get(reverse('api_posts') + '?fields=text&limit=2')
+        self.assertEqual(data['results'][0],
+                         {'id': self.posts[-1].pk, 'text': 'Пост номер 24'})
+        with CaptureQueriesContext(connection) as captured:
+            self.get(reverse('api_post', args=[self.posts[0].pk])
+                     + '?fields=text')
+        self.assertNotIn('"author"', captured[-1]['sql'])
+        self.assertNotIn('"updated_at"', captured[-1]['sql'])
+        response, data = self.get(reverse('api_posts') + '?fields=secret')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('secret', data['error'])
+
+    def test_queries_per_call(self):
+        urls = {
+            reverse('api_posts') + '?limit=100': 1,
+            reverse('api_posts') + '?group=machine': 1,
+            reverse('api_posts') + '?author=HaroldFinch': 2,
+            reverse('api_post', args=[self.posts[0].pk]): 1,
+            reverse('api_groups'): 0,
+            reverse('api_groups') + '?fields=posts_count': 1,
+            reverse('api_user', args=['HaroldFinch']): 1,
+        }
+        for url, queries in urls.items():
+            # Первый запрос наполняет справочник сообществ и ленту главной
+            self.client.get(url)
+            with self.subTest(url=url), self.assertNumQueries(queries):
+                self.client.get(url)
+
+    def test_batched_ids(self):
+        ids = [self.posts[3].pk, self.posts[1].pk, 10 ** 9, self.posts[3].pk]
+        with self.assertNumQueries(1):
+            _, data = self.get(
+                reverse('api_posts')
+                + '?ids=' + ','.join(map(str, ids)) + '&fields=author'
+            )
+        self.assertEqual(
+            data['results'],
+            [{'id': pk, 'author': {'id': self.author.pk,
+                                   'username': 'HaroldFinch'}}
+             for pk in (self.posts[3].pk, self.posts[1].pk)],
+        )
+        for ids in ('1,x', '99999999999999999999', '0', '-1'):
+            with self.subTest(ids=ids):
+                response, _ = self.get(reverse('api_posts') + f'?ids={ids}')
+                self.assertEqual(response.status_code, 400)
+        _, data = self.get(reverse('api_groups')
+                           + f'?ids={self.group.pk}&fields=posts_count')
+        self.assertEqual(data['results'],
+                         [{'id': self.group.pk, 'posts_count': 12}])
+
+    def test_etag(self):
+        url = reverse('api_posts') + '?group=machine'
+        response, _ = self.get(url)
+        etag = response['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        Post.objects.create(text='Новый', author=self.author,
+                            group=self.group)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_user(self):
+        _, data = self.get(reverse('api_user', args=['HaroldFinch']))
+        self.assertEqual(data['posts_count'], 25)
+        self.assertEqual(data['followers_count'], 0)
+        _, data = self.get(reverse('api_user', args=['JohnReese'])
+                           + '?fields=username,posts_count')
+        self.assertEqual(data, {'id': self.other.pk, 'username': 'JohnReese',
+                                'posts_count': 0})
+
+    def test_payload_smaller_than_html(self):
+        html = self.client.get(reverse('index')).content
+        response = self.client.get(reverse('api_posts') + '?limit=10')
+        self.assertLess(len(response.content) * 2, len(html))
+
+    def test_write(self):
+        url = reverse('api_posts')
+        body = json.dumps({'text': 'Из приложения', 'group': self.group.pk})
+        response = self.client.post(url, body,
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 401)
+
+        self.client.force_login(self.author)
+        response = self.client.post(url, body,
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        post = Post.objects.get(text='Из приложения')
+        self.assertEqual(post.group, self.group)
+        self.assertEqual(response['Location'],
+                         reverse('api_post', args=[post.pk]))
+        response = self.client.post(url, '{}',
+                                    content_type='application/json')
+        self.assertIn('text', json.loads(response.content)['errors'])
+
+        detail = reverse('api_post', args=[post.pk])
+        response = self.client.patch(detail, json.dumps({'text': 'Правка'}),
+                                     content_type='application/json')
+        self.assertEqual(json.loads(response.content)['text'], 'Правка')
+        post.refresh_from_db()
+        self.assertEqual((post.text, post.group), ('Правка', self.group))
+
+        self.client.force_login(self.other)
+        self.assertEqual(self.client.delete(detail).status_code, 403)
+        self.client.force_login(self.author)
+        self.assertEqual(self.client.delete(detail).status_code, 204)
+        self.assertFalse(Post.objects.filter(pk=post.pk).exists())
+
+    def test_csrf_required(self):
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.author)
+        response = client.post(reverse('api_posts'), '{"text": "x"}',
+                               content_type='application/json')
+        self.assertEqual(response.status_code, 403)
+
+
+@override_settings(RATE_LIMITS={
+    'new_post': {'user': (2, 60), 'ip': (4, 60)},
+    'login': {'ip': (2, 60)},
+})
+class TestRateLimit(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='HaroldFinch')
+        self.other = User.objects.create_user(username='JohnReese')
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def post(self, client=None, **extra):
+        return (client or self.client).post(reverse('new_post'),
+                                            {'text': 'Пост'}, **extra)
+
+    def test_user_bucket(self):
+        self.assertEqual(self.post().status_code, 302)
+        self.assertEqual(self.post().status_code, 302)
+        with self.assertLogs('yatube.ratelimit', 'WARNING'), \
+                self.assertNumQueries(2):
+            # Сессия и пользователь; до формы и записи дело не доходит
+            response = self.post()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '30')
+        self.assertEqual(Post.objects.count(), 2)
+        # Чтение формы не ограничено
+        self.assertEqual(self.client.get(reverse('new_post')).status_code,
+                         200)
+        other = Client()
+        other.force_login(self.other)
+        self.assertEqual(self.post(other).status_code, 302)
+        with self.assertLogs('yatube.ratelimit', 'WARNING'):
+            # Общий IP исчерпал и своё ведро
+            self.assertEqual(self.post(other).status_code, 429)
+        self.assertEqual(self.post(other, REMOTE_ADDR='10.0.0.2')
+                         .status_code, 302)
+        self.assertEqual(ratelimit.rejections(),
+                         {('new_post', 'user'): 1, ('new_post', 'ip'): 1})
+        out = StringIO()
+        call_command('ratelimit_stats', stdout=out)
+        self.assertIn('new_post', out.getvalue())
+
+    def test_anonymous_login(self):
+        url = reverse('login')
+        client = Client()
+        for _ in range(2):
+            client.post(url, {'username': 'HaroldFinch', 'password': 'x'})
+        with self.assertLogs('yatube.ratelimit', 'WARNING'), \
+                self.assertNumQueries(0):
+            response = client.post(url, {'username': 'HaroldFinch',
+                                         'password': 'x'})
+        self.assertEqual(response.status_code, 429)
+
+    def test_bucket_refills(self):
+        now = time.time()
+        for _ in range(2):
+            self.assertEqual(ratelimit.take('bucket', 2, 60, now), 0)
+        self.assertAlmostEqual(ratelimit.take('bucket', 2, 60, now), 30)
+        self.assertAlmostEqual(ratelimit.take('bucket', 2, 60, now + 20), 10)
+        self.assertEqual(ratelimit.take('bucket', 2, 60, now + 30), 0)
+        self.assertGreater(ratelimit.take('bucket', 2, 60, now + 30), 0)
+
+    def test_async_middleware(self):
+        async def get_response(request):
+            return HttpResponse()
+
+        middleware = RateLimitMiddleware(get_response)
+        url = reverse('new_post')
+        responses = []
+        for _ in range(3):
+            request = RequestFactory().post(url)
+            request.resolver_match = resolve(url)
+            # Ленивый пользователь, как у AuthenticationMiddleware: запрос
+            # к БД из цикла событий упал бы с SynchronousOnlyOperation
+            request.user = SimpleLazyObject(
+                lambda: User.objects.get(pk=self.user.pk)
+            )
+            with self.assertLogs('yatube.ratelimit', 'WARNING') \
+                    if len(responses) == 2 else nullcontext():
+                responses.append(async_to_sync(middleware.process_view)(
+                    request, None, (), {}
+                ))
+        self.assertEqual(responses[:2], [None, None])
+        self.assertEqual(responses[2].status_code, 429)
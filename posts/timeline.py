@@ -0,0 +1,167 @@
+"""
+Материализованная лента главной: (pub_date, id) последних
+TIMELINE_SIZE постов в кэше, от новых к старым.
+
+Кэш не умеет сравнивать-и-записывать, поэтому согласованность держится
+на счётчике версий: incr атомарен, и запись ленты с версией, которая
+успела устареть, при чтении отбрасывается и собирается заново.
+"""
+import bisect
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+
+from .models import Post
+from .paginator import NEXT, PREVIOUS, decode_cursor
+
+TIMELINE_KEY = 'timeline:index'
+VERSION_KEY = 'timeline:version'
+LOCK_KEY = 'timeline:lock'
+
+
+def get_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Начинаем не с нуля: после очистки кэша версия не совпадёт
+        # с записью, которую успел сделать запрос, начатый до неё
+        cache.add(VERSION_KEY, time.time_ns(), None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def bump_version():
+    try:
+        return cache.incr(VERSION_KEY)
+    except ValueError:
+        get_version()
+        return None
+
+
+def build(version):
+    rows = list(
+        Post.objects.order_by('-pub_date', '-id')
+        .values_list('pub_date', 'id')[:settings.TIMELINE_SIZE]
+    )
+    entry = {
+        'version': version,
+        'rows': rows,
+        # Лента короче предела — в ней все посты, дальше искать нечего
+        'complete': len(rows) < settings.TIMELINE_SIZE,
+    }
+    cache.set(TIMELINE_KEY, entry, settings.TIMELINE_TIMEOUT)
+    return entry
+
+
+def read():
+    version = get_version()
+    entry = cache.get(TIMELINE_KEY)
+    if entry is None or entry['version'] != version:
+        entry = build(version)
+    return entry
+
+
+def update(change):
+    """
+    Применяет change(entry) к ленте. Если её в это же время правит
+    другой запрос или она уже устарела, только сдвигаем версию:
+    ленту соберут заново при чтении.
+    """
+    if not cache.add(LOCK_KEY, 1, 5):
+        bump_version()
+        return
+    try:
+        version = get_version()
+        entry = cache.get(TIMELINE_KEY)
+        new_version = bump_version()
+        if (entry is None or entry['version'] != version
+                or new_version != version + 1):
+            return
+        change(entry)
+        entry['version'] = new_version
+        cache.set(TIMELINE_KEY, entry, settings.TIMELINE_TIMEOUT)
+    finally:
+        cache.delete(LOCK_KEY)
+
+
+def sort_key(row):
+    pub_date, pk = row
+    return (-pub_date.timestamp(), -pk)
+
+
+def insert(pub_date, pk):
+    def change(entry):
+        rows = entry['rows']
+        row = (pub_date, pk)
+        if row in rows:
+            return
+        position = bisect.bisect(
+            [sort_key(item) for item in rows], sort_key(row)
+        )
+        if position == len(rows) and not entry['complete']:
+            # Старше всего, что в ленте, а за её концом есть посты
+            return
+        rows.insert(position, row)
+        if len(rows) > settings.TIMELINE_SIZE:
+            del rows[settings.TIMELINE_SIZE:]
+            entry['complete'] = False
+    return change
+
+
+def remove(pk):
+    def change(entry):
+        entry['rows'] = [row for row in entry['rows'] if row[1] != pk]
+    return change
+
+
+def after_commit(change):
+    """
+    Правим ленту сразу и ещё раз после фиксации транзакции: запрос,
+    собравший ленту до фиксации, не увидел изменения, а повторная
+    правка сдвинет версию и отбросит его запись.
+    """
+    update(change)
+    if connection.in_atomic_block:
+        transaction.on_commit(lambda: update(change))
+
+
+def post_created(post):
+    after_commit(insert(post.pub_date, post.pk))
+
+
+def post_deleted(pk):
+    after_commit(remove(pk))
+
+
+def invalidate():
+    """После массовых операций в обход сигналов."""
+    bump_version()
+
+
+def window(cursor, per_page):
+    """
+    Источник ids для CursorPaginator главной: (направление, id страницы
+    и ещё одного поста за ней) или None, если ленты не хватает —
+    курсор за её концом.
+    """
+    entry = read()
+    rows, complete = entry['rows'], entry['complete']
+    size = per_page + 1
+    if not cursor:
+        direction, found = None, rows[:size]
+    else:
+        direction, pub_date, pk = decode_cursor(cursor)
+        keys = [sort_key(row) for row in rows]
+        key = sort_key((pub_date, pk))
+        if rows and key > keys[-1] and not complete:
+            return None
+        if direction == NEXT:
+            start = bisect.bisect_right(keys, key)
+            found = rows[start:start + size]
+        else:
+            end = bisect.bisect_left(keys, key)
+            found = rows[max(end - size, 0):end][::-1]
+    if direction != PREVIOUS and len(found) < size and not complete:
+        return None
+    return direction, [pk for _, pk in found]
@@ -0,0 +1,154 @@
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import sync_to_async
+from django.db import connections
+from django.template.backends.django import DjangoTemplates, Template
+
+# Замер текущего запроса; None, если запрос не попал в выборку
+current_timing = ContextVar('current_timing', default=None)
+
+
+class RequestTiming:
+    def __init__(self, collect_sql=False, profile_templates=False):
+        self.started = time.perf_counter()
+        self.view_started = None
+        self.view_ms = 0.0
+        self.queries = 0
+        self.sql_ms = 0.0
+        self.slowest_ms = 0.0
+        self.slowest_sql = ''
+        self.template_ms = 0.0
+        self.template_depth = 0
+        self.collect_sql = collect_sql
+        self.statements = {}
+        self.profile_templates = profile_templates
+        # (вид, имя) -> [вызовов, мс]; время включает вложенные шаблоны
+        self.templates = {}
+
+    def execute(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            self.queries += 1
+            self.sql_ms += elapsed
+            if elapsed > self.slowest_ms:
+                self.slowest_ms, self.slowest_sql = elapsed, sql
+            if self.collect_sql:
+                self.statements[sql] = self.statements.get(sql, 0) + 1
+
+    def repeated(self, threshold):
+        """Одинаковые запросы, повторённые threshold раз и больше."""
+        return sorted(
+            ((sql, count) for sql, count in self.statements.items()
+             if count >= threshold),
+            key=lambda item: -item[1],
+        )
+
+    def add_template(self, kind, name, elapsed):
+        entry = self.templates.setdefault((kind, name), [0, 0.0])
+        entry[0] += 1
+        entry[1] += elapsed
+
+    def template_profile(self):
+        return [
+            {'kind': kind, 'name': name, 'count': count, 'ms': round(ms, 2)}
+            for (kind, name), (count, ms) in sorted(
+                self.templates.items(), key=lambda item: -item[1][1]
+            )
+        ]
+
+    @property
+    def total_ms(self):
+        return (time.perf_counter() - self.started) * 1000
+
+
+@contextmanager
+def timed_queries(timing):
+    """Подключает замер к соединениям текущего потока."""
+    with ExitStack() as stack:
+        if timing is not None:
+            for connection in connections.all():
+                stack.enter_context(
+                    connection.execute_wrapper(timing.execute)
+                )
+        yield
+
+
+def timed_sync_to_async(func):
+    """
+    sync_to_async, при котором запросы к БД попадают в замер: соединения
+    у потока sync_to_async свои, и обёртка middleware на них не действует.
+    """
+    def call(*args, **kwargs):
+        with timed_queries(current_timing.get()):
+            return func(*args, **kwargs)
+    return sync_to_async(call)
+
+
+@contextmanager
+def timed_render(kind, name):
+    """
+    Замер рендера шаблона. В template_ms попадает только внешний
+    рендер: карточки и include внутри страницы уже входят в её время.
+    """
+    timing = current_timing.get()
+    if timing is None:
+        yield
+        return
+    started = time.perf_counter()
+    timing.template_depth += 1
+    try:
+        yield
+    finally:
+        timing.template_depth -= 1
+        elapsed = (time.perf_counter() - started) * 1000
+        if not timing.template_depth:
+            timing.template_ms += elapsed
+        if timing.profile_templates:
+            timing.add_template(kind, name, elapsed)
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        with timed_render('template', self.origin.template_name):
+            return super().render(context, request)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """Шаблонизатор Django, который учитывает время рендера в замере."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return TimedTemplate(template.template, self)
+
+
+try:
+    from django.template.backends.jinja2 import Jinja2
+except ImportError:
+    Jinja2 = None
+else:
+    class TimedJinja2Template:
+        def __init__(self, template):
+            self.template = template
+            self.origin = template.origin
+            self.backend = template.backend
+
+        def render(self, context=None, request=None):
+            with timed_render('jinja2', self.origin.template_name):
+                return self.template.render(context, request)
+
+    class TimedJinja2(Jinja2):
+        """Jinja2 с тем же замером, что и TimedDjangoTemplates."""
+
+        def from_string(self, template_code):
+            return TimedJinja2Template(super().from_string(template_code))
+
+        def get_template(self, template_name):
+            return TimedJinja2Template(super().get_template(template_name))
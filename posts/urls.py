@@ -1,13 +1,23 @@
+from django.conf import settings
 from django.urls import path
 
-from . import views
+from . import async_views, views
+
+feeds = async_views if settings.ASYNC_FEED_VIEWS else views
 
 urlpatterns = [
-    path('', views.index, name='index'),
-    path('group/<slug:slug>/', views.group_posts, name='group'),
+    path('', feeds.index, name='index'),
+    path('group/<slug:slug>/', feeds.group_posts, name='group'),
     path('new/', views.new_post, name='new_post'),
-    path('<str:username>/', views.profile, name='profile'),
-    path('<str:username>/<int:post_id>/', views.post_view, name='post'),
+    path('search/', views.search_posts, name='search'),
+    path('follow/', views.follow_index, name='follow_index'),
+    path('export/', views.export_posts, name='export_posts'),
+    path('<str:username>/', feeds.profile, name='profile'),
+    path('<str:username>/follow/', views.profile_follow,
+         name='profile_follow'),
+    path('<str:username>/unfollow/', views.profile_unfollow,
+         name='profile_unfollow'),
+    path('<str:username>/<int:post_id>/', feeds.post_view, name='post'),
     path(
         '<str:username>/<int:post_id>/edit/',
         views.post_edit,
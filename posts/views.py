@@ -1,32 +1,77 @@
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.conf import settings
+from django.http import HttpResponseBadRequest, StreamingHttpResponse
+from django.views.decorators.http import require_POST
+from django.utils.http import urlencode
 from django.shortcuts import get_object_or_404, redirect, render
 
+from . import follows, timeline
+from .conditional import feed_condition, post_condition
+from .counters import author_posts_count
+from .exporter import (RENDERERS, ExportFilterError, export_queryset,
+                       export_rows, parse_bound)
 from .forms import PostForm
+from .groups import get_group_or_404
 from .models import Group, Post, User
+from .page_cache import cache_feed_page
+from .paginator import CursorPaginator
+from .search import search
+from .streaming import render_feed
 
 
+def render_index(request):
+    """Тело ленты index без декораторов: общее с async_views."""
+    latest = Post.objects.for_feed()
+    paginator = CursorPaginator(latest, settings.POSTS_PER_PAGE,
+                                ids=timeline.window)
+    page = paginator.get_page(request.GET.get('cursor'))
+    return render_feed(request, 'index.html', {
+        'page': page,
+        'paginator': paginator
+    })
+
+
+@feed_condition('index')
+@cache_feed_page('index')
 def index(request):
-    latest = Post.objects.select_related('group', 'author').all()
-    paginator = Paginator(latest, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    return render(request, 'index.html', {
+    return render_index(request)
+
+
+def render_group(request, slug):
+    group = get_group_or_404(slug)
+    posts = group.posts.for_feed()
+    paginator = CursorPaginator(
+        posts, settings.POSTS_PER_PAGE,
+        # Группу могли удалить после загрузки справочника: тогда 0,
+        # а не DoesNotExist
+        count=lambda: Group.objects.filter(pk=group.pk).values_list(
+            'posts_count', flat=True
+        ).first() or 0
+    )
+    page = paginator.get_page(request.GET.get('cursor'))
+    return render_feed(request, 'group.html', {
+        'group': group,
         'page': page,
         'paginator': paginator
     })
 
 
+@feed_condition('group', 'slug')
+@cache_feed_page('group', 'slug')
 def group_posts(request, slug):
-    group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    return render(request, 'group.html', {
-        'group': group,
+    return render_group(request, slug)
+
+
+def search_posts(request):
+    query = request.GET.get('q', '').strip()
+    posts = search(query, Post.objects.for_feed())
+    paginator = CursorPaginator(posts, settings.POSTS_PER_PAGE)
+    page = paginator.get_page(request.GET.get('cursor'))
+    return render_feed(request, 'search.html', {
+        'query': query,
+        'query_prefix': urlencode({'q': query}) + '&' if query else '',
         'page': page,
-        'posts': posts,
         'paginator': paginator
     })
 
@@ -61,26 +106,111 @@ def post_edit(request, username, post_id):
     )
 
 
-def profile(request, username):
-    user_profile = get_object_or_404(User, username=username)
-    posts = user_profile.posts.all()
-    paginator = Paginator(posts, 10)
-    page_num = request.GET.get('page')
-    page = paginator.get_page(page_num)
-    return render(
+def render_profile(request, username):
+    user_profile = get_object_or_404(
+        User.objects.select_related('stats'),
+        username=username
+    )
+    posts = user_profile.posts.for_feed()
+    paginator = CursorPaginator(posts, settings.POSTS_PER_PAGE,
+                                count=author_posts_count(user_profile))
+    page = paginator.get_page(request.GET.get('cursor'))
+    return render_feed(
         request,
         'profile.html',
         {'page': page,
          'paginator': paginator,
-         'profile': user_profile}
+         'profile': user_profile,
+         'following': follows.is_following(request.user, user_profile)}
     )
 
 
-def post_view(request, username, post_id):
-    post = get_object_or_404(Post, author__username=username, pk=post_id)
+@feed_condition('profile', 'username')
+@cache_feed_page('profile', 'username')
+def profile(request, username):
+    return render_profile(request, username)
+
+
+def render_post(request, username, post_id):
+    post = get_object_or_404(
+        Post.objects.for_feed(
+            'author__first_name', 'author__last_name',
+            'author__stats__posts_count', 'author__stats__followers_count',
+            'author__stats__following_count',
+        ).select_related('author__stats'),
+        author__username=username,
+        pk=post_id
+    )
     return render(
         request,
         'posts/post.html',
         {'profile': post.author,
-         'post': post}
+         'post': post,
+         'following': follows.is_following(request.user, post.author)}
+    )
+
+
+@post_condition
+def post_view(request, username, post_id):
+    return render_post(request, username, post_id)
+
+
+@login_required
+def follow_index(request):
+    pulled = follows.pulled_authors(request.user)
+    paginator = CursorPaginator(
+        follows.following_posts(request.user, pulled),
+        settings.POSTS_PER_PAGE,
+        ids=follows.window(request.user, pulled),
+    )
+    page = paginator.get_page(request.GET.get('cursor'))
+    return render_feed(request, 'follow.html', {
+        'page': page,
+        'paginator': paginator
+    })
+
+
+@login_required
+@require_POST
+def profile_follow(request, username):
+    author = get_object_or_404(User, username=username)
+    follows.follow(request.user, author)
+    return redirect('profile', username=username)
+
+
+@login_required
+@require_POST
+def profile_unfollow(request, username):
+    author = get_object_or_404(User, username=username)
+    follows.unfollow(request.user, author)
+    return redirect('profile', username=username)
+
+
+@staff_member_required
+def export_posts(request):
+    fmt = request.GET.get('format', 'jsonl')
+    if fmt not in RENDERERS:
+        return HttpResponseBadRequest('Формат: jsonl или csv')
+    group_id = author_id = None
+    if request.GET.get('group'):
+        group_id = get_object_or_404(Group, slug=request.GET['group']).pk
+    if request.GET.get('author'):
+        author_id = get_object_or_404(
+            User, username=request.GET['author']
+        ).pk
+    try:
+        queryset = export_queryset(
+            group_id=group_id,
+            author_id=author_id,
+            since=parse_bound(request.GET.get('since')),
+            until=parse_bound(request.GET.get('until')),
+        )
+    except ExportFilterError as error:
+        return HttpResponseBadRequest(str(error))
+    render_rows, content_type = RENDERERS[fmt]
+    response = StreamingHttpResponse(
+        render_rows(export_rows(queryset, settings.EXPORT_BATCH_SIZE)),
+        content_type=content_type,
     )
+    response['Content-Disposition'] = f'attachment; filename="posts.{fmt}"'
+    return response
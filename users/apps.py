@@ -3,3 +3,11 @@ from django.apps import AppConfig
 
 class UsersConfig(AppConfig):
     name = 'users'
+
+    def ready(self):
+        from django.contrib.auth.password_validation import (
+            get_default_password_validators)
+
+        # Валидаторы (и список частых паролей) собираются один раз здесь,
+        # а не в первом запросе; при gunicorn --preload — до fork воркеров
+        get_default_password_validators()
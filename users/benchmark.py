@@ -0,0 +1,98 @@
+import itertools
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import check_password, make_password
+from django.contrib.auth.password_validation import (
+    get_default_password_validators)
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils.module_loading import import_string
+from posts.benchmark import percentile
+
+from . import hashers
+from .validators import load_passwords
+
+User = get_user_model()
+
+# Пароль для замеров входа: проходит все валидаторы
+BENCH_PASSWORD = 'Tr0ub4dor&3-bench'
+
+
+def timed(func, repeat):
+    """p50 времени вызова func в мс."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return round(percentile(timings, 0.5), 2)
+
+
+def profile_validators(repeat=20):
+    """Время каждого валидатора паролей и холодной загрузки списка."""
+    results = {
+        type(validator).__name__: timed(
+            lambda: validator.validate(BENCH_PASSWORD), repeat
+        )
+        for validator in get_default_password_validators()
+    }
+    path = str(import_string(
+        'django.contrib.auth.password_validation.CommonPasswordValidator'
+    ).DEFAULT_PASSWORD_LIST_PATH)
+    results['загрузка списка частых паролей'] = timed(
+        lambda: load_passwords.__wrapped__(path), max(1, repeat // 4)
+    )
+    return results
+
+
+def profile_auth(repeat=20):
+    """
+    Цена входа и регистрации с каждым установленным хешером из
+    PASSWORD_HASHER_PATHS: хеш, проверка и запросы целиком. Запросы
+    идут по одному из одного потока, а время уходит на хеширование
+    в процессоре, так что 1000 / p50 — запросов в секунду на ядро.
+    """
+    results = {}
+    serial = itertools.count()
+    for name, path in settings.PASSWORD_HASHER_PATHS.items():
+        if not hashers.available(import_string(path)()):
+            continue
+        with override_settings(PASSWORD_HASHERS=[path], RATE_LIMITS={}):
+            encoded = make_password(BENCH_PASSWORD)
+            user = User.objects.create(username=f'bench-auth-{name}',
+                                       password=encoded)
+            client = Client()
+
+            def login():
+                response = client.post(reverse('login'), {
+                    'username': user.username, 'password': BENCH_PASSWORD,
+                })
+                if response.status_code != 302:
+                    raise RuntimeError(f'Вход не удался: {name}')
+                client.cookies.clear()
+
+            def signup():
+                response = client.post(reverse('signup'), {
+                    'username': f'bench-signup-{name}-{next(serial)}',
+                    'password1': BENCH_PASSWORD,
+                    'password2': BENCH_PASSWORD,
+                })
+                if response.status_code != 302:
+                    raise RuntimeError(f'Регистрация не удалась: {name}')
+
+            row = {
+                'hash_ms': timed(lambda: make_password(BENCH_PASSWORD),
+                                 repeat),
+                'verify_ms': timed(
+                    lambda: check_password(BENCH_PASSWORD, encoded), repeat
+                ),
+                'login_ms': timed(login, repeat),
+                'signup_ms': timed(signup, repeat),
+            }
+            row['login_per_core'] = round(1000 / row['login_ms'], 1)
+            row['signup_per_core'] = round(1000 / row['signup_ms'], 1)
+            results[name] = row
+    return results
@@ -0,0 +1,51 @@
+"""
+Хешеры паролей с ценой из настроек: PASSWORD_PBKDF2_ITERATIONS,
+PASSWORD_ARGON2_*, PASSWORD_BCRYPT_ROUNDS.
+
+Имена алгоритмов те же, что у хешеров Django, так что хэши совместимы
+в обе стороны. Если цена в настройках изменилась или основным стал
+другой хешер (PASSWORD_HASHER), хэш пересчитывается при следующем
+входе пользователя: Django сверяет его с must_update.
+
+Argon2 и bcrypt нужны argon2-cffi и bcrypt; без них работает только
+PBKDF2.
+"""
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    @property
+    def iterations(self):
+        return settings.PASSWORD_PBKDF2_ITERATIONS
+
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+    @property
+    def time_cost(self):
+        return settings.PASSWORD_ARGON2_TIME_COST
+
+    @property
+    def memory_cost(self):
+        return settings.PASSWORD_ARGON2_MEMORY_COST
+
+    @property
+    def parallelism(self):
+        return settings.PASSWORD_ARGON2_PARALLELISM
+
+
+class BCryptSHA256PasswordHasher(hashers.BCryptSHA256PasswordHasher):
+    @property
+    def rounds(self):
+        return settings.PASSWORD_BCRYPT_ROUNDS
+
+
+def available(hasher):
+    """Установлена ли библиотека хешера."""
+    if hasher.library is None:
+        return True
+    try:
+        hasher._load_library()
+    except ValueError:
+        return False
+    return True
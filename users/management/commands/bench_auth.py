@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from posts.benchmark import test_database
+from users import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        'Цена входа и регистрации с каждым установленным хешером '
+        'паролей (PASSWORD_HASHER_PATHS) и время валидаторов паролей. '
+        'Запросы идут из одного потока: «в секунду» — на одно ядро. '
+        'Работает на отдельной тестовой базе, как bench.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--keepdb', action='store_true')
+
+    def handle(self, *args, **options):
+        with test_database(options['keepdb']):
+            validators = benchmark.profile_validators(options['repeat'])
+            results = benchmark.profile_auth(options['repeat'])
+        self.stdout.write(f'{"валидатор":<36}{"мс":>8}')
+        for name, ms in validators.items():
+            self.stdout.write(f'{name:<36}{ms:>8}')
+        self.stdout.write('')
+        self.stdout.write(
+            f'{"хешер":<8}{"хеш, мс":>9}{"проверка":>10}{"вход":>8}'
+            f'{"рег.":>8}{"входов/с":>10}{"рег./с":>8}'
+        )
+        for name, row in results.items():
+            self.stdout.write(
+                f'{name:<8}{row["hash_ms"]:>9}{row["verify_ms"]:>10}'
+                f'{row["login_ms"]:>8}{row["signup_ms"]:>8}'
+                f'{row["login_per_core"]:>10}{row["signup_per_core"]:>8}'
+            )
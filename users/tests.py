@@ -0,0 +1,59 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.test import TestCase, override_settings
+
+from users.benchmark import BENCH_PASSWORD, profile_auth, profile_validators
+from users.validators import CommonPasswordValidator
+
+User = get_user_model()
+
+
+@override_settings(
+    PASSWORD_HASHERS=['users.hashers.PBKDF2PasswordHasher',
+                      'django.contrib.auth.hashers.MD5PasswordHasher'],
+    PASSWORD_PBKDF2_ITERATIONS=1000,
+)
+class TestPasswords(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='HaroldFinch',
+                                             password=BENCH_PASSWORD)
+
+    def test_common_passwords_loaded_once(self):
+        first, second = CommonPasswordValidator(), CommonPasswordValidator()
+        self.assertIsInstance(first.passwords, frozenset)
+        self.assertIs(first.passwords, second.passwords)
+        with self.assertRaises(ValidationError):
+            first.validate('Password1')
+        first.validate(BENCH_PASSWORD)
+
+    def test_cost_from_settings(self):
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$1000$'))
+
+    def login(self):
+        self.assertTrue(self.client.login(username='HaroldFinch',
+                                          password=BENCH_PASSWORD))
+        self.user.refresh_from_db()
+        return self.user.password
+
+    def test_rehash_on_login_after_cost_change(self):
+        self.assertEqual(self.login().split('$')[1], '1000')
+        with override_settings(PASSWORD_PBKDF2_ITERATIONS=2000):
+            self.assertEqual(self.login().split('$')[1], '2000')
+
+    def test_rehash_on_login_after_hasher_change(self):
+        self.user.password = make_password(BENCH_PASSWORD, hasher='md5')
+        self.user.save(update_fields=['password'])
+        self.assertTrue(self.login().startswith('pbkdf2_sha256$'))
+
+    def test_auth_benchmark(self):
+        validators = profile_validators(repeat=1)
+        self.assertIn('CommonPasswordValidator', validators)
+        with override_settings(PASSWORD_HASHER_PATHS={
+                'pbkdf2': 'users.hashers.PBKDF2PasswordHasher'}):
+            results = profile_auth(repeat=2)
+        self.assertGreater(results['pbkdf2']['login_per_core'], 0)
+        self.assertEqual(User.objects.filter(
+            username__startswith='bench-signup-').count(), 2)
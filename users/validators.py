@@ -0,0 +1,28 @@
+import gzip
+from functools import lru_cache
+
+from django.contrib.auth import password_validation
+
+
+@lru_cache(maxsize=None)
+def load_passwords(path):
+    """Список частых паролей один на процесс, неизменяемым множеством."""
+    try:
+        with gzip.open(path, 'rt', encoding='utf-8') as passwords:
+            return frozenset(line.strip() for line in passwords)
+    except OSError:
+        with open(path, encoding='utf-8') as passwords:
+            return frozenset(line.strip() for line in passwords)
+
+
+class CommonPasswordValidator(password_validation.CommonPasswordValidator):
+    """
+    CommonPasswordValidator Django, который не читает 20 тысяч паролей
+    из gzip заново в каждом экземпляре: список общий и загружается
+    при старте приложения (UsersConfig.ready), а не в первом запросе
+    регистрации.
+    """
+
+    def __init__(self, password_list_path=password_validation
+                 .CommonPasswordValidator.DEFAULT_PASSWORD_LIST_PATH):
+        self.passwords = load_passwords(str(password_list_path))
@@ -0,0 +1,17 @@
+import os
+
+from asgiref.sync import ThreadSensitiveContext
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+os.environ.setdefault('ASYNC_FEED_VIEWS', '1')
+
+django_application = get_asgi_application()
+
+
+async def application(scope, receive, send):
+    # Django 3.2 выполняет весь синхронный код (ORM, middleware) в одном
+    # общем потоке на процесс. Свой поток на запрос, как в Django 4.0,
+    # не даёт медленному запросу задержать все остальные
+    async with ThreadSensitiveContext():
+        await django_application(scope, receive, send)
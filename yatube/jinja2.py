@@ -0,0 +1,37 @@
+from django.core.exceptions import ObjectDoesNotExist
+from django.templatetags.static import static
+from django.urls import reverse
+from jinja2 import Environment, pass_context
+from markupsafe import Markup
+
+from posts.cards import get_generation, render_card
+
+
+def url(name, *args):
+    return reverse(name, args=args)
+
+
+@pass_context
+def post_card(context, post, generation):
+    return Markup(render_card(post, context.get('user'), generation))
+
+
+def author_stats(user):
+    # В шаблонах Django отсутствующая строка статистики тихо даёт
+    # пустое значение, в Jinja2 — исключение
+    try:
+        return user.stats
+    except ObjectDoesNotExist:
+        return None
+
+
+def environment(**options):
+    env = Environment(**options)
+    env.globals.update({
+        'static': static,
+        'url': url,
+        'post_card': post_card,
+        'post_card_generation': get_generation,
+        'author_stats': author_stats,
+    })
+    return env
@@ -1,5 +1,7 @@
 import os
 
+from yatube.template_settings import templates
+
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 SECRET_KEY = '4jos8js))4%=hw)ih8ha)pw8ysm92$md!55y%i!sur$^c%=dcm'
 DEBUG = True
@@ -18,6 +20,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'posts.middleware.RequestTimingMiddleware',
+    'posts.middleware.ReplicaMiddleware',
+    'posts.middleware.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -25,32 +30,79 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'posts.middleware.RateLimitMiddleware',
 ]
 
 ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, "templates")
-TEMPLATES = [
-    {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
-        'DIRS': [TEMPLATES_DIR],
-        'APP_DIRS': True,
-        'OPTIONS': {
-            'context_processors': [
-                'django.template.context_processors.debug',
-                'django.template.context_processors.request',
-                'django.contrib.auth.context_processors.auth',
-                'django.contrib.messages.context_processors.messages',
-            ],
-        },
-    },
-]
+# Кэш шаблонов и встраивание include; по умолчанию выключены при DEBUG
+TEMPLATE_CACHE = os.environ.get(
+    'TEMPLATE_CACHE', '0' if DEBUG else '1'
+) == '1'
+# Ленты на Jinja2 (нужен пакет jinja2)
+TEMPLATE_JINJA2 = os.environ.get('TEMPLATE_JINJA2') == '1'
+TEMPLATES = templates(TEMPLATES_DIR, cache=TEMPLATE_CACHE,
+                      flatten=TEMPLATE_CACHE, jinja2=TEMPLATE_JINJA2)
 
 WSGI_APPLICATION = 'yatube.wsgi.application'
+ASGI_APPLICATION = 'yatube.asgi.application'
+# Ленты из posts.async_views; yatube.asgi включает их по умолчанию
+ASYNC_FEED_VIEWS = os.environ.get('ASYNC_FEED_VIEWS') == '1'
+
+# Постоянные соединения: сколько секунд держать соединение между
+# запросами. Перед повторным использованием оно проверяется
+DB_CONN_MAX_AGE = int(os.environ.get('DB_CONN_MAX_AGE', 60))
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'ENGINE': os.environ.get('DB_ENGINE', 'django.db.backends.sqlite3'),
+        'NAME': os.environ.get('DB_NAME', os.path.join(BASE_DIR, 'db.sqlite3')),
+        'USER': os.environ.get('DB_USER', ''),
+        'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+        'HOST': os.environ.get('DB_HOST', ''),
+        'PORT': os.environ.get('DB_PORT', ''),
+        'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+        # Действует только с Django 4.1, Django 3.2 ключ игнорирует:
+        # до 4.1 соединения проверяет posts.routers.check_connections
+        'CONN_HEALTH_CHECKS': True,
+    }
+}
+
+# Реплика для чтения лент: задаётся переменными DB_REPLICA_*,
+# недостающие берутся из основной базы
+if os.environ.get('DB_REPLICA_HOST') or os.environ.get('DB_REPLICA_NAME'):
+    DATABASES['replica'] = dict(
+        DATABASES['default'],
+        NAME=os.environ.get('DB_REPLICA_NAME', DATABASES['default']['NAME']),
+        USER=os.environ.get('DB_REPLICA_USER', DATABASES['default']['USER']),
+        PASSWORD=os.environ.get('DB_REPLICA_PASSWORD',
+                                DATABASES['default']['PASSWORD']),
+        HOST=os.environ.get('DB_REPLICA_HOST', DATABASES['default']['HOST']),
+        PORT=os.environ.get('DB_REPLICA_PORT', DATABASES['default']['PORT']),
+        TEST={'MIRROR': 'default'},
+    )
+
+DATABASE_ROUTERS = ['posts.routers.ReplicaRouter']
+# Алиас реплики; пустая строка — всё читается из основной базы
+DATABASE_REPLICA = 'replica' if 'replica' in DATABASES else ''
+# Маршруты, которые читают из реплики
+REPLICA_VIEWS = ('index', 'group', 'profile', 'post')
+# Сколько секунд после записи пользователь читает из основной базы
+REPLICA_STICKY_SECONDS = 10
+
+# Кэш по умолчанию — память процесса, он годится только для одного
+# процесса. Поколения лент, таймлайн, справочник сообществ и вёдра
+# лимитов должны быть общими для всех процессов: под несколькими
+# воркерами gunicorn или uvicorn и с отдельным run_jobs задайте общий
+# кэш, например CACHE_BACKEND=django.core.cache.backends.memcached.
+# PyMemcacheCache и CACHE_LOCATION=127.0.0.1:11211
+CACHE_BACKEND = os.environ.get(
+    'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+)
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
     }
 }
 
@@ -62,12 +114,42 @@ AUTH_PASSWORD_VALIDATORS = [
         'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator',
     },
     {
-        'NAME': 'django.contrib.auth.password_validation.CommonPasswordValidator',
+        'NAME': 'users.validators.CommonPasswordValidator',
     },
     {
         'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator',
     },
 ]
+
+# Основной хешер паролей: pbkdf2, argon2 (нужен argon2-cffi) или bcrypt
+# (нужен bcrypt). Остальные остаются в списке, чтобы проверять старые
+# хэши; при входе такие хэши пересчитываются основным хешером
+PASSWORD_HASHER = os.environ.get('PASSWORD_HASHER', 'pbkdf2')
+PASSWORD_HASHER_PATHS = {
+    'pbkdf2': 'users.hashers.PBKDF2PasswordHasher',
+    'argon2': 'users.hashers.Argon2PasswordHasher',
+    'bcrypt': 'users.hashers.BCryptSHA256PasswordHasher',
+}
+PASSWORD_HASHERS = [
+    PASSWORD_HASHER_PATHS[PASSWORD_HASHER],
+    *(path for name, path in PASSWORD_HASHER_PATHS.items()
+      if name != PASSWORD_HASHER),
+]
+# Цена хеширования; при её изменении хэш обновляется при входе
+PASSWORD_PBKDF2_ITERATIONS = int(
+    os.environ.get('PASSWORD_PBKDF2_ITERATIONS', 260000)
+)
+# argon2id по рекомендации OWASP: 19 МиБ, 2 прохода, один поток —
+# пароль на ядро, а не все ядра на один пароль
+PASSWORD_ARGON2_TIME_COST = int(
+    os.environ.get('PASSWORD_ARGON2_TIME_COST', 2)
+)
+PASSWORD_ARGON2_MEMORY_COST = int(
+    os.environ.get('PASSWORD_ARGON2_MEMORY_COST', 19456)
+)
+PASSWORD_ARGON2_PARALLELISM = 1
+PASSWORD_BCRYPT_ROUNDS = int(os.environ.get('PASSWORD_BCRYPT_ROUNDS', 12))
+
 SITE_ID = 1
 
 LANGUAGE_CODE = 'ru'
@@ -78,6 +160,97 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'static')
+# Имена с хэшем и готовые .gz/.br при collectstatic; по умолчанию
+# выключено при DEBUG
+STATIC_PIPELINE = os.environ.get(
+    'STATIC_PIPELINE', '0' if DEBUG else '1'
+) == '1'
+if STATIC_PIPELINE:
+    STATICFILES_STORAGE = (
+        'posts.static_storage.CompressedManifestStaticFilesStorage'
+    )
+# Отдавать STATIC_ROOT самим приложением, если перед ним нет веб-сервера
+STATIC_SERVE = os.environ.get('STATIC_SERVE') == '1'
+# Кэш статики без хэша в имени; файлы с хэшем кэшируются на год
+STATIC_MAX_AGE = 60 * 60
+
+# Сжатие ответов: кодировки в порядке предпочтения, br — если
+# установлен пакет brotli; пустая строка выключает сжатие
+RESPONSE_COMPRESSION = tuple(filter(None, os.environ.get(
+    'RESPONSE_COMPRESSION', 'br,gzip'
+).split(',')))
+RESPONSE_COMPRESSION_LEVELS = {'br': 4, 'gzip': 6}
+RESPONSE_COMPRESSION_MIN_SIZE = 512
+RESPONSE_COMPRESSION_TYPES = (
+    'text/html', 'text/plain', 'text/csv', 'application/json',
+    'application/x-ndjson',
+)
+
+POSTS_PER_PAGE = int(os.environ.get('POSTS_PER_PAGE', 10))
+# Ленты отдаются потоком: шапка сразу, дальше по посту (только WSGI)
+FEED_STREAMING = os.environ.get('FEED_STREAMING') == '1'
+POST_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+PAGE_CACHE_TIMEOUT = 60 * 60
+PAGE_CACHE_STALE_WINDOW = 30
+EXPORT_BATCH_SIZE = 2000
+# Сколько последних постов главной держать в кэше готовым списком
+TIMELINE_SIZE = 200
+TIMELINE_TIMEOUT = 60 * 60
+# Лента подписок: посты раскладываются по входящим подписчиков пачками,
+# у слишком популярных или плодовитых авторов — читаются при открытии
+FOLLOW_FANOUT_BATCH_SIZE = 1000
+FOLLOW_FANOUT_MAX_FOLLOWERS = 10000
+FOLLOW_PULL_POSTS_PER_DAY = 50
+# Сколько последних постов автора получает новый подписчик
+FOLLOW_BACKFILL = 1000
+# Очередь фоновых задач (posts.jobs, manage.py run_jobs). JOBS_EAGER=1
+# выполняет задачи сразу, без обработчика
+JOBS_EAGER = os.environ.get('JOBS_EAGER') == '1'
+JOB_BATCH_SIZE = 100
+JOB_MAX_ATTEMPTS = 5
+JOB_RETRY_DELAY = 10
+JOB_LEASE_SECONDS = 60
+JOB_POLL_INTERVAL = 1
+# Ограничение частоты записи (posts.ratelimit): имя маршрута ->
+# {'ip' | 'user': (запросов подряд, за сколько секунд ведро наполняется)}.
+# RATE_LIMIT=0 выключает, например, для нагрузочных тестов
+RATE_LIMITS = {} if os.environ.get('RATE_LIMIT') == '0' else {
+    'new_post': {'user': (10, 60), 'ip': (30, 60)},
+    'post_edit': {'user': (30, 60), 'ip': (60, 60)},
+    'api_posts': {'user': (10, 60), 'ip': (30, 60)},
+    'api_post': {'user': (30, 60), 'ip': (60, 60)},
+    'signup': {'ip': (5, 60 * 60)},
+    'login': {'ip': (10, 60)},
+}
+RATE_LIMIT_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+# Заголовок с адресом клиента от своего прокси, например
+# 'HTTP_X_REAL_IP'; без прокси — None, берётся REMOTE_ADDR
+RATE_LIMIT_IP_HEADER = os.environ.get('RATE_LIMIT_IP_HEADER') or None
+
+# JSON API: размер страницы по умолчанию и пределы для limit и ids
+API_PAGE_SIZE = 20
+API_MAX_PAGE_SIZE = 100
+API_MAX_IDS = 100
+ADMIN_EXACT_COUNT_LIMIT = 100000
+GROUP_DIRECTORY_LOCAL_TTL = 5
+
+REQUEST_TIMING_SAMPLE_RATE = 0.05
+REQUEST_TIMING_DETECT_N_PLUS_ONE = False
+REQUEST_TIMING_N_PLUS_ONE_THRESHOLD = 5
+REQUEST_TIMING_PROFILE_TEMPLATES = False
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'yatube.timing': {'handlers': ['console'], 'level': 'INFO'},
+        'yatube.jobs': {'handlers': ['console'], 'level': 'INFO'},
+        'yatube.ratelimit': {'handlers': ['console'], 'level': 'INFO'},
+    },
+}
 
 LOGIN_URL = '/auth/login/'
 LOGIN_REDIRECT_URL = 'index'
@@ -0,0 +1,53 @@
+"""
+Сборка TEMPLATES для settings.py и бенчмарка шаблонов.
+
+cache — загрузчики кэшируют скомпилированные шаблоны; flatten —
+include с постоянным именем встраиваются в текст шаблона при загрузке
+(только вместе с cache).
+jinja2 — ленты (index, group, profile и их include) рендерит Jinja2
+из templates/jinja2; остальные страницы остаются на шаблонах Django.
+"""
+import os
+
+CONTEXT_PROCESSORS = [
+    'django.template.context_processors.debug',
+    'django.template.context_processors.request',
+    'django.contrib.auth.context_processors.auth',
+    'django.contrib.messages.context_processors.messages',
+]
+
+LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
+
+def templates(templates_dir, cache=False, flatten=False, jinja2=False):
+    loaders = LOADERS
+    if cache and flatten:
+        loaders = [('posts.template_loaders.FlatteningLoader', loaders)]
+    if cache:
+        loaders = [('django.template.loaders.cached.Loader', loaders)]
+    engines = [{
+        'NAME': 'django',
+        'BACKEND': 'posts.timing.TimedDjangoTemplates',
+        'DIRS': [templates_dir],
+        'OPTIONS': {
+            'context_processors': CONTEXT_PROCESSORS,
+            'loaders': loaders,
+            # {% include %} с замером времени для профилировщика
+            'builtins': ['posts.templatetags.timed_include'],
+        },
+    }]
+    if jinja2:
+        engines.insert(0, {
+            'NAME': 'jinja2',
+            'BACKEND': 'posts.timing.TimedJinja2',
+            'DIRS': [os.path.join(templates_dir, 'jinja2')],
+            'OPTIONS': {
+                'environment': 'yatube.jinja2.environment',
+                'context_processors': CONTEXT_PROCESSORS,
+                'auto_reload': not cache,
+            },
+        })
+    return engines
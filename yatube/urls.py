@@ -1,11 +1,17 @@
+import re
+
+from django.conf import settings
 from django.contrib import admin
 from django.contrib.flatpages import views
-from django.urls import include, path
+from django.urls import include, path, re_path
+
+from posts import static_serve
 
 urlpatterns = [
     path('auth/', include('users.urls')),
     path('auth/', include('django.contrib.auth.urls')),
     path('admin/', admin.site.urls),
+    path('api/v1/', include('posts.api_urls')),
     path('', include('posts.urls')),
     path(
         'about-author/',
@@ -15,3 +21,11 @@ urlpatterns = [
     ),
     path('about-spec/', views.flatpage, {'url': '/about-spec/'}, name='spec'),
 ]
+
+if settings.STATIC_SERVE:
+    urlpatterns += [
+        re_path(
+            rf'^{re.escape(settings.STATIC_URL.lstrip("/"))}(?P<path>.+)$',
+            static_serve.serve,
+        ),
+    ]